@@ -0,0 +1,48 @@
+"""Question search_vector
+
+Revision ID: 53566f97b215
+Revises: f68d5a16ab83
+Create Date: 2026-10-18 14:52:10.118406
+
+"""
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "53566f97b215"
+down_revision = "f68d5a16ab83"
+branch_labels = None
+depends_on = None
+
+SEARCH_VECTOR_EXPRESSION = (
+    "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('english', "
+    "regexp_replace(coalesce(content, ''), '<[^>]+>', ' ', 'g')), 'B')"
+)
+
+
+def upgrade():
+    # stored generated column is computed for existing rows when added
+    op.add_column(
+        "questions",
+        sa.Column(
+            "search_vector",
+            postgresql.TSVECTOR(),
+            sa.Computed(SEARCH_VECTOR_EXPRESSION, persisted=True),
+            nullable=True,
+        ),
+    )
+    op.create_index(
+        "ix_questions_search_vector",
+        "questions",
+        ["search_vector"],
+        unique=False,
+        postgresql_using="gin",
+    )
+
+
+def downgrade():
+    op.drop_index("ix_questions_search_vector", table_name="questions")
+    op.drop_column("questions", "search_vector")
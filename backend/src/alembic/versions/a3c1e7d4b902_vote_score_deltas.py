@@ -0,0 +1,96 @@
+"""Vote score deltas
+
+Revision ID: a3c1e7d4b902
+Revises: 53566f97b215
+Create Date: 2026-10-18 16:05:41.512093
+
+"""
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "a3c1e7d4b902"
+down_revision = "53566f97b215"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION apply_score_delta(
+            target_entry_id integer, delta integer
+        ) RETURNS void AS $$
+            BEGIN
+                IF delta = 0 THEN
+                    RETURN;
+                END IF;
+
+                WITH entry AS (
+                    UPDATE entries
+                        SET score = score + delta
+                        WHERE id = target_entry_id
+                        RETURNING user_id
+                )
+                UPDATE users
+                    SET score = users.score + delta
+                    FROM entry
+                    WHERE users.id = entry.user_id;
+            END;
+        $$ LANGUAGE plpgsql;
+        """
+    )
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION update_score() RETURNS TRIGGER AS $$
+            BEGIN
+                IF TG_OP = 'UPDATE' AND NEW.entry_id = OLD.entry_id THEN
+                    PERFORM apply_score_delta(NEW.entry_id, NEW.value - OLD.value);
+                    RETURN NULL;
+                END IF;
+
+                IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                    PERFORM apply_score_delta(OLD.entry_id, -OLD.value);
+                END IF;
+
+                IF TG_OP IN ('UPDATE', 'INSERT') THEN
+                    PERFORM apply_score_delta(NEW.entry_id, NEW.value);
+                END IF;
+
+                RETURN NULL;
+            END;
+        $$ LANGUAGE plpgsql;
+        """
+    )
+
+
+def downgrade():
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION update_score() RETURNS TRIGGER AS $$
+            BEGIN
+                UPDATE entries
+                    SET score = (
+                        SELECT COALESCE(SUM(value), 0)
+                        FROM votes
+                        WHERE entry_id = COALESCE(OLD.entry_id, NEW.entry_id)
+                    )
+                    WHERE id = COALESCE(OLD.entry_id, NEW.entry_id);
+                UPDATE users
+                    SET score = (
+                        SELECT COALESCE(SUM(score), 0)
+                        FROM entries
+                        WHERE user_id = users.id
+                    )
+                    WHERE id = (
+                        SELECT user_id
+                        FROM entries
+                        WHERE id = COALESCE(OLD.entry_id, NEW.entry_id)
+                    );
+                RETURN NULL;
+            END;
+        $$ LANGUAGE plpgsql;
+        """
+    )
+    op.execute("DROP FUNCTION IF EXISTS apply_score_delta;")
@@ -0,0 +1,111 @@
+"""Question answer_count
+
+Revision ID: b7e2f4c9a1d5
+Revises: a3c1e7d4b902
+Create Date: 2026-10-18 17:12:03.904217
+
+"""
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "b7e2f4c9a1d5"
+down_revision = "a3c1e7d4b902"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column(
+        "questions",
+        sa.Column("answer_count", sa.Integer(), server_default="0", nullable=False),
+    )
+    op.execute(
+        """
+        UPDATE questions
+            SET answer_count = counts.answer_count
+            FROM (
+                SELECT answers.question_id, COUNT(answers.id) AS answer_count
+                FROM answers
+                JOIN entries ON entries.id = answers.id
+                WHERE entries.deleted_at IS NULL
+                GROUP BY answers.question_id
+            ) AS counts
+            WHERE questions.id = counts.question_id;
+        """
+    )
+    op.create_index(
+        "ix_questions_answer_count_id",
+        "questions",
+        ["answer_count", "id"],
+        unique=False,
+    )
+
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION update_answer_count() RETURNS TRIGGER AS $$
+            BEGIN
+                IF TG_OP = 'INSERT' THEN
+                    UPDATE questions
+                        SET answer_count = answer_count + 1
+                        WHERE id = NEW.question_id AND EXISTS (
+                            SELECT 1 FROM entries
+                            WHERE id = NEW.id AND deleted_at IS NULL
+                        );
+                ELSE
+                    UPDATE questions
+                        SET answer_count = answer_count - 1
+                        WHERE id = OLD.question_id AND EXISTS (
+                            SELECT 1 FROM entries
+                            WHERE id = OLD.id AND deleted_at IS NULL
+                        );
+                END IF;
+                RETURN NULL;
+            END;
+        $$ LANGUAGE plpgsql;
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER update_answer_count_tg
+        AFTER INSERT OR DELETE ON answers
+            FOR EACH ROW EXECUTE PROCEDURE update_answer_count();
+        """
+    )
+
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION update_answer_count_deleted() RETURNS TRIGGER AS $$
+            BEGIN
+                UPDATE questions
+                    SET answer_count = answer_count + (
+                        CASE WHEN NEW.deleted_at IS NULL THEN 1 ELSE -1 END
+                    )
+                    WHERE id = (SELECT question_id FROM answers WHERE id = NEW.id);
+                RETURN NULL;
+            END;
+        $$ LANGUAGE plpgsql;
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER update_answer_count_deleted_tg
+        AFTER UPDATE OF deleted_at ON entries
+            FOR EACH ROW
+            WHEN (
+                NEW.type = 2
+                AND (OLD.deleted_at IS NULL) <> (NEW.deleted_at IS NULL)
+            )
+            EXECUTE PROCEDURE update_answer_count_deleted();
+        """
+    )
+
+
+def downgrade():
+    op.execute("DROP TRIGGER IF EXISTS update_answer_count_deleted_tg ON entries;")
+    op.execute("DROP FUNCTION IF EXISTS update_answer_count_deleted;")
+    op.execute("DROP TRIGGER IF EXISTS update_answer_count_tg ON answers;")
+    op.execute("DROP FUNCTION IF EXISTS update_answer_count;")
+    op.drop_index("ix_questions_answer_count_id", table_name="questions")
+    op.drop_column("questions", "answer_count")
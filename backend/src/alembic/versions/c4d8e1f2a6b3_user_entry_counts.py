@@ -0,0 +1,127 @@
+"""User question_count and answer_count
+
+Revision ID: c4d8e1f2a6b3
+Revises: b7e2f4c9a1d5
+Create Date: 2026-10-18 18:02:47.330518
+
+"""
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "c4d8e1f2a6b3"
+down_revision = "b7e2f4c9a1d5"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column(
+        "users",
+        sa.Column("question_count", sa.Integer(), server_default="0", nullable=False),
+    )
+    op.add_column(
+        "users",
+        sa.Column("answer_count", sa.Integer(), server_default="0", nullable=False),
+    )
+    op.execute(
+        """
+        UPDATE users
+            SET question_count = counts.question_count,
+                answer_count = counts.answer_count
+            FROM (
+                SELECT
+                    user_id,
+                    COUNT(id) FILTER (WHERE type = 1) AS question_count,
+                    COUNT(id) FILTER (WHERE type = 2) AS answer_count
+                FROM entries
+                WHERE deleted_at IS NULL
+                GROUP BY user_id
+            ) AS counts
+            WHERE users.id = counts.user_id;
+        """
+    )
+    op.create_index(
+        "ix_users_question_count_id", "users", ["question_count", "id"], unique=False
+    )
+    op.create_index(
+        "ix_users_answer_count_id", "users", ["answer_count", "id"], unique=False
+    )
+
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION update_user_entry_counts() RETURNS TRIGGER AS $$
+            DECLARE
+                delta integer;
+                target_type integer;
+                target_user_id integer;
+            BEGIN
+                IF TG_OP = 'INSERT' THEN
+                    IF NEW.deleted_at IS NOT NULL THEN
+                        RETURN NULL;
+                    END IF;
+                    delta := 1;
+                ELSIF TG_OP = 'DELETE' THEN
+                    IF OLD.deleted_at IS NOT NULL THEN
+                        RETURN NULL;
+                    END IF;
+                    delta := -1;
+                ELSIF NEW.deleted_at IS NULL THEN
+                    delta := 1;
+                ELSE
+                    delta := -1;
+                END IF;
+
+                IF TG_OP = 'DELETE' THEN
+                    target_type := OLD.type;
+                    target_user_id := OLD.user_id;
+                ELSE
+                    target_type := NEW.type;
+                    target_user_id := NEW.user_id;
+                END IF;
+
+                IF target_type = 1 THEN
+                    UPDATE users
+                        SET question_count = question_count + delta
+                        WHERE id = target_user_id;
+                ELSIF target_type = 2 THEN
+                    UPDATE users
+                        SET answer_count = answer_count + delta
+                        WHERE id = target_user_id;
+                END IF;
+
+                RETURN NULL;
+            END;
+        $$ LANGUAGE plpgsql;
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER update_user_entry_counts_tg
+        AFTER INSERT OR DELETE ON entries
+            FOR EACH ROW EXECUTE PROCEDURE update_user_entry_counts();
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER update_user_entry_counts_deleted_tg
+        AFTER UPDATE OF deleted_at ON entries
+            FOR EACH ROW
+            WHEN (
+                NEW.type IN (1, 2)
+                AND (OLD.deleted_at IS NULL) <> (NEW.deleted_at IS NULL)
+            )
+            EXECUTE PROCEDURE update_user_entry_counts();
+        """
+    )
+
+
+def downgrade():
+    op.execute("DROP TRIGGER IF EXISTS update_user_entry_counts_deleted_tg ON entries;")
+    op.execute("DROP TRIGGER IF EXISTS update_user_entry_counts_tg ON entries;")
+    op.execute("DROP FUNCTION IF EXISTS update_user_entry_counts;")
+    op.drop_index("ix_users_answer_count_id", table_name="users")
+    op.drop_index("ix_users_question_count_id", table_name="users")
+    op.drop_column("users", "answer_count")
+    op.drop_column("users", "question_count")
@@ -0,0 +1,34 @@
+"""Question view_count
+
+Revision ID: e9a3b5d7c2f1
+Revises: c4d8e1f2a6b3
+Create Date: 2026-10-18 21:14:36.512907
+
+"""
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "e9a3b5d7c2f1"
+down_revision = "c4d8e1f2a6b3"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column(
+        "questions",
+        sa.Column("view_count", sa.Integer(), server_default="0", nullable=False),
+    )
+    op.create_index(
+        "ix_questions_view_count_id",
+        "questions",
+        ["view_count", "id"],
+        unique=False,
+    )
+
+
+def downgrade():
+    op.drop_index("ix_questions_view_count_id", table_name="questions")
+    op.drop_column("questions", "view_count")
@@ -1,9 +1,17 @@
+import time
+
 import click
 from flask import Flask
 from flask.cli import with_appcontext
 
 import repository as repo
+from app.config import settings
+from auth.security import hasher
+from models import Question
+from repository.exceptions import SearchIndexError
+from repository.search import INDEX_SETTINGS, get_index_name
 from storage import store
+from worker import queue_stats
 
 
 @click.command("create_user")
@@ -18,25 +26,154 @@ def create_user(email: str, name: str, password: str) -> None:
 
 
 @click.command("update_search_indexes")
+@click.option("--chunk-size", default=1000, help="Documents per batch")
+@click.option("--restart", is_flag=True, help="Discard an interrupted reindex")
+@with_appcontext
+def update_search_indexes(chunk_size: int, restart: bool) -> None:
+    total = repo.question.count(store, filters=[Question.deleted_at.is_(None)])
+    indexed = 0 if restart else repo.question.reindex_progress(store)
+    resumed = indexed
+    started_at = time.monotonic()
+
+    try:
+        for sent in repo.question.reindex_search(
+            store, chunk_size=chunk_size, restart=restart
+        ):
+            indexed += sent
+            rate = (indexed - resumed) / max(time.monotonic() - started_at, 1e-6)
+            click.echo(f"Indexed {indexed}/{total}, {rate:.0f} docs/s")
+    except SearchIndexError as e:
+        raise click.ClickException(f"{e}. Run again with --restart")
+
+    click.echo(f"Reindex finished, {indexed - resumed} documents sent")
+
+
+@click.command("flush_search_index")
 @with_appcontext
-def update_search_indexes() -> None:
-    questions = repo.question.all(store)
-    repo.question.update_search_indexes(store, *questions)
+def flush_search_index() -> None:
+    synced = repo.question.flush_search_index(store, settings.SEARCH_INDEX_BATCH_SIZE)
+    click.echo(f"Synced {synced} questions with the search index")
 
 
 @click.command("configure_search_indexes")
 @with_appcontext
 def configure_search_indexes() -> None:
-    questions_index = store.meili.index("question")
-    questions_index.update_settings(
-        {
-            "searchableAttributes": ["title", "content"],
-            "displayedAttributes": ["id", "title", "url"],
-        }
-    )
+    questions_index = store.meili.index(get_index_name(store))
+    questions_index.update_settings(INDEX_SETTINGS)
+
+
+@click.command("reconcile_counters")
+@with_appcontext
+def reconcile_counters() -> None:
+    drifted = repo.counter.reconcile(store)
+    click.echo(f"Counters reconciled, {drifted} drifted")
+
+
+@click.command("reconcile_scores")
+@with_appcontext
+def reconcile_scores() -> None:
+    entries, users = repo.vote.reconcile_scores(store)
+    click.echo(f"Scores reconciled, fixed {entries} entries and {users} users")
+
+
+@click.command("reconcile_answer_counts")
+@with_appcontext
+def reconcile_answer_counts() -> None:
+    fixed = repo.question.reconcile_answer_counts(store)
+    click.echo(f"Answer counts reconciled, fixed {fixed} questions")
+
+
+@click.command("reconcile_user_counts")
+@with_appcontext
+def reconcile_user_counts() -> None:
+    fixed = repo.user.reconcile_entry_counts(store)
+    click.echo(f"User question and answer counts reconciled, fixed {fixed} users")
+
+
+@click.command("page_cache_stats")
+@with_appcontext
+def page_cache_stats() -> None:
+    stats = repo.page_cache.stats(store)
+    total = stats["hits"] + stats["misses"]
+    ratio = stats["hits"] / total if total else 0
+    click.echo(f"Hits {stats['hits']}, misses {stats['misses']}, hit ratio {ratio:.1%}")
+
+
+@click.command("invalidate_tags")
+@with_appcontext
+def invalidate_tags() -> None:
+    repo.tag.invalidate(store)
+    click.echo("Tags will be reloaded by all processes")
+
+
+@click.command("view_recorder_stats")
+@with_appcontext
+def view_recorder_stats() -> None:
+    for stats in repo.view_recorder.collect_stats():
+        click.echo(
+            f"{stats['name']}: depth {stats['depth']}, flushed {stats['flushed']}, "
+            f"dropped {stats['dropped']}, errors {stats['errors']}, "
+            f"last flush {stats['last_flush_ms']} ms, max {stats['max_flush_ms']} ms"
+        )
+
+
+@click.command("snapshot_view_counts")
+@click.option("--all", "all_", is_flag=True, help="Include questions not viewed lately")
+@click.option("--batch-size", default=1000, help="Questions per update")
+@with_appcontext
+def snapshot_view_counts(all_: bool, batch_size: int) -> None:
+    if all_:
+        updated = sum(repo.question.backfill_view_counts(store, batch_size))
+    else:
+        updated = repo.question.snapshot_view_counts(store, batch_size)
+    click.echo(f"View counts saved, updated {updated} questions")
+
+
+@click.command("rebuild_hot_ranking")
+@with_appcontext
+def rebuild_hot_ranking() -> None:
+    size = repo.hot.rebuild(store)
+    click.echo(f"Hot ranking rebuilt with {size} questions")
+
+
+@click.command("password_hasher_stats")
+@with_appcontext
+def password_hasher_stats() -> None:
+    for stats in hasher.collect_stats():
+        click.echo(
+            f"{stats['name']}: hash {stats['hash_count']} calls, "
+            f"avg {stats['hash_avg_ms']} ms, max {stats['hash_max_ms']} ms; "
+            f"verify {stats['verify_count']} calls, "
+            f"avg {stats['verify_avg_ms']} ms, max {stats['verify_max_ms']} ms; "
+            f"rejected {stats['rejected']}"
+        )
+
+
+@click.command("worker_stats")
+@with_appcontext
+def worker_stats() -> None:
+    for name, stats in queue_stats().items():
+        click.echo(
+            f"{name}: {stats['queued']} queued, {stats['started']} started, "
+            f"{stats['scheduled']} scheduled, {stats['workers']} workers; "
+            f"finished {stats['finished']}, failed {stats['failed']}, "
+            f"{stats['throughput']} jobs/s"
+        )
 
 
 def init_app(app: Flask) -> None:
     app.cli.add_command(create_user)
     app.cli.add_command(update_search_indexes)
+    app.cli.add_command(flush_search_index)
     app.cli.add_command(configure_search_indexes)
+    app.cli.add_command(reconcile_counters)
+    app.cli.add_command(reconcile_scores)
+    app.cli.add_command(reconcile_answer_counts)
+    app.cli.add_command(reconcile_user_counts)
+    app.cli.add_command(page_cache_stats)
+    app.cli.add_command(invalidate_tags)
+    app.cli.add_command(view_recorder_stats)
+    app.cli.add_command(snapshot_view_counts)
+    app.cli.add_command(rebuild_hot_ranking)
+    app.cli.add_command(password_hasher_stats)
+    app.cli.add_command(worker_stats)
@@ -1,5 +1,5 @@
 from pathlib import Path
-from typing import Optional
+from typing import Dict, Optional
 
 from pydantic import BaseSettings
 
@@ -16,28 +16,94 @@ class Settings(BaseSettings):
     DB_PASSWORD: str = "healthqa"
     DB_HOST: str = "localhost"
     DB_PORT: str = "5432"
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: int = 30
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
     SQLALCHEMY_LOGGING_LEVEL: str = "DEBUG"
 
     EXPLAIN_TEMPLATE_LOADING: bool = False
 
     BCRYPT_ROUNDS: int = 12
+    PASSWORD_HASH_WORKERS: int = 2
+    PASSWORD_HASH_QUEUE_SIZE: int = 4
+    PASSWORD_HASH_TIMEOUT: float = 5
+    PASSWORD_HASH_STATS_INTERVAL: float = 10
     WTF_CSRF_ENABLED: bool = True
 
     PAGINATION: int = 20
 
+    PAGE_CACHE_TTL: int = 300
+    TAGS_SNAPSHOT_MAX_AGE: int = 10
+    USER_CACHE_TTL: int = 300
+    USER_CACHE_LOCAL_TTL: float = 5
+    USER_CACHE_LOCAL_SIZE: int = 10000
+
+    COUNTER_RECONCILE_INTERVAL: int = 3600
+
+    FEED_SIZE: int = 20
+    FEED_TTL: int = 600
+
+    VIEW_RECORDER_BACKGROUND: bool = True
+    VIEW_RECORDER_BATCH_SIZE: int = 500
+    VIEW_RECORDER_MAX_SIZE: int = 50000
+    VIEW_RECORDER_INTERVAL: float = 2
+    VIEW_COUNT_SNAPSHOT_INTERVAL: int = 60
+    VIEW_COUNT_SNAPSHOT_BATCH_SIZE: int = 1000
+
+    HOT_SIZE: int = 10000
+    HOT_HALF_LIFE: int = 86400
+    HOT_RENORMALIZE_INTERVAL: int = 3600
+    HOT_QUESTION_WEIGHT: float = 1
+    HOT_VOTE_WEIGHT: float = 1
+    HOT_ANSWER_WEIGHT: float = 2
+    HOT_VIEW_WEIGHT: float = 0.1
+
     REDIS_HOST: str = "localhost"
     REDIS_PORT: int = 6379
     REDIS_RQ_DB: int = 0
     REDIS_MAIN_DB: int = 1
+    REDIS_MAX_CONNECTIONS: int = 50
+    REDIS_SOCKET_TIMEOUT: float = 5
+    REDIS_SOCKET_CONNECT_TIMEOUT: float = 2
+
+    # comma separated queues, in the order of priority, and numbers of processes
+    # listening to them. "default" is drained of jobs enqueued before queues
+    # were split
+    WORKER_POOLS: Dict[str, int] = {
+        "email": 1,
+        "search": 1,
+        "maintenance,default": 1,
+    }
+    WORKER_STATS_INTERVAL: int = 60
+    WORKER_SHUTDOWN_TIMEOUT: int = 30
+    # workers exiting sooner after start are restarted with growing delays
+    WORKER_MIN_UPTIME: int = 10
+    WORKER_RESTART_MAX_DELAY: int = 60
+    WORKER_MAX_JOBS: int = 10000
 
     MEILI_HOST: str = "localhost"
     MEILI_PORT: int = 7700
     MEILI_API_KEY: Optional[str] = None
+    MEILI_TIMEOUT: int = 1
+
+    SEARCH_BACKEND: str = "meili"
+    SEARCH_FALLBACK_COOLDOWN: float = 30
+    SEARCH_INDEX_FLUSH_INTERVAL: int = 5
+    SEARCH_INDEX_BATCH_SIZE: int = 500
+    SEARCH_REINDEX_TIMEOUT: int = 600
 
     EMAIL_HOST: str = "smtp.yandex.com"
     EMAIL_PORT: int = 465
     EMAIL_USER: str = ""
     EMAIL_PASSWORD: str = ""
+    EMAIL_USE_SSL: bool = True
+    EMAIL_TIMEOUT: float = 10
+    EMAIL_HEALTH_CHECK_INTERVAL: float = 30
+    EMAIL_BATCH_SIZE: int = 50
+    EMAIL_RETRY_DELAY: int = 30
+    EMAIL_SENDING_TIMEOUT: int = 300
 
     TOKEN_MAX_AGE_EMAIL_VERIFICATION = 3600 * 24 * 7
     TOKEN_MAX_AGE_PASSWORD_RESET = 3600 * 3
@@ -1,9 +1,10 @@
 from __future__ import annotations
 
-from typing import TYPE_CHECKING, Tuple
+from typing import TYPE_CHECKING, Dict, Tuple
 
 from flask import render_template
 
+from auth.security import HasherBusyError
 from repository.exceptions import NotFoundError
 
 if TYPE_CHECKING:
@@ -18,7 +19,12 @@ def handle_500(e: Exception) -> Tuple[str, int]:
     return render_template("500.html"), 500
 
 
+def handle_busy(e: Exception) -> Tuple[str, int, Dict[str, str]]:
+    return render_template("503.html"), 503, {"Retry-After": "5"}
+
+
 def init_app(app: Flask) -> None:
     app.register_error_handler(404, handle_404)
     app.register_error_handler(NotFoundError, handle_404)
     app.register_error_handler(500, handle_500)
+    app.register_error_handler(HasherBusyError, handle_busy)
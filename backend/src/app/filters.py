@@ -1,25 +1,49 @@
 from datetime import datetime
-from typing import Union
+from typing import Optional, Union
 from urllib.parse import parse_qs, urlencode, urlparse
 
 import timeago
 from flask.app import Flask
 
 
-def to_page(url: str, page_number: Union[str, int]) -> str:
+PAGINATION_PARAMS = ("page", "after", "before")
+
+
+def _with_pagination(url: str, **values: str) -> str:
     parsed = urlparse(url)
 
     params = parse_qs(parsed.query)
-    params["page"] = [str(page_number)]
+    for key in PAGINATION_PARAMS:
+        if key in values:
+            params[key] = [values[key]]
+        else:
+            params.pop(key, None)
     query = urlencode(params, doseq=True)
 
     return parsed._replace(query=query).geturl()
 
 
+def to_page(url: str, page_number: Union[str, int]) -> str:
+    return _with_pagination(url, page=str(page_number))
+
+
+def to_cursor(
+    url: str, *, after: Optional[str] = None, before: Optional[str] = None
+) -> str:
+    values = {}
+    if after:
+        values["after"] = after
+    if before:
+        values["before"] = before
+
+    return _with_pagination(url, **values)
+
+
 def time_ago(dt: datetime) -> str:
     return timeago.format(dt, now=datetime.utcnow())
 
 
 def init_app(app: Flask) -> None:
     app.jinja_env.filters["to_page"] = to_page
+    app.jinja_env.filters["to_cursor"] = to_cursor
     app.jinja_env.filters["time_ago"] = time_ago
@@ -16,4 +16,4 @@ login_manager.login_view = "auth.login"
 
 @login_manager.user_loader
 def load_user(user_id: str) -> Optional[User]:
-    return repo.user.first_with_password(store, int(user_id))
+    return repo.user.get_for_session(store, int(user_id))
@@ -1,28 +1,253 @@
-from typing import cast
+import logging
+import multiprocessing
+import os
+import socket
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, List, Optional, TypeVar, cast
 
 import bcrypt
 from itsdangerous.exc import BadSignature, SignatureExpired
 from itsdangerous.url_safe import URLSafeTimedSerializer
+from redis.exceptions import RedisError
 
 from app.config import settings
+from storage.redis import create_redis
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class HasherBusyError(Exception):
+    """All password hashing slots are taken"""
+
+
+class HasherTimeoutError(HasherBusyError):
+    """Password hashing took longer than PASSWORD_HASH_TIMEOUT"""
+
+
+def _hash(password: bytes, rounds: int) -> bytes:
+    return bcrypt.hashpw(password, bcrypt.gensalt(rounds))
+
+
+def _check(password: bytes, hashed: bytes) -> bool:
+    try:
+        return bcrypt.checkpw(password, hashed)
+    except ValueError:
+        return False
+
+
+class PasswordHasher:
+    """
+    Runs bcrypt in a pool of PASSWORD_HASH_WORKERS processes, so that a burst
+    of logins and signups does not take CPU from page views of the worker.
+    At most PASSWORD_HASH_QUEUE_SIZE more calls wait for the pool, further
+    ones fail right away with HasherBusyError.
+    A slot is taken until bcrypt finishes in the pool, even when the caller
+    gave up waiting after PASSWORD_HASH_TIMEOUT with HasherTimeoutError.
+    With PASSWORD_HASH_WORKERS = 0 bcrypt runs in the calling thread.
+    Stats are kept in process and published at most every
+    PASSWORD_HASH_STATS_INTERVAL seconds
+    """
+
+    STATS_KEY_PREFIX = "auth:hasher:"
+
+    def __init__(self) -> None:
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pid: Optional[int] = None
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self._max_calls())
+
+        self.timings: Dict[str, Dict[str, float]] = {
+            "hash": {"count": 0, "total_ms": 0.0, "max_ms": 0.0},
+            "verify": {"count": 0, "total_ms": 0.0, "max_ms": 0.0},
+        }
+        self.rejected = 0
+        self.timeouts = 0
+        self._published_at: Optional[float] = None
+        # stats are updated by all request threads of the process
+        self._stats_lock = threading.Lock()
+
+    def hash(self, raw_password: str) -> str:
+        hashed = self._call(
+            "hash", _hash, raw_password.encode("utf-8"), settings.BCRYPT_ROUNDS
+        )
+        return hashed.decode("utf-8")
+
+    def verify(self, password: str, hashed: str) -> bool:
+        return self._call(
+            "verify", _check, password.encode("utf-8"), hashed.encode("utf-8")
+        )
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._pool is not None and self._pid == os.getpid():
+                self._pool.shutdown(cancel_futures=True)
+            self._pool = None
+            self._pid = None
+
+        if self._published_at is not None:
+            self._publish_stats()
+
+    def stats(self) -> Dict[str, float]:
+        with self._stats_lock:
+            result: Dict[str, float] = {
+                "rejected": self.rejected,
+                "timeouts": self.timeouts,
+            }
+            for name, timing in self.timings.items():
+                count = timing["count"]
+                result[f"{name}_count"] = count
+                result[f"{name}_avg_ms"] = round(timing["total_ms"] / max(count, 1), 2)
+                result[f"{name}_max_ms"] = round(timing["max_ms"], 2)
+        return result
+
+    def collect_stats(self) -> List[Dict[str, str]]:
+        """Stats of all processes, published after their calls"""
+        redis = create_redis()
+
+        start = len(self.STATS_KEY_PREFIX)
+
+        result = []
+        for key in redis.scan_iter(match=f"{self.STATS_KEY_PREFIX}*"):
+            values = redis.hgetall(key)
+            if values:
+                stats = {k.decode("utf-8"): v.decode("utf-8") for k, v in values.items()}
+                stats["name"] = key.decode("utf-8")[start:]
+                result.append(stats)
+
+        return result
+
+    @staticmethod
+    def _max_calls() -> int:
+        return max(settings.PASSWORD_HASH_WORKERS, 1) + settings.PASSWORD_HASH_QUEUE_SIZE
+
+    def _call(self, name: str, func: Callable[..., T], *args: Any) -> T:
+        if not self._slots.acquire(blocking=False):
+            with self._stats_lock:
+                self.rejected += 1
+            self._maybe_publish_stats()
+            raise HasherBusyError()
+
+        release = True
+        pool = None
+        started_at = time.perf_counter()
+        try:
+            pool = self._get_pool()
+            if pool is None:
+                return func(*args)
+
+            future = pool.submit(func, *args)
+            # the slot is released when bcrypt is done, not when the caller
+            # stops waiting, so timed out calls still count against the pool
+            future.add_done_callback(lambda _: self._slots.release())
+            release = False
+
+            return future.result(timeout=settings.PASSWORD_HASH_TIMEOUT)
+        except FutureTimeoutError:
+            future.cancel()
+            with self._stats_lock:
+                self.timeouts += 1
+            raise HasherTimeoutError()
+        except BrokenProcessPool:
+            # a pool process died, e.g. killed for memory, and the pool takes
+            # no more calls, so the next call starts a new one
+            logger.exception("Password hashing pool is broken")
+            if pool is not None:
+                self._discard_pool(pool)
+            raise HasherBusyError()
+        finally:
+            if release:
+                self._slots.release()
+            self._record(name, (time.perf_counter() - started_at) * 1000)
+
+    def _discard_pool(self, pool: ProcessPoolExecutor) -> None:
+        with self._lock:
+            if self._pool is pool:
+                self._pool = None
+                self._pid = None
+
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def _get_pool(self) -> Optional[ProcessPoolExecutor]:
+        if not settings.PASSWORD_HASH_WORKERS:
+            return None
+
+        pid = os.getpid()
+        if self._pid == pid:
+            return self._pool
+
+        with self._lock:
+            if self._pid != pid:
+                # pools do not survive fork, so each worker starts its own.
+                # Pool processes are spawned, as forking a process with
+                # running threads is not safe
+                self._pool = ProcessPoolExecutor(
+                    max_workers=settings.PASSWORD_HASH_WORKERS,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+                self._pid = pid
+
+        return self._pool
+
+    def _record(self, name: str, duration_ms: float) -> None:
+        with self._stats_lock:
+            timing = self.timings[name]
+            timing["count"] += 1
+            timing["total_ms"] += duration_ms
+            timing["max_ms"] = max(timing["max_ms"], duration_ms)
+
+        self._maybe_publish_stats()
+
+    def _maybe_publish_stats(self) -> None:
+        now = time.monotonic()
+        with self._stats_lock:
+            if (
+                self._published_at is not None
+                and now - self._published_at < settings.PASSWORD_HASH_STATS_INTERVAL
+            ):
+                return
+
+            self._published_at = now
+
+        self._publish_stats()
+
+    def _publish_stats(self) -> None:
+        key = f"{self.STATS_KEY_PREFIX}{socket.gethostname()}:{os.getpid()}"
+
+        try:
+            pipe = create_redis().pipeline(transaction=False)
+            pipe.hset(key, mapping=self.stats())
+            pipe.expire(key, 86400)
+            pipe.execute()
+        except RedisError:
+            logger.exception("Failed to publish password hasher stats")
+
+
+hasher = PasswordHasher()
 
 
 def hash_password(raw_password: str) -> str:
-    return bcrypt.hashpw(
-        raw_password.encode("utf-8"),
-        bcrypt.gensalt(settings.BCRYPT_ROUNDS),
-    ).decode("utf-8")
+    return hasher.hash(raw_password)
 
 
 def check_password(password: str, hashed: str) -> bool:
+    return hasher.verify(password, hashed)
+
+
+def needs_rehash(hashed: str) -> bool:
+    """Check if the hash was made with other than current BCRYPT_ROUNDS"""
     try:
-        return bcrypt.checkpw(
-            password.encode("utf-8"),
-            hashed.encode("utf-8"),
-        )
-    except ValueError:
+        rounds = int(hashed.split("$")[2])
+    except (IndexError, ValueError):
         return False
 
+    return rounds != settings.BCRYPT_ROUNDS
+
 
 def make_url_safe_token(user_id: int) -> str:
     signer = URLSafeTimedSerializer(settings.SECRET_KEY)
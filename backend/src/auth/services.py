@@ -1,10 +1,9 @@
 from flask import url_for
 
 from auth import security
-from mail.sender import send_templated_email
+from mail.outbox import outbox
 from mail.template import EmailTemplate
 from models.user import User
-from worker import queue
 
 
 def generate_and_send_verification_link(user: User) -> None:
@@ -12,8 +11,7 @@ def generate_and_send_verification_link(user: User) -> None:
     url = url_for("auth.verify_email", token=token, _external=True)
     email_context = dict(name=user.name, url=url)
 
-    queue.enqueue(
-        send_templated_email,
+    outbox.add(
         to=user.email,
         subject="Account activation",
         template=EmailTemplate.VERIFY_EMAIL,
@@ -26,8 +24,7 @@ def generate_and_send_password_reset_link(user: User) -> None:
     url = url_for("auth.reset_password", token=token, _external=True)
     email_context = dict(name=user.name, url=url)
 
-    queue.enqueue(
-        send_templated_email,
+    outbox.add(
         to=user.email,
         subject="Password reset",
         template=EmailTemplate.RESET_PASSWORD,
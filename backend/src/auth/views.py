@@ -16,6 +16,7 @@ from auth.services import (
     generate_and_send_password_reset_link,
     generate_and_send_verification_link,
 )
+from models import User
 from repository.exceptions import AlreadyExistsError, NotFoundError
 from storage import store
 
@@ -37,6 +38,9 @@ def login():
             pass
         else:
             if security.check_password(form.password.data, user.password):
+                if security.needs_rehash(user.password):
+                    _rehash_password(user, form.password.data)
+
                 if not user.email_verified:
                     generate_and_send_verification_link(user)
                     return redirect(url_for("auth.verification_required"))
@@ -49,6 +53,14 @@ def login():
     return render_template("auth/login.html", form=form, error=error)
 
 
+def _rehash_password(user: User, password: str) -> None:
+    """Hash the password with current rounds, later if hashing is busy now"""
+    try:
+        repo.user.change_password(store, user, new_password=password)
+    except security.HasherBusyError:
+        pass
+
+
 @bp.route("/signup", methods=["GET", "POST"])
 def signup():
     if current_user.is_authenticated:
@@ -0,0 +1,192 @@
+"""
+Compare loading of a large question page with the legacy joined queries,
+which return a row per answer and comment combination, and with the flat
+loader fetching each kind of entries by a separate query. The legacy
+queries are kept here only for the comparison.
+
+    python -m benchmarks.details --answers 200 --comments 20
+
+The thread is inserted in one transaction which is rolled back
+"""
+from typing import Any, Callable, Dict, List
+
+import click
+from sqlalchemy import event, text
+from sqlalchemy.orm import aliased, contains_eager
+from sqlalchemy.sql.expression import and_
+
+import repository as repo
+from app.main import app
+from benchmarks.seed import get_or_create_user
+from benchmarks.utils import measure, quiet_sql_logging, report
+from models import Answer, Comment, Question, User, Vote
+from storage import store
+
+SEED_THREAD_SQL = """
+    WITH question_entry AS (
+        INSERT INTO entries (type, created_at, user_id, score)
+        VALUES (1, now(), :user_id, 0)
+        RETURNING id
+    ), question AS (
+        INSERT INTO questions (id, title, slug, content)
+        SELECT id, 'Benchmark thread', 'benchmark-thread', '<p>Thread</p>'
+        FROM question_entry
+        RETURNING id
+    ), answer_entries AS (
+        INSERT INTO entries (type, created_at, user_id, score)
+        SELECT 2, now(), :user_id, g % 10 FROM generate_series(1, :answers) g
+        RETURNING id
+    ), answers AS (
+        INSERT INTO answers (id, question_id, content)
+        SELECT answer_entries.id, question.id, '<p>Answer</p>'
+        FROM answer_entries, question
+        RETURNING id
+    ), parents AS (
+        SELECT id FROM question UNION ALL SELECT id FROM answers
+    ), comment_entries AS (
+        INSERT INTO entries (type, created_at, user_id, score)
+        SELECT 3, now(), :user_id, 0
+        FROM parents, generate_series(1, :comments)
+        RETURNING id
+    )
+    INSERT INTO comments (id, entry_id, content)
+    SELECT comment_entries.id, parents.id, 'Comment'
+    FROM (SELECT id, row_number() OVER (ORDER BY id) AS n FROM comment_entries)
+        AS comment_entries
+    JOIN (SELECT id, row_number() OVER (ORDER BY id) - 1 AS n FROM parents)
+        AS parents ON parents.n = (comment_entries.n - 1) / :comments
+    RETURNING (SELECT id FROM question)
+"""
+
+
+def legacy_question(question_id: int, user_id: int) -> Question:
+    CommentUser = aliased(User)
+    CommentVote = aliased(Vote)
+
+    return (
+        store.db.query(Question)
+        .join(User, Question.user_id == User.id)
+        .outerjoin(Vote, and_(Vote.entry_id == Question.id, Vote.user_id == user_id))
+        .outerjoin(
+            Comment,
+            and_(Comment.entry_id == Question.id, Comment.deleted_at.is_(None)),
+        )
+        .order_by(Comment.id)
+        .outerjoin(
+            CommentVote,
+            and_(CommentVote.entry_id == Comment.id, CommentVote.user_id == user_id),
+        )
+        .outerjoin(CommentUser, Comment.user_id == CommentUser.id)
+        .options(
+            contains_eager(Question.user),
+            contains_eager(Question.user_vote),
+            contains_eager(Question.comments).contains_eager(
+                Comment.user.of_type(CommentUser)
+            ),
+            contains_eager(Question.comments).contains_eager(
+                Comment.user_vote.of_type(CommentVote)
+            ),
+        )
+        .filter(Question.id == question_id, Question.deleted_at.is_(None))
+        .one()
+    )
+
+
+def legacy_answers(question_id: int, user_id: int) -> List[Answer]:
+    CommentVote = aliased(Vote)
+    CommentUser = aliased(User)
+
+    return (
+        store.db.query(Answer)
+        .join(User, Answer.user_id == User.id)
+        .outerjoin(Vote, and_(Vote.entry_id == Answer.id, Vote.user_id == user_id))
+        .outerjoin(Comment, Comment.entry_id == Answer.id)
+        .outerjoin(CommentUser, CommentUser.id == Comment.user_id)
+        .outerjoin(
+            CommentVote,
+            and_(CommentVote.entry_id == Comment.id, CommentVote.user_id == user_id),
+        )
+        .options(
+            contains_eager(Answer.user),
+            contains_eager(Answer.user_vote),
+            contains_eager(Answer.comments).contains_eager(
+                Comment.user.of_type(CommentUser)
+            ),
+            contains_eager(Answer.comments).contains_eager(
+                Comment.user_vote.of_type(CommentVote)
+            ),
+        )
+        .filter(Answer.question_id == question_id, Answer.deleted_at.is_(None))
+        .order_by(Answer.score.desc(), Answer.id.desc(), Comment.id)
+        .all()
+    )
+
+
+def legacy(question_id: int, user_id: int) -> None:
+    legacy_question(question_id, user_id)
+    legacy_answers(question_id, user_id)
+    repo.question.get_view_count(store, question_id)
+
+
+def flat(question_id: int, user_id: int) -> None:
+    repo.question.get_details(store, question_id, user_id=user_id)
+
+
+def count_rows(func: Callable[[], None]) -> Dict[str, int]:
+    stats = {"queries": 0, "rows": 0}
+
+    def after_execute(conn: Any, cursor: Any, *args: Any) -> None:
+        stats["queries"] += 1
+        stats["rows"] += max(cursor.rowcount, 0)
+
+    engine = store.db.get_bind()
+    event.listen(engine, "after_cursor_execute", after_execute)
+    try:
+        func()
+    finally:
+        event.remove(engine, "after_cursor_execute", after_execute)
+
+    return stats
+
+
+@click.command()
+@click.option("--answers", default=200, help="Number of answers in the thread")
+@click.option("--comments", default=20, help="Comments per question and answer")
+@click.option("--runs", default=20, help="Page loads per measurement")
+def main(answers: int, comments: int, runs: int) -> None:
+    quiet_sql_logging()
+
+    with app.app_context():
+        user = get_or_create_user(store)
+        user_id = user.id
+
+        try:
+            question_id = store.db.execute(
+                text(SEED_THREAD_SQL),
+                {"user_id": user_id, "answers": answers, "comments": comments},
+            ).scalar()
+            for table in ("entries", "answers", "comments"):
+                store.db.execute(text(f"ANALYZE {table}"))
+
+            click.echo(
+                f"Question with {answers} answers, {comments} comments each, "
+                f"{runs} loads per measurement\n"
+            )
+
+            for name, loader in (("legacy (joined)", legacy), ("flat", flat)):
+
+                def load() -> None:
+                    store.db.expunge_all()
+                    loader(question_id, user_id)
+
+                report(f"  {name}", measure(load, runs=runs))
+                stats = count_rows(load)
+                click.echo(
+                    f"{'':<32} {stats['queries']} queries, {stats['rows']} rows"
+                )
+        finally:
+            store.db.rollback()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Compare throughput of RQ jobs executed by a worker forking for every job,
+as the worker used to, by a forking worker with the app imported in advance,
+and by the warm worker running jobs in its own bootstrapped process.
+
+    python -m benchmarks.jobs --jobs 500
+
+Jobs are put on a "benchmark" queue of REDIS_RQ_DB and read a question from
+the database and a key from Redis, like small maintenance jobs do
+"""
+import multiprocessing
+import time
+from multiprocessing.queues import Queue as ResultQueue
+from typing import Tuple
+
+import click
+from redis import Redis
+from rq import Queue
+from sqlalchemy import text
+
+from app.config import settings
+from storage import store
+from worker import CountingWorker, WarmWorker, bootstrap, job
+
+QUEUE = "benchmark"
+
+MODES = {
+    "fork": "fork per job",
+    "preload": "fork per job, app preloaded",
+    "warm": "warm worker",
+}
+
+
+@job
+def read_question() -> None:
+    store.db.execute(text("SELECT id, title FROM questions LIMIT 1")).first()
+    store.redis.get("benchmark:jobs")
+
+
+def create_connection() -> Redis:
+    return Redis(
+        host=settings.REDIS_HOST, port=settings.REDIS_PORT, db=settings.REDIS_RQ_DB
+    )
+
+
+def run_worker(mode: str, results: ResultQueue) -> None:
+    """Drain the queue, reporting bootstrap and working times in seconds"""
+    started_at = time.perf_counter()
+
+    if mode != "fork":
+        bootstrap()
+    worker_class = WarmWorker if mode == "warm" else CountingWorker
+
+    connection = create_connection()
+    worker = worker_class([Queue(QUEUE, connection=connection)], connection=connection)
+    ready_at = time.perf_counter()
+
+    worker.work(burst=True, logging_level="WARNING")
+
+    results.put((ready_at - started_at, time.perf_counter() - ready_at))
+
+
+def measure_mode(mode: str, jobs: int) -> Tuple[float, float]:
+    queue = Queue(QUEUE, connection=create_connection())
+    queue.empty()
+    for _ in range(jobs):
+        # by name, as functions of __main__ cannot be imported by workers
+        queue.enqueue(f"benchmarks.jobs.{read_question.__name__}")
+
+    # a fresh process, so modules imported here are not inherited
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    process = context.Process(target=run_worker, args=(mode, results))
+    process.start()
+    bootstrap_time, work_time = results.get()
+    process.join()
+
+    return bootstrap_time, work_time
+
+
+@click.command()
+@click.option("--jobs", default=200, help="Jobs per worker")
+def main(jobs: int) -> None:
+    click.echo(f"Running {jobs} jobs per worker\n")
+
+    for mode, name in MODES.items():
+        bootstrap_time, work_time = measure_mode(mode, jobs)
+        click.echo(
+            f"{name:<32} bootstrap {bootstrap_time * 1000:9.2f} ms"
+            f"   {jobs / work_time:9.2f} jobs/s"
+            f"   {work_time * 1000 / jobs:9.2f} ms per job"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Compare latency of the legacy and the indexed question search, and,
+with --meili, of the search served by the configured Meilisearch instance
+with hydration of results from the database.
+
+    python -m benchmarks.search --seed 100000
+    python -m benchmarks.search --meili
+
+Seeding inserts questions into the configured database, point DB_NAME
+to a disposable database before running it. Meilisearch has to be indexed
+beforehand, with `flask update_search_indexes`
+"""
+from typing import Any, Dict, List
+
+import click
+from meilisearch.errors import MeiliSearchCommunicationError
+from sqlalchemy.sql.expression import or_
+
+import repository as repo
+from app.main import app
+from benchmarks.seed import seed_questions
+from benchmarks.utils import measure, quiet_sql_logging, report
+from models import Question
+from repository.search import MeiliSearchBackend, PostgresSearchBackend, SearchBackend
+from storage import store
+
+QUERIES = [
+    "back pain",
+    "sciatica",
+    "lower back stretch",
+    "neck stiffness morning",
+    '"chronic pain"',
+]
+
+
+def legacy_search(query: str, per_page: int) -> List[Any]:
+    """Search as it was implemented before the stored search vector"""
+    cleaned = "&".join(query.replace("\\", "").replace('"', "").strip().split(" "))
+    filters = [
+        or_(Question.title.match(cleaned), Question.content.match(cleaned)),
+        Question.deleted_at.is_(None),
+    ]
+
+    store.db.query(Question.id).filter(*filters).count()
+    return (
+        store.db.query(Question)
+        .filter(*filters)
+        .order_by(Question.id.desc())
+        .limit(per_page)
+        .all()
+    )
+
+
+@click.command()
+@click.option("--seed", default=0, help="Number of questions to insert first")
+@click.option("--runs", default=10, help="Runs per query")
+@click.option("--per-page", default=16)
+@click.option("--meili", is_flag=True, help="Include the Meilisearch instance")
+def main(seed: int, runs: int, per_page: int, meili: bool) -> None:
+    quiet_sql_logging()
+
+    with app.app_context():
+        if seed:
+            click.echo(f"Seeding {seed} questions")
+            seed_questions(store, seed)
+
+        total = store.db.query(Question.id).count()
+        click.echo(f"Searching over {total} questions, {runs} runs per query\n")
+
+        backends: Dict[str, SearchBackend] = {
+            "tsvector + GIN + ts_rank": PostgresSearchBackend(),
+        }
+        if meili:
+            try:
+                store.meili.health()
+            except MeiliSearchCommunicationError:
+                raise click.ClickException("Meilisearch is not reachable")
+            backends["meilisearch + IN hydration"] = MeiliSearchBackend()
+
+        for query in QUERIES:
+            click.echo(f"Query: {query}")
+
+            legacy = measure(lambda: legacy_search(query, per_page), runs=runs)
+            report("  legacy (match, no index)", legacy)
+
+            for name, backend in backends.items():
+                repo.question.search_backend = backend
+                result = measure(
+                    lambda: repo.question.search(store, query, per_page=per_page),
+                    runs=runs,
+                )
+                report(f"  {name}", result)
+
+            store.db.rollback()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+from typing import Optional
+
+from sqlalchemy import text
+
+from models import User
+from storage.base import Store
+
+WORDS = [
+    "back",
+    "pain",
+    "spine",
+    "lower",
+    "upper",
+    "neck",
+    "disc",
+    "hernia",
+    "sciatica",
+    "posture",
+    "stretch",
+    "exercise",
+    "sitting",
+    "standing",
+    "walking",
+    "muscle",
+    "nerve",
+    "doctor",
+    "therapy",
+    "massage",
+    "yoga",
+    "morning",
+    "night",
+    "chronic",
+    "acute",
+    "shoulder",
+    "hip",
+    "leg",
+    "numbness",
+    "stiffness",
+    "surgery",
+    "treatment",
+    "mattress",
+    "workout",
+    "injury",
+    "recovery",
+]
+
+_RANDOM_TEXT = """
+    (
+        SELECT string_agg(
+            (:words)[1 + floor(random() * array_length(:words, 1))::int], ' '
+        )
+        FROM generate_series(1, {length})
+        WHERE new_entries.id > 0
+    )
+"""
+
+SEED_QUESTIONS_SQL = f"""
+    WITH new_entries AS (
+        INSERT INTO entries (type, created_at, user_id, score)
+        SELECT 1, now(), :user_id, 0 FROM generate_series(1, :count)
+        RETURNING id
+    )
+    INSERT INTO questions (id, title, slug, content)
+    SELECT
+        id,
+        {_RANDOM_TEXT.format(length=8)},
+        'benchmark',
+        '<p>' || {_RANDOM_TEXT.format(length=80)} || '</p>'
+    FROM new_entries
+"""
+
+
+def get_or_create_user(store: Store) -> User:
+    email = "benchmark@example.com"
+
+    user: Optional[User] = store.db.query(User).filter(User.email == email).first()
+    if user is None:
+        user = User(email=email, name="Benchmark", email_verified=True)
+        store.db.add(user)
+        store.db.commit()
+
+    return user
+
+
+def seed_questions(store: Store, count: int, *, batch_size: int = 10000) -> None:
+    """Bulk insert questions with random text built from WORDS"""
+    user = get_or_create_user(store)
+
+    remaining = count
+    while remaining > 0:
+        batch = min(batch_size, remaining)
+        store.db.execute(
+            text(SEED_QUESTIONS_SQL),
+            {"user_id": user.id, "count": batch, "words": WORDS},
+        )
+        store.db.commit()
+        remaining -= batch
+
+    store.db.execute(text("ANALYZE entries"))
+    store.db.execute(text("ANALYZE questions"))
+    store.db.commit()
@@ -0,0 +1,43 @@
+import logging
+import statistics
+import time
+from typing import Any, Callable, Dict, List
+
+import click
+
+
+def quiet_sql_logging() -> None:
+    logging.getLogger("sqlalchemy.engine").setLevel(logging.WARNING)
+
+
+def measure(func: Callable[[], Any], *, runs: int, warmup: int = 1) -> List[float]:
+    """Call func repeatedly and return durations in milliseconds"""
+    for _ in range(warmup):
+        func()
+
+    durations = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        func()
+        durations.append((time.perf_counter() - start) * 1000)
+
+    return durations
+
+
+def summarize(durations: List[float]) -> Dict[str, float]:
+    ordered = sorted(durations)
+    p95_index = max(0, int(round(len(ordered) * 0.95)) - 1)
+
+    return {
+        "median": statistics.median(ordered),
+        "p95": ordered[p95_index],
+        "max": ordered[-1],
+    }
+
+
+def report(name: str, durations: List[float]) -> None:
+    stats = summarize(durations)
+    click.echo(
+        f"{name:<32} median {stats['median']:9.2f} ms"
+        f"   p95 {stats['p95']:9.2f} ms   max {stats['max']:9.2f} ms"
+    )
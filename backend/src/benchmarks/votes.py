@@ -0,0 +1,144 @@
+"""
+Compare latency of a single vote with the legacy score trigger, which
+re-aggregates all votes of the entry and all entries of the author,
+and with the delta trigger, as vote history grows.
+
+    python -m benchmarks.votes --seed 100000
+
+The author of the voted entry is the benchmark user owning the seeded
+questions. Everything is done in one transaction which is rolled back
+"""
+from typing import List
+
+import click
+from sqlalchemy import text
+
+from app.main import app
+from benchmarks.seed import get_or_create_user, seed_questions
+from benchmarks.utils import measure, quiet_sql_logging, report
+from models import Entry
+from storage import store
+
+LEGACY_UPDATE_SCORE = """
+    CREATE OR REPLACE FUNCTION update_score() RETURNS TRIGGER AS $$
+        BEGIN
+            UPDATE entries
+                SET score = (
+                    SELECT COALESCE(SUM(value), 0)
+                    FROM votes
+                    WHERE entry_id = COALESCE(OLD.entry_id, NEW.entry_id)
+                )
+                WHERE id = COALESCE(OLD.entry_id, NEW.entry_id);
+            UPDATE users
+                SET score = (
+                    SELECT COALESCE(SUM(score), 0)
+                    FROM entries
+                    WHERE user_id = users.id
+                )
+                WHERE id = (
+                    SELECT user_id
+                    FROM entries
+                    WHERE id = COALESCE(OLD.entry_id, NEW.entry_id)
+                );
+            RETURN NULL;
+        END;
+    $$ LANGUAGE plpgsql;
+"""
+
+SEED_VOTES_SQL = """
+    WITH voters AS (
+        INSERT INTO users (email, name, email_verified, score, created_at, modified_at)
+        SELECT 'voter-' || :offset + g || '@example.com', 'Voter', true, 0, now(), now()
+        FROM generate_series(1, :count) g
+        RETURNING id
+    )
+    INSERT INTO votes (user_id, entry_id, value, created_at)
+    SELECT id, :entry_id, 1, now() FROM voters
+"""
+
+VOTER_SQL = """
+    INSERT INTO users (email, name, email_verified, score, created_at, modified_at)
+    VALUES ('voter@example.com', 'Voter', true, 0, now(), now())
+    RETURNING id
+"""
+
+
+def add_votes(entry_id: int, offset: int, count: int) -> None:
+    """Insert votes with the trigger disabled, as the legacy one is quadratic"""
+    store.db.execute(text("ALTER TABLE votes DISABLE TRIGGER update_score_tg"))
+    store.db.execute(
+        text(SEED_VOTES_SQL), {"entry_id": entry_id, "offset": offset, "count": count}
+    )
+    store.db.execute(text("ALTER TABLE votes ENABLE TRIGGER update_score_tg"))
+    store.db.execute(text("ANALYZE votes"))
+
+
+def vote_and_unvote(voter_id: int, entry_id: int) -> None:
+    params = {"user_id": voter_id, "entry_id": entry_id}
+    store.db.execute(
+        text(
+            "INSERT INTO votes (user_id, entry_id, value, created_at) "
+            "VALUES (:user_id, :entry_id, 1, now())"
+        ),
+        params,
+    )
+    store.db.execute(
+        text("DELETE FROM votes WHERE user_id = :user_id AND entry_id = :entry_id"),
+        params,
+    )
+
+
+@click.command()
+@click.option("--seed", default=0, help="Number of questions to insert first")
+@click.option("--runs", default=20, help="Votes per measurement")
+@click.option(
+    "--history",
+    default="0,1000,10000,100000",
+    help="Comma separated numbers of existing votes on the entry",
+)
+def main(seed: int, runs: int, history: str) -> None:
+    quiet_sql_logging()
+
+    sizes: List[int] = sorted(int(size) for size in history.split(","))
+
+    with app.app_context():
+        if seed:
+            click.echo(f"Seeding {seed} questions")
+            seed_questions(store, seed)
+
+        author = get_or_create_user(store)
+        entries = store.db.query(Entry.id).filter(Entry.user_id == author.id).count()
+        entry_id = (
+            store.db.query(Entry.id).filter(Entry.user_id == author.id).limit(1).scalar()
+        )
+        if entry_id is None:
+            raise click.ClickException("No entries of the author, pass --seed")
+
+        voter_id = store.db.execute(text(VOTER_SQL)).scalar()
+        delta_update_score = store.db.execute(
+            text("SELECT pg_get_functiondef('update_score'::regproc)")
+        ).scalar()
+
+        click.echo(f"Author has {entries} entries, {runs} votes per measurement\n")
+
+        votes = 0
+        try:
+            for size in sizes:
+                add_votes(entry_id, votes, size - votes)
+                votes = size
+
+                click.echo(f"Votes on the entry: {size}")
+
+                store.db.execute(text(LEGACY_UPDATE_SCORE))
+                legacy = measure(lambda: vote_and_unvote(voter_id, entry_id), runs=runs)
+                report("  legacy (re-aggregate)", legacy)
+
+                store.db.execute(text(delta_update_score))
+                delta = measure(lambda: vote_and_unvote(voter_id, entry_id), runs=runs)
+                report("  delta", delta)
+        finally:
+            store.db.rollback()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+from datetime import datetime, timezone
+from functools import wraps
+from typing import Any, Callable, Optional, Tuple, TypeVar, cast
+
+from flask import current_app, make_response, request, session
+from flask.wrappers import Response
+from flask_login import current_user
+from werkzeug.http import is_resource_modified
+
+import repository as repo
+from storage import store
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+Validators = Tuple[str, Optional[int]]
+
+
+def conditional(
+    get_validators: Callable[..., Optional[Validators]],
+    *,
+    on_not_modified: Optional[Callable[..., None]] = None,
+) -> Callable[[F], F]:
+    """
+    Make GET requests of anonymous visitors conditional.
+    `get_validators` is called with arguments of the view and returns an ETag
+    and a unix time of the last modification, or None if the page has no
+    validators. Matching requests get 304 before the view runs, so
+    `on_not_modified` is called with the same arguments instead, for side
+    effects the view has on every visit
+    """
+
+    def decorator(view: F) -> F:
+        @wraps(view)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            # pages of anonymous visitors are the same unless there are flashed messages
+            if (
+                request.method not in ("GET", "HEAD")
+                or current_user.is_authenticated
+                or "_flashes" in session
+            ):
+                return view(*args, **kwargs)
+
+            validators = get_validators(*args, **kwargs)
+            if validators is None:
+                return view(*args, **kwargs)
+
+            etag, timestamp = validators
+            last_modified = (
+                datetime.fromtimestamp(timestamp, timezone.utc) if timestamp else None
+            )
+
+            if not is_resource_modified(
+                request.environ, etag=etag, last_modified=last_modified
+            ):
+                response = current_app.response_class(status=304)
+                if on_not_modified is not None:
+                    on_not_modified(*args, **kwargs)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+
+            _set_validators(response, etag, last_modified)
+
+            return response
+
+        return cast(F, wrapper)
+
+    return decorator
+
+
+def list_validators(*args: Any, **kwargs: Any) -> Validators:
+    """Validators of pages listing questions or users, changed by all writes"""
+    version, modified = repo.page_cache.list_validators(store)
+    return f"lists-{version}", modified
+
+
+def _set_validators(
+    response: Response, etag: str, last_modified: Optional[datetime]
+) -> None:
+    response.set_etag(etag, weak=True)
+    if last_modified is not None:
+        response.last_modified = last_modified
+
+    # browsers have to revalidate, and pages of users are not shared
+    response.cache_control.no_cache = True
+    response.vary.add("Cookie")
@@ -1,4 +1,6 @@
-from typing import Generic, TypeVar
+import base64
+import json
+from typing import Any, Generic, Optional, Sequence, TypeVar
 
 from models import Base
 
@@ -10,15 +12,23 @@ class Paginator(Generic[ModelType]):
     total: int
     current: int
     n_pages: int
+    next_cursor: Optional[str]
 
     def __init__(
-        self, *, objects: list[ModelType], total: int, page: int, per_page: int
+        self,
+        *,
+        objects: list[ModelType],
+        total: int,
+        page: int,
+        per_page: int,
+        next_cursor: Optional[str] = None,
     ):
         self.objects = objects
         self.total = total
         self.page = max(page, 1)
         self.per_page = per_page
         self.n_pages = (total - 1) // per_page + 1
+        self.next_cursor = next_cursor
 
     @staticmethod
     def calc_offset(page: int, per_page: int) -> int:
@@ -44,3 +54,55 @@ class Paginator(Generic[ModelType]):
 
     def __bool__(self) -> bool:
         return self.n_pages > 1
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """Make opaque cursor token from ordering key values"""
+    data = json.dumps(list(values), separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(data).decode("utf-8").rstrip("=")
+
+
+def decode_cursor(token: str) -> list[Any]:
+    """Restore ordering key values from cursor token"""
+    padding = "=" * (-len(token) % 4)
+    try:
+        values = json.loads(base64.urlsafe_b64decode(token + padding))
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+
+    if not isinstance(values, list) or not values:
+        raise ValueError("Invalid cursor")
+
+    return values
+
+
+class CursorPaginator(Generic[ModelType]):
+    """Paginator for keyset pages, which are addressed by cursors instead of numbers"""
+
+    objects: list[ModelType]
+    next_cursor: Optional[str]
+    previous_cursor: Optional[str]
+
+    def __init__(
+        self,
+        *,
+        objects: list[ModelType],
+        per_page: int,
+        next_cursor: Optional[str] = None,
+        previous_cursor: Optional[str] = None,
+    ):
+        self.objects = objects
+        self.per_page = per_page
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    @property
+    def has_next(self) -> bool:
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self) -> bool:
+        return self.previous_cursor is not None
+
+    def __bool__(self) -> bool:
+        return self.has_next or self.has_previous
@@ -1,14 +1,16 @@
 from flask import Blueprint, render_template
 
 import repository as repo
+from common.conditional import conditional, list_validators
 from storage import store
 
 bp = Blueprint("home", __name__, template_folder="templates")
 
 
 @bp.route("/")
+@conditional(list_validators)
 def index():
-    questions = repo.question.all(store, limit=20)
+    questions = repo.feed.latest(store)
     return render_template("home/index.html", questions=questions)
 
 
@@ -0,0 +1,171 @@
+import json
+import logging
+import smtplib
+from datetime import timedelta
+from typing import Any, List, Tuple
+
+from redis import Redis
+
+from app.config import settings
+from mail.sender import DeliveryUnknownError, render_email, send_mail
+from mail.template import EmailTemplate
+from storage.redis import create_redis
+from worker import email_queue
+
+logger = logging.getLogger(__name__)
+
+# errors caused by the email itself, sending it again would fail too
+# if the reply is permanent (5xx) and not temporary (4xx)
+REFUSED_ERRORS = (
+    smtplib.SMTPRecipientsRefused,
+    smtplib.SMTPSenderRefused,
+    smtplib.SMTPDataError,
+)
+
+# moves the next batch to the processing list, unless it still holds emails
+# of an interrupted job, which are sent first
+TAKE_BATCH_SCRIPT = """
+local messages = redis.call('lrange', KEYS[2], 0, -1)
+if #messages == 0 then
+    messages = redis.call('lrange', KEYS[1], 0, ARGV[1] - 1)
+    if #messages > 0 then
+        redis.call('ltrim', KEYS[1], ARGV[1], -1)
+        redis.call('rpush', KEYS[2], unpack(messages))
+    end
+end
+redis.call('expire', KEYS[3], ARGV[2])
+return messages
+"""
+
+
+class Outbox:
+    """
+    Emails waiting to be sent, kept in a Redis list. A single job at a time
+    sends them in batches of EMAIL_BATCH_SIZE over one SMTP connection until
+    the outbox is empty. A batch is moved to a processing list and each email
+    is removed from it once sent, so a killed job loses none of them.
+    Emails refused by the server with a permanent 5xx reply, or possibly
+    accepted before the connection broke, are dropped. Ones left unsent
+    because of any other error, temporary 4xx refusals included, stay in
+    the processing list and are retried in EMAIL_RETRY_DELAY seconds
+    """
+
+    KEY = "mail:outbox"
+    PROCESSING_KEY = "mail:outbox:processing"
+    SENDING_KEY = "mail:outbox:sending"
+
+    def add(
+        self, *, to: str, subject: str, template: EmailTemplate, context: dict[str, Any]
+    ) -> None:
+        """Queue the email, starting a job to send it unless one is running"""
+        message = json.dumps(
+            {
+                "to": to,
+                "subject": subject,
+                "template": template.value,
+                "context": context,
+            }
+        )
+
+        pipe = create_redis().pipeline()
+        pipe.rpush(self.KEY, message)
+        pipe.set(self.SENDING_KEY, 1, nx=True, ex=settings.EMAIL_SENDING_TIMEOUT)
+        _, start = pipe.execute()
+
+        if start:
+            email_queue.enqueue(send_queued_emails)
+
+    def size(self) -> int:
+        pipe = create_redis().pipeline()
+        pipe.llen(self.KEY)
+        pipe.llen(self.PROCESSING_KEY)
+        return sum(pipe.execute())
+
+    def send(self) -> int:
+        """Send queued emails until the outbox is empty. Returns number of sent ones"""
+        redis = create_redis()
+
+        sent = 0
+        while True:
+            messages = redis.eval(
+                TAKE_BATCH_SCRIPT,
+                3,
+                self.KEY,
+                self.PROCESSING_KEY,
+                self.SENDING_KEY,
+                settings.EMAIL_BATCH_SIZE,
+                settings.EMAIL_SENDING_TIMEOUT,
+            )
+
+            if not messages:
+                redis.delete(self.SENDING_KEY)
+                # an email queued right before the delete did not start a job
+                if redis.llen(self.KEY) and redis.set(
+                    self.SENDING_KEY, 1, nx=True, ex=settings.EMAIL_SENDING_TIMEOUT
+                ):
+                    continue
+                return sent
+
+            sent += self._send_batch(redis, messages)
+
+    def _send_batch(self, redis: Redis, messages: List[bytes]) -> int:
+        sent = 0
+        for i, message in enumerate(messages):
+            try:
+                sent += self._send_one(message)
+            except Exception:
+                self._retry(len(messages) - i)
+                raise
+
+            redis.lpop(self.PROCESSING_KEY)
+
+        return sent
+
+    def _send_one(self, message: bytes) -> int:
+        try:
+            to, subject, text = self._render(message)
+        except Exception:
+            logger.exception("Failed to render email, dropping it")
+            return 0
+
+        try:
+            send_mail(to=to, subject=subject, message=text)
+        except REFUSED_ERRORS as e:
+            if not _is_permanent(e):
+                raise
+            logger.exception("Email to %s was refused, dropping it", to)
+            return 0
+        except DeliveryUnknownError:
+            logger.exception("Email to %s may have been sent, dropping it", to)
+            return 0
+
+        return 1
+
+    def _render(self, message: bytes) -> Tuple[str, str, str]:
+        data = json.loads(message)
+        text = render_email(EmailTemplate(data["template"]), data["context"])
+        return data["to"], data["subject"], text
+
+    def _retry(self, count: int) -> None:
+        """Leave the unsent emails in the processing list and send them later"""
+        delay = settings.EMAIL_RETRY_DELAY
+
+        create_redis().expire(self.SENDING_KEY, delay + settings.EMAIL_SENDING_TIMEOUT)
+
+        logger.warning("Failed to send %s emails, retrying in %ss", count, delay)
+        email_queue.enqueue_in(timedelta(seconds=delay), send_queued_emails)
+
+
+def _is_permanent(error: smtplib.SMTPException) -> bool:
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        codes = [code for code, _ in error.recipients.values()]
+    else:
+        codes = [error.smtp_code]
+    return all(code >= 500 for code in codes)
+
+
+outbox = Outbox()
+
+
+def send_queued_emails() -> int:
+    return outbox.send()
@@ -1,33 +1,166 @@
+import os
 import smtplib
 import ssl
-from typing import Any
+import time
+from functools import lru_cache
+from typing import Any, Optional
 
 from jinja2 import Environment, FileSystemLoader
 
 from app.config import settings
 from mail.template import EmailTemplate
 
+# errors after which the connection is dropped and the email may be sent again,
+# unlike refused recipients or messages
+CONNECTION_ERRORS = (
+    smtplib.SMTPServerDisconnected,
+    ConnectionError,
+    TimeoutError,
+    ssl.SSLError,
+)
+
+
+class DeliveryUnknownError(Exception):
+    """
+    The connection broke after the message was sent with DATA, so the server
+    may have accepted it and sending it again could deliver it twice
+    """
+
+
+class TrackingSMTP(smtplib.SMTP):
+    """Remembers whether the current message got to the DATA command"""
+
+    data_started = False
+
+    def mail(self, *args: Any, **kwargs: Any) -> Any:
+        self.data_started = False
+        return super().mail(*args, **kwargs)
+
+    def data(self, *args: Any, **kwargs: Any) -> Any:
+        self.data_started = True
+        return super().data(*args, **kwargs)
+
+
+class TrackingSMTPSSL(TrackingSMTP, smtplib.SMTP_SSL):
+    pass
+
+
+class SMTPConnection:
+    """
+    SMTP connection kept open between emails. A connection idle for more than
+    EMAIL_HEALTH_CHECK_INTERVAL seconds is checked with NOOP before use, and
+    one found broken while sending is replaced. The email is sent again only
+    if the connection broke before DATA, otherwise DeliveryUnknownError is
+    raised
+    """
+
+    def __init__(self) -> None:
+        self._server: Optional[TrackingSMTP] = None
+        self._pid: Optional[int] = None
+        self._used_at = 0.0
+
+        self.connects = 0
+
+    def send(self, *, to: str, content: str) -> None:
+        for attempt in range(2):
+            server = self._get()
+            server.data_started = False
+            try:
+                server.sendmail(settings.EMAIL_USER, to, content)
+                break
+            except CONNECTION_ERRORS as e:
+                self.close()
+                if server.data_started:
+                    raise DeliveryUnknownError() from e
+                if attempt:
+                    raise
+
+        self._used_at = time.monotonic()
+
+    def close(self) -> None:
+        server, self._server = self._server, None
+        if server is None:
+            return
+
+        try:
+            server.quit()
+        except (smtplib.SMTPException, OSError):
+            server.close()
+
+    def _get(self) -> TrackingSMTP:
+        # a connection inherited from the parent process is left to it
+        if self._pid != os.getpid():
+            self._server = None
+
+        if (
+            self._server is not None
+            and time.monotonic() - self._used_at > settings.EMAIL_HEALTH_CHECK_INTERVAL
+        ):
+            try:
+                status, _ = self._server.noop()
+            except CONNECTION_ERRORS:
+                status = -1
+            if status != 250:
+                self.close()
+
+        if self._server is None:
+            self._server = self._connect()
+            self._pid = os.getpid()
+            self._used_at = time.monotonic()
+            self.connects += 1
+
+        return self._server
+
+    def _connect(self) -> TrackingSMTP:
+        server: TrackingSMTP
+        if settings.EMAIL_USE_SSL:
+            server = TrackingSMTPSSL(
+                host=settings.EMAIL_HOST,
+                port=settings.EMAIL_PORT,
+                context=ssl.create_default_context(),
+                timeout=settings.EMAIL_TIMEOUT,
+            )
+        else:
+            server = TrackingSMTP(
+                host=settings.EMAIL_HOST,
+                port=settings.EMAIL_PORT,
+                timeout=settings.EMAIL_TIMEOUT,
+            )
+
+        try:
+            server.login(settings.EMAIL_USER, settings.EMAIL_PASSWORD)
+        except BaseException:
+            server.close()
+            raise
+
+        return server
+
+
+connection = SMTPConnection()
+
+
+@lru_cache(maxsize=None)
+def get_environment() -> Environment:
+    """Environment shared by all emails, so templates are compiled once"""
+    loader = FileSystemLoader(settings.EMAIL_TEMPLATES_DIR)
+    return Environment(loader=loader, auto_reload=False)
+
+
+def render_email(template: EmailTemplate, context: dict[str, Any]) -> str:
+    txt_template = get_environment().get_template(f"{template.value}.txt")
+    return txt_template.render(**context)
+
 
 def send_mail(*, to: str, subject: str, message: str) -> None:
     from_email = settings.EMAIL_USER
     content = f"From: {from_email}\nTo: {to}\nSubject: {subject}\n\n{message}"
 
-    context = ssl.create_default_context()
-
-    with smtplib.SMTP_SSL(
-        host=settings.EMAIL_HOST, port=settings.EMAIL_PORT, context=context
-    ) as server:
-        server.login(settings.EMAIL_USER, settings.EMAIL_PASSWORD)
-        server.sendmail(settings.EMAIL_USER, to, content)
+    connection.send(to=to, content=content)
 
 
 def send_templated_email(
     *, to: str, subject: str, template: EmailTemplate, context: dict[str, Any]
 ) -> None:
-    loader = FileSystemLoader(settings.EMAIL_TEMPLATES_DIR)
-    env = Environment(loader=loader)
-
-    txt_template = env.get_template(f"{template.value}.txt")
-    message = txt_template.render(**context)
+    message = render_email(template, context)
 
     return send_mail(to=to, subject=subject, message=message)
@@ -1,9 +1,7 @@
 from datetime import datetime
 
 from flask.helpers import url_for
-from sqlalchemy.orm import column_property, relationship
-from sqlalchemy.sql.expression import select
-from sqlalchemy.sql.functions import func
+from sqlalchemy.orm import relationship
 from sqlalchemy.sql.schema import Column, ForeignKey
 from sqlalchemy.sql.sqltypes import DateTime, Integer, Text
 
@@ -32,11 +30,3 @@ class Answer(Entry):
     @property
     def url(self) -> str:
         return url_for("questions.details", id=self.question_id) + f"#answer_{self.id}"
-
-
-Question.answer_count = column_property(  # type:ignore
-    select(func.count("id"))
-    .where(Answer.question_id == Question.id)
-    .correlate_except(Answer)
-    .scalar_subquery()
-)
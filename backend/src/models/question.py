@@ -2,9 +2,9 @@ from datetime import datetime
 from typing import TYPE_CHECKING
 
 from flask import url_for
-from sqlalchemy.orm import relationship
-from sqlalchemy.orm.attributes import Mapped
-from sqlalchemy.sql.schema import Column, ForeignKey, Table
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.orm import deferred, relationship
+from sqlalchemy.sql.schema import Column, Computed, ForeignKey, Index, Table
 from sqlalchemy.sql.sqltypes import DateTime, Integer, String, Text
 
 from models.base import Base
@@ -34,6 +34,14 @@ question_tags_table = Table(
     ),
 )
 
+SEARCH_CONFIG = "english"
+
+SEARCH_VECTOR_EXPRESSION = (
+    f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(title, '')), 'A') || "
+    f"setweight(to_tsvector('{SEARCH_CONFIG}', "
+    "regexp_replace(coalesce(content, ''), '<[^>]+>', ' ', 'g')), 'B')"
+)
+
 
 class Question(Entry):
     __tablename__ = "questions"
@@ -46,18 +54,31 @@ class Question(Entry):
     slug = Column(String(200), nullable=False)
     content = Column(Text, nullable=False)
 
+    search_vector = deferred(
+        Column(TSVECTOR, Computed(SEARCH_VECTOR_EXPRESSION, persisted=True))
+    )
+
     tags: list[Tag] = relationship("Tag", secondary=question_tags_table)
     answers: list["Answer"] = relationship(
         "Answer", back_populates="question", foreign_keys="Answer.question_id"
     )
 
-    answer_count: Mapped[int]
-    view_count: int
+    answer_count = Column(Integer, nullable=False, default=0, server_default="0")
+    # snapshot of the views counter in Redis, refreshed periodically
+    view_count = Column(Integer, nullable=False, default=0, server_default="0")
 
     __mapper_args__ = {
         "polymorphic_identity": 1,
     }
 
+    __table_args__ = (
+        Index(
+            "ix_questions_search_vector", "search_vector", postgresql_using="gin"
+        ),
+        Index("ix_questions_answer_count_id", "answer_count", "id"),
+        Index("ix_questions_view_count_id", "view_count", "id"),
+    )
+
     @property
     def url(self) -> str:
         return url_for("questions.details", id=self.id, slug=self.slug)
@@ -2,8 +2,8 @@ from datetime import datetime
 from typing import Optional
 
 from flask.helpers import url_for
-from sqlalchemy import Column, Integer, String
-from sqlalchemy.orm import deferred, query_expression
+from sqlalchemy import Column, Index, Integer, String
+from sqlalchemy.orm import deferred
 from sqlalchemy.sql.sqltypes import Boolean, DateTime
 
 from models.base import Base
@@ -29,8 +29,13 @@ class User(Base):
 
     score = Column(Integer, nullable=False, default=0, index=True)
 
-    question_count: int = query_expression()
-    answer_count: int = query_expression()
+    question_count = Column(Integer, nullable=False, default=0, server_default="0")
+    answer_count = Column(Integer, nullable=False, default=0, server_default="0")
+
+    __table_args__ = (
+        Index("ix_users_question_count_id", "question_count", "id"),
+        Index("ix_users_answer_count_id", "answer_count", "id"),
+    )
 
     @property
     def is_authenticated(self) -> bool:
@@ -1,10 +1,84 @@
-from typing import List
+from datetime import timedelta
+from typing import List, Optional
 
 import repository as repo
-from models import Question, User
-from questions.tasks import update_question_search_index
+from app.config import settings
+from models import Answer, Entry, Question, User
+from questions.tasks import (
+    COUNTER_RECONCILIATION,
+    HOT_RENORMALIZATION,
+    VIEW_COUNT_SNAPSHOT,
+    flush_search_index,
+    reconcile_counters,
+    renormalize_hot_ranking,
+    snapshot_view_counts,
+)
 from storage.base import Store
-from worker import queue
+from worker import maintenance_queue, search_queue
+
+
+def schedule_search_index_update(store: Store, question_id: int) -> None:
+    """
+    Mark question as pending for the search index. Pending questions are flushed
+    in one batch after SEARCH_INDEX_FLUSH_INTERVAL seconds, or right away
+    once SEARCH_INDEX_BATCH_SIZE of them are accumulated
+    """
+    pending = repo.question.mark_for_indexing(store, question_id)
+
+    if pending % settings.SEARCH_INDEX_BATCH_SIZE == 0:
+        search_queue.enqueue(flush_search_index)
+        return
+
+    delay = settings.SEARCH_INDEX_FLUSH_INTERVAL
+    if repo.question.schedule_search_index_flush(store, delay):
+        search_queue.enqueue_in(timedelta(seconds=delay), flush_search_index)
+
+
+def schedule_view_count_snapshot(store: Store, *, delay: Optional[int] = None) -> None:
+    """
+    Schedule snapshot of view counts in `delay` seconds, by default
+    VIEW_COUNT_SNAPSHOT_INTERVAL, unless one is already scheduled.
+    A run missed for longer than the interval no longer holds off new ones
+    """
+    interval = settings.VIEW_COUNT_SNAPSHOT_INTERVAL
+    delay = interval if delay is None else delay
+
+    token = repo.periodic.schedule(store, VIEW_COUNT_SNAPSHOT, delay + interval)
+    if token:
+        maintenance_queue.enqueue_in(
+            timedelta(seconds=delay), snapshot_view_counts, token
+        )
+
+
+def schedule_hot_renormalization(store: Store, *, delay: Optional[int] = None) -> None:
+    """
+    Schedule renormalization of the hot ranking in `delay` seconds, by default
+    HOT_RENORMALIZE_INTERVAL, unless one is already scheduled.
+    A run missed for longer than the interval no longer holds off new ones
+    """
+    interval = settings.HOT_RENORMALIZE_INTERVAL
+    delay = interval if delay is None else delay
+
+    token = repo.periodic.schedule(store, HOT_RENORMALIZATION, delay + interval)
+    if token:
+        maintenance_queue.enqueue_in(
+            timedelta(seconds=delay), renormalize_hot_ranking, token
+        )
+
+
+def schedule_counter_reconciliation(
+    store: Store, *, delay: Optional[int] = None
+) -> None:
+    """
+    Schedule reconciliation of counters in `delay` seconds, by default
+    COUNTER_RECONCILE_INTERVAL, unless one is already scheduled
+    """
+    interval = settings.COUNTER_RECONCILE_INTERVAL
+    delay = interval if delay is None else delay
+
+    token = repo.periodic.schedule(store, COUNTER_RECONCILIATION, delay + interval)
+    if token:
+        maintenance_queue.enqueue_in(timedelta(seconds=delay), reconcile_counters, token)
 
 
 def create_question(
@@ -14,7 +88,9 @@ def create_question(
         store, user=user, title=title, content=content, tags=tags
     )
 
-    queue.enqueue(update_question_search_index, question_id=question.id)
+    schedule_search_index_update(store, question.id)
+    repo.feed.add(store, question.id)
+    repo.page_cache.invalidate_lists(store)
 
     return question
 
@@ -31,6 +107,20 @@ def update_question(
         store, question, new_title=new_title, new_content=new_content, tags=tags
     )
 
-    queue.enqueue(update_question_search_index, question_id=question.id)
+    schedule_search_index_update(store, question.id)
+    repo.feed.update(store, question.id)
 
     return question
+
+
+def delete_entry(store: Store, *, id: int, user_id: int) -> Entry:
+    entry = repo.entry.mark_as_deleted(store, id=id, user_id=user_id)
+
+    if isinstance(entry, Question):
+        schedule_search_index_update(store, entry.id)
+        repo.feed.remove(store, entry.id)
+        repo.hot.remove(store, entry.id)
+    elif isinstance(entry, Answer):
+        repo.feed.update(store, entry.question_id)
+
+    return entry
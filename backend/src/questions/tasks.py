@@ -1,10 +1,75 @@
+import logging
+from typing import Optional
+
 import repository as repo
+from app.config import settings
 from storage import store
+from worker import job
+
+VIEW_COUNT_SNAPSHOT = "view_count_snapshot"
+HOT_RENORMALIZATION = "hot_renormalization"
+COUNTER_RECONCILIATION = "counter_reconciliation"
+
+logger = logging.getLogger(__name__)
+
+
+@job
+def flush_search_index() -> None:
+    repo.question.flush_search_index(store, settings.SEARCH_INDEX_BATCH_SIZE)
+
+
+@job
+def snapshot_view_counts(token: Optional[str] = None) -> None:
+    """
+    Save view counts of recently viewed questions to the database and
+    schedule the next snapshot, so snapshots repeat while the worker runs.
+    Runs of a chain replaced by a newer one do nothing
+    """
+    from questions.services import schedule_view_count_snapshot
+
+    if not repo.periodic.claim(store, VIEW_COUNT_SNAPSHOT, token):
+        return
+
+    try:
+        repo.question.snapshot_view_counts(
+            store, settings.VIEW_COUNT_SNAPSHOT_BATCH_SIZE
+        )
+    finally:
+        schedule_view_count_snapshot(store)
+
+
+@job
+def renormalize_hot_ranking(token: Optional[str] = None) -> None:
+    """
+    Renormalize the hot ranking and schedule the next renormalization.
+    Runs of a chain replaced by a newer one do nothing
+    """
+    from questions.services import schedule_hot_renormalization
+
+    if not repo.periodic.claim(store, HOT_RENORMALIZATION, token):
+        return
+
+    try:
+        repo.hot.renormalize(store)
+    finally:
+        schedule_hot_renormalization(store)
+
 
+@job
+def reconcile_counters(token: Optional[str] = None) -> None:
+    """
+    Recompute counters, which drift when concurrent increments race their
+    lazy computation, and schedule the next reconciliation.
+    Runs of a chain replaced by a newer one do nothing
+    """
+    from questions.services import schedule_counter_reconciliation
 
-def update_question_search_index(question_id: int) -> None:
-    from app.main import app
+    if not repo.periodic.claim(store, COUNTER_RECONCILIATION, token):
+        return
 
-    with app.app_context():
-        question = repo.question.get(store, question_id)
-        repo.question.update_search_indexes(store, question)
+    try:
+        drifted = repo.counter.reconcile(store)
+        if drifted:
+            logger.warning("Reconciled %s drifted counters", drifted)
+    finally:
+        schedule_counter_reconciliation(store)
@@ -1,8 +1,20 @@
-from flask import Blueprint, abort, jsonify, redirect, render_template, request, url_for
+from typing import Optional
+
+from flask import (
+    Blueprint,
+    abort,
+    jsonify,
+    redirect,
+    render_template,
+    request,
+    session,
+    url_for,
+)
 from flask.globals import current_app
 from flask_login import current_user, login_required
 
 import repository as repo
+from common.conditional import Validators, conditional, list_validators
 from questions import forms, services
 from storage import store
 
@@ -29,15 +41,29 @@ def ask():
 
 
 @bp.route("/questions/")
+@conditional(list_validators)
 def all():
     page = int(request.args.get("page", 1))
     per_page = current_app.config["PAGINATION"]
 
-    paginator = repo.question.list(store, page=page, per_page=per_page)
+    sort = request.args.get("sort", repo.question.SORTS[0])
+    if sort not in repo.question.SORTS:
+        abort(404)
+
+    paginator = repo.question.list_sorted(
+        store,
+        sort=sort,
+        page=page,
+        per_page=per_page,
+        after=request.args.get("after"),
+        before=request.args.get("before"),
+    )
 
     return render_template(
         "questions/list.html",
         paginator=paginator,
+        sorts=repo.question.SORTS,
+        sort=sort,
     )
 
 
@@ -47,13 +73,21 @@ def tags():
 
 
 @bp.route("/tags/<string:slug>/")
+@conditional(list_validators)
 def by_tag(slug: str):
     tag = repo.tag.get_by_slug(store, slug)
 
     page = int(request.args.get("page", 1))
     per_page = current_app.config["PAGINATION"]
 
-    paginator = repo.question.list_by_tag(store, tag, page=page, per_page=per_page)
+    paginator = repo.question.list_by_tag(
+        store,
+        tag,
+        page=page,
+        per_page=per_page,
+        after=request.args.get("after"),
+        before=request.args.get("before"),
+    )
 
     return render_template(
         "questions/list.html",
@@ -77,29 +111,46 @@ def search():
     )
 
 
+def _details_validators(id: int, slug: str = None) -> Optional[Validators]:
+    if not slug:
+        return None
+
+    version, modified = repo.page_cache.validators(store, id)
+    return f"question-{id}-{version}", modified
+
+
+def _register_view(id: int, slug: str = None) -> None:
+    remote_addr = request.environ.get("HTTP_X_REAL_IP", request.remote_addr)
+    if remote_addr:
+        repo.view_recorder.record(id, remote_addr)
+
+
 @bp.route("/questions/<int:id>", strict_slashes=False)
 @bp.route("/questions/<int:id>/<string:slug>")
+@conditional(_details_validators, on_not_modified=_register_view)
 def details(id: int, slug: str = None):
+    # pages of anonymous visitors are the same unless there are flashed messages
+    cacheable = bool(slug) and current_user.is_anonymous and "_flashes" not in session
+    if cacheable:
+        version, page = repo.page_cache.get(store, id, slug)
+        if page is not None:
+            _register_view(id)
+            return page
+
     additional_params = {}
     if current_user.is_authenticated:
         additional_params["user_id"] = current_user.id
 
-    question = repo.question.get_with_related(store, id, **additional_params)
+    question, answers = repo.question.get_details(store, id, **additional_params)
     if slug != question.slug:
         return redirect(url_for("questions.details", id=id, slug=question.slug), 301)
 
-    remote_addr = request.environ.get("HTTP_X_REAL_IP", request.remote_addr)
-    if remote_addr:
-        repo.question.register_view(store, id, remote_addr)
-
-    answers = repo.answer.all_for_question(
-        store, question_id=question.id, **additional_params
-    )
+    _register_view(id)
 
     answer_form = forms.AnswerForm()
     comment_form = forms.CommentForm()
 
-    return render_template(
+    page = render_template(
         "questions/details.html",
         question=question,
         answers=answers,
@@ -107,6 +158,11 @@ def details(id: int, slug: str = None):
         comment_form=comment_form,
     )
 
+    if cacheable:
+        repo.page_cache.set(store, id, slug, version, page)
+
+    return page
+
 
 @bp.route("/questions/<int:id>/edit", methods=["GET", "POST"])
 @login_required
@@ -213,19 +269,19 @@ def edit_comment(id: int):
 @login_required
 def vote(id: int, value: int):
     """
+    value 0 - cancel vote
     value 1 - upvote
     value 2 - downvote
     """
 
-    if not repo.entry.exists(store, id):
-        return jsonify({"error": "invalid entry_id"}), 404
-
     try:
-        repo.vote.record(store, user_id=current_user.id, entry_id=id, value=value)
+        entry = repo.vote.cast(store, user_id=current_user.id, entry_id=id, value=value)
     except ValueError as e:
         return jsonify({"error": str(e)}), 400
 
-    entry = repo.entry.get_with_user_vote(store, id=id, user_id=current_user.id)
+    if entry is None:
+        return jsonify({"error": "invalid entry_id"}), 404
+
     if entry.type == 3:
         template_name = "questions/_vote_comment.html"
     else:
@@ -237,5 +293,5 @@ def vote(id: int, value: int):
 @bp.route("/entries/<int:id>", methods=["DELETE"])
 @login_required
 def delete_entry(id: int):
-    repo.entry.mark_as_deleted(store, id=id, user_id=current_user.id)
+    services.delete_entry(store, id=id, user_id=current_user.id)
     return "", 204
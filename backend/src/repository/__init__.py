@@ -1,18 +1,30 @@
 from repository.answer import answer
 from repository.comment import comment
+from repository.counter import counter
 from repository.entry import entry
+from repository.feed import feed
+from repository.hot import hot
+from repository.page_cache import page_cache
+from repository.periodic import periodic
 from repository.question import question
 from repository.tag import tag, tag_category
 from repository.user import user
+from repository.view_recorder import view_recorder
 from repository.vote import vote
 
 __all__ = [
     "answer",
     "comment",
+    "counter",
     "entry",
+    "feed",
+    "hot",
+    "page_cache",
+    "periodic",
     "question",
     "tag",
     "tag_category",
     "user",
+    "view_recorder",
     "vote",
 ]
@@ -2,11 +2,11 @@ from __future__ import annotations
 
 from typing import TYPE_CHECKING, List
 
-from sqlalchemy.orm import aliased, contains_eager
-from sqlalchemy.sql.expression import and_
-
-from models import Answer, Comment, Question, User, Vote
+from models import Answer, User
 from repository.base import BaseRepostitory
+from repository.feed import feed
+from repository.hot import hot
+from repository.page_cache import page_cache
 
 if TYPE_CHECKING:
     from storage.base import Store
@@ -25,6 +25,10 @@ class AnswerRepostiory(BaseRepostitory[Answer]):
         store.db.add(answer)
         store.db.commit()
 
+        page_cache.invalidate(store, question_id)
+        feed.incr_answer_count(store, question_id)
+        hot.add_answer(store, question_id)
+
         return answer
 
     def update(self, store: Store, answer: Answer, *, new_content: str) -> None:
@@ -32,6 +36,8 @@ class AnswerRepostiory(BaseRepostitory[Answer]):
         store.db.add(answer)
         store.db.commit()
 
+        page_cache.invalidate(store, answer.question_id)
+
     def all_for_user(self, store: Store, user: User) -> List[Answer]:
         return (
             store.db.query(Answer)
@@ -40,36 +46,5 @@ class AnswerRepostiory(BaseRepostitory[Answer]):
             .all()
         )
 
-    def all_for_question(
-        self, store: Store, *, question_id: int, user_id: int = 0
-    ) -> List[Question]:
-        CommentVote = aliased(Vote)
-        CommentUser = aliased(User)
-
-        return (
-            store.db.query(Answer)
-            .join(User, Answer.user_id == User.id)
-            .outerjoin(Vote, and_(Vote.entry_id == Answer.id, Vote.user_id == user_id))
-            .outerjoin(Comment, Comment.entry_id == Answer.id)
-            .outerjoin(CommentUser, CommentUser.id == Comment.user_id)
-            .outerjoin(
-                CommentVote,
-                and_(CommentVote.entry_id == Comment.id, CommentVote.user_id == user_id),
-            )
-            .options(
-                contains_eager(Answer.user),
-                contains_eager(Answer.user_vote),
-                contains_eager(Answer.comments).contains_eager(
-                    Comment.user.of_type(CommentUser)
-                ),
-                contains_eager(Answer.comments).contains_eager(
-                    Comment.user_vote.of_type(CommentVote)
-                ),
-            )
-            .filter(Answer.question_id == question_id, Answer.deleted_at.is_(None))
-            .order_by(Answer.score.desc(), Answer.id.desc(), Comment.id)
-            .all()
-        )
-
 
 answer = AnswerRepostiory()
@@ -1,11 +1,13 @@
-from typing import Any, Generic, List, Optional, TypeVar, get_args
+from datetime import datetime
+from typing import Any, Generic, List, Optional, TypeVar, Union, get_args
 
-from sqlalchemy import exc
+from sqlalchemy import exc, tuple_
 from sqlalchemy.orm.query import Query
 
-from common.pagination import Paginator
+from common.pagination import CursorPaginator, Paginator, decode_cursor, encode_cursor
 from models import Base
 from repository import exceptions
+from repository.counter import counter
 from storage import Store
 
 ModelType = TypeVar("ModelType", bound=Base)
@@ -56,6 +58,21 @@ class BaseRepostitory(Generic[ModelType]):
         """Specify clauses that will be used to order list items"""
         return []
 
+    def _list_counter_key(self) -> Optional[str]:
+        """Specify counter maintaining total number of items with default filters"""
+        return None
+
+    def _list_keyset(self) -> List[Any]:
+        """
+        Specify columns that uniquely identify list item position,
+        most significant first. Used for cursor pagination
+        """
+        return [self.model.id]
+
+    def _list_keyset_descending(self) -> bool:
+        """Specify whether cursor pages follow keyset in descending order"""
+        return True
+
     def _list_base_query(self, store: Store) -> Query:
         """Base query to use when retrieveing multiple instances"""
         return store.db.query(self.model)
@@ -83,20 +100,174 @@ class BaseRepostitory(Generic[ModelType]):
 
         return query.all()
 
+    def _make_cursor(self, instance: ModelType, keyset: List[Any]) -> str:
+        values = [getattr(instance, c.key) for c in keyset]
+        return encode_cursor(
+            [v.isoformat() if isinstance(v, datetime) else v for v in values]
+        )
+
+    def _parse_cursor(self, cursor: str, keyset: List[Any]) -> List[Any]:
+        """
+        Restore keyset values from the cursor, checking them against types
+        of the columns. Raises NotFoundError for invalid cursors
+        """
+        try:
+            values = decode_cursor(cursor)
+        except ValueError:
+            raise exceptions.NotFoundError
+
+        if len(values) != len(keyset):
+            raise exceptions.NotFoundError
+
+        return [self._parse_cursor_value(c, v) for c, v in zip(keyset, values)]
+
+    @staticmethod
+    def _parse_cursor_value(column: Any, value: Any) -> Any:
+        python_type = column.type.python_type
+
+        if python_type is int:
+            if type(value) is not int or not -(2**63) <= value < 2**63:
+                raise exceptions.NotFoundError
+        elif python_type is datetime:
+            try:
+                return datetime.fromisoformat(value)
+            except (TypeError, ValueError):
+                raise exceptions.NotFoundError
+        elif type(value) is not python_type:
+            raise exceptions.NotFoundError
+
+        return value
+
     def list(
         self,
         store: Store,
         *,
         page: int = 1,
         per_page: int = 16,
-        filters: List[Any] = None
-    ) -> Paginator[ModelType]:
+        filters: List[Any] = None,
+        order_by: List[Any] = None,
+        after: Optional[str] = None,
+        before: Optional[str] = None,
+        with_cursors: bool = True,
+        counter_key: Optional[str] = None,
+        keyset: List[Any] = None,
+        descending: Optional[bool] = None,
+    ) -> Union[Paginator[ModelType], CursorPaginator[ModelType]]:
+        """
+        Fetch page of items either by page number or, when `after` or `before`
+        cursor is given, by keyset. With `with_cursors` numbered pages also provide
+        cursor of the next page, so that deep pages are reached by keyset.
+        Custom `keyset` also defines ordering unless `order_by` is given.
+        Total is read from `counter_key` counter when available
+        """
+        if counter_key is None and not filters:
+            counter_key = self._list_counter_key()
+
         _filters = filters or []
         _filters.extend(self._list_default_filters())
 
-        total = self.count(store, filters=_filters)
+        _keyset = keyset or self._list_keyset()
+        _descending = descending
+        if _descending is None:
+            _descending = self._list_keyset_descending()
+
+        if after or before:
+            return self.list_by_cursor(
+                store,
+                after=after,
+                before=before,
+                per_page=per_page,
+                filters=_filters,
+                keyset=_keyset,
+                descending=_descending,
+            )
+
+        if order_by is None and keyset:
+            order_by = [c.desc() if _descending else c.asc() for c in keyset]
+
+        if counter_key:
+            total = counter.get(
+                store, counter_key, lambda: self.count(store, filters=_filters)
+            )
+        else:
+            total = self.count(store, filters=_filters)
         offset = Paginator.calc_offset(page, per_page)
 
-        objects = self.all(store, limit=per_page, offset=offset, filters=_filters)
+        objects = self.all(
+            store, limit=per_page, offset=offset, order_by=order_by, filters=_filters
+        )
+
+        next_cursor = None
+        if with_cursors and objects and offset + per_page < total:
+            next_cursor = self._make_cursor(objects[-1], _keyset)
+
+        return Paginator(
+            objects=objects,
+            total=total,
+            page=page,
+            per_page=per_page,
+            next_cursor=next_cursor,
+        )
+
+    def list_by_cursor(
+        self,
+        store: Store,
+        *,
+        after: Optional[str] = None,
+        before: Optional[str] = None,
+        per_page: int = 16,
+        filters: List[Any] = None,
+        keyset: List[Any] = None,
+        descending: Optional[bool] = None,
+    ) -> CursorPaginator[ModelType]:
+        """
+        Fetch page of items following `after` or preceding `before` cursor.
+        Pages are located by keyset comparison instead of OFFSET,
+        so it takes the same time to fetch any of them
+        """
+        _filters = list(filters or self._list_default_filters())
+        _keyset = keyset or self._list_keyset()
+        _descending = descending
+        if _descending is None:
+            _descending = self._list_keyset_descending()
+
+        cursor = before or after
+        backwards = bool(before)
+
+        if cursor:
+            values = self._parse_cursor(cursor, _keyset)
+
+            position, key = tuple_(*_keyset), tuple_(*values)
+            if _descending != backwards:
+                _filters.append(position < key)
+            else:
+                _filters.append(position > key)
+
+        if _descending != backwards:
+            order_by = [c.desc() for c in _keyset]
+        else:
+            order_by = [c.asc() for c in _keyset]
+
+        objects = self.all(
+            store, limit=per_page + 1, filters=_filters, order_by=order_by
+        )
+
+        has_more = len(objects) > per_page
+        objects = objects[:per_page]
+
+        if backwards:
+            objects.reverse()
+
+        next_cursor = previous_cursor = None
+        if objects:
+            if has_more or backwards:
+                next_cursor = self._make_cursor(objects[-1], _keyset)
+            if cursor and (has_more or not backwards):
+                previous_cursor = self._make_cursor(objects[0], _keyset)
 
-        return Paginator(objects=objects, total=total, page=page, per_page=per_page)
+        return CursorPaginator(
+            objects=objects,
+            per_page=per_page,
+            next_cursor=next_cursor,
+            previous_cursor=previous_cursor,
+        )
@@ -4,6 +4,7 @@ from typing import TYPE_CHECKING
 
 from models import Comment, User
 from repository.base import BaseRepostitory
+from repository.page_cache import page_cache
 
 if TYPE_CHECKING:
     from storage.base import Store
@@ -28,6 +29,8 @@ class CommentRepostiory(BaseRepostitory[Comment]):
         store.db.add(comment)
         store.db.commit()
 
+        page_cache.invalidate_for_entry(store, entry_id)
+
         return comment
 
     def update(self, store: Store, instance: Comment, *, content: str) -> None:
@@ -36,5 +39,7 @@ class CommentRepostiory(BaseRepostitory[Comment]):
         store.db.add(instance)
         store.db.commit()
 
+        page_cache.invalidate_for_entry(store, instance.entry_id)
+
 
 comment = CommentRepostiory()
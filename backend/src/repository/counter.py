@@ -0,0 +1,126 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Callable, Dict, Iterable
+
+from sqlalchemy.sql.expression import select, true
+from sqlalchemy.sql.functions import func
+
+from models import Question, User
+from models.question import question_tags_table
+
+if TYPE_CHECKING:
+    from storage.base import Store
+
+
+INCR_EXISTING_SCRIPT = """
+for i, key in ipairs(KEYS) do
+    if redis.call('exists', key) == 1 then
+        redis.call('incrby', key, ARGV[1])
+    end
+end
+"""
+
+
+class CounterRepository:
+    """
+    Totals maintained in Redis, so that list pages don't have to run COUNT queries.
+    Counters are computed lazily on first read, updated on create and soft delete
+    and periodically fixed by `reconcile`
+    """
+
+    KEY_PREFIX = "counter:"
+
+    QUESTIONS_KEY = "counter:questions"
+    TAG_QUESTIONS_KEY = "counter:tag:{id}:questions"
+    USER_QUESTIONS_KEY = "counter:user:{id}:questions"
+    VERIFIED_USERS_KEY = "counter:users:verified"
+
+    def get(self, store: Store, key: str, compute: Callable[[], int]) -> int:
+        value = store.redis.get(key)
+        if value is not None:
+            return int(value)
+
+        result = compute()
+        store.redis.set(key, result, nx=True)
+        return result
+
+    def incr(self, store: Store, *keys: str, amount: int = 1) -> None:
+        """
+        Change counters that are already initialized,
+        missing ones will be computed on next read
+        """
+        if keys:
+            store.redis.eval(INCR_EXISTING_SCRIPT, len(keys), *keys, amount)
+
+    def decr(self, store: Store, *keys: str, amount: int = 1) -> None:
+        self.incr(store, *keys, amount=-amount)
+
+    def question_keys(self, *, user_id: int, tag_ids: Iterable[int]) -> list[str]:
+        """Keys of all counters affected by a single question"""
+        keys = [self.QUESTIONS_KEY, self.USER_QUESTIONS_KEY.format(id=user_id)]
+        keys.extend(self.TAG_QUESTIONS_KEY.format(id=tag_id) for tag_id in tag_ids)
+        return keys
+
+    def _compute_all(self, store: Store) -> Dict[str, int]:
+        not_deleted = Question.deleted_at.is_(None)
+
+        values = {
+            self.QUESTIONS_KEY: store.db.query(Question.id).filter(not_deleted).count(),
+            self.VERIFIED_USERS_KEY: store.db.query(User.id)
+            .filter(User.email_verified == true())
+            .count(),
+        }
+
+        by_user = (
+            select(Question.user_id, func.count(Question.id))
+            .where(not_deleted)
+            .group_by(Question.user_id)
+        )
+        for user_id, count in store.db.execute(by_user):
+            values[self.USER_QUESTIONS_KEY.format(id=user_id)] = count
+
+        by_tag = (
+            select(question_tags_table.c.tag_id, func.count(Question.id))
+            .join_from(Question, question_tags_table)
+            .where(not_deleted)
+            .group_by(question_tags_table.c.tag_id)
+        )
+        for tag_id, count in store.db.execute(by_tag):
+            values[self.TAG_QUESTIONS_KEY.format(id=tag_id)] = count
+
+        return values
+
+    def reconcile(self, store: Store) -> int:
+        """
+        Recompute all counters from the database and drop stale ones.
+        Returns number of counters that have drifted
+        """
+        values = self._compute_all(store)
+
+        stale = []
+        for key in store.redis.scan_iter(match=f"{self.KEY_PREFIX}*"):
+            _key = key.decode("utf-8")
+            if _key not in values:
+                stale.append(_key)
+
+        drifted = 0
+
+        current = store.redis.mget(list(values)) if values else []
+        for value, existing in zip(values.values(), current):
+            if existing is not None and int(existing) != value:
+                drifted += 1
+
+        if stale:
+            drifted += sum(1 for v in store.redis.mget(stale) if v and int(v) != 0)
+
+        pipe = store.redis.pipeline()
+        if stale:
+            pipe.delete(*stale)
+        if values:
+            pipe.mset(values)
+        pipe.execute()
+
+        return drifted
+
+
+counter = CounterRepository()
@@ -4,32 +4,22 @@ from datetime import datetime
 from typing import TYPE_CHECKING
 
 from sqlalchemy import exc
-from sqlalchemy.orm import contains_eager
-from sqlalchemy.sql.expression import and_
 
-from models import Entry, Vote
+from models import Entry, Question
 from repository import exceptions
 from repository.base import BaseRepostitory
+from repository.counter import counter
+from repository.page_cache import page_cache
 
 if TYPE_CHECKING:
     from storage.base import Store
 
 
 class EntryRepository(BaseRepostitory[Entry]):
-    def get_with_user_vote(self, store: Store, *, id: int, user_id: int) -> Entry:
-        query = (
-            store.db.query(Entry)
-            .outerjoin(Vote, and_(Entry.id == Vote.entry_id, Vote.user_id == user_id))
-            .options(contains_eager(Entry.user_vote))
-            .filter(Entry.id == id)
-        )
-
-        return self._get(query)
-
     def get_score(self, store: Store, *, id: int) -> int:
         return store.db.query(Entry.score).filter(Entry.id == id).scalar()
 
-    def mark_as_deleted(self, store: Store, *, id: int, user_id: int) -> None:
+    def mark_as_deleted(self, store: Store, *, id: int, user_id: int) -> Entry:
         try:
             entry = (
                 store.db.query(Entry)
@@ -39,10 +29,23 @@ class EntryRepository(BaseRepostitory[Entry]):
         except exc.NoResultFound:
             raise exceptions.NotFoundError
 
+        if entry.deleted_at is not None:
+            return entry
+
         entry.deleted_at = datetime.utcnow()
 
         store.db.add(entry)
         store.db.commit()
 
+        page_cache.invalidate_for_entry(store, entry.id)
+
+        if isinstance(entry, Question):
+            tag_ids = [tag.id for tag in entry.tags]
+            counter.decr(
+                store, *counter.question_keys(user_id=entry.user_id, tag_ids=tag_ids)
+            )
+
+        return entry
+
 
 entry = EntryRepository()
@@ -4,3 +4,11 @@ class NotFoundError(Exception):
 
 class AlreadyExistsError(Exception):
     pass
+
+
+class SearchUnavailableError(Exception):
+    pass
+
+
+class SearchIndexError(Exception):
+    pass
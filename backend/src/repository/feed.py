@@ -0,0 +1,187 @@
+from __future__ import annotations
+
+import json
+import time
+from datetime import datetime
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
+
+from sqlalchemy.orm import joinedload
+
+from app.config import settings
+from models import Question, Tag, User
+from repository.question import question as question_repo
+
+if TYPE_CHECKING:
+    from storage.base import Store
+
+
+GET_FEED_SCRIPT = """
+local ids = redis.call('zrevrange', KEYS[1], 0, tonumber(ARGV[1]) - 1)
+local cards = {}
+for i, id in ipairs(ids) do
+    cards[i] = redis.call('hgetall', ARGV[2] .. id)
+end
+return {redis.call('exists', KEYS[2]), cards}
+"""
+
+UPDATE_CARD_SCRIPT = """
+if redis.call('exists', KEYS[1]) == 1 then
+    if ARGV[3] == 'incr' then
+        redis.call('hincrby', KEYS[1], ARGV[1], ARGV[2])
+    else
+        redis.call('hset', KEYS[1], ARGV[1], ARGV[2])
+    end
+end
+"""
+
+
+class FeedRepository:
+    """
+    Latest questions for the homepage kept in Redis: ids in a sorted set and
+    everything a question card shows in a hash per question.
+    Feed is updated by question changes and fully rebuilt from the database
+    every FEED_TTL seconds, by a single process at a time
+    """
+
+    IDS_KEY = "feed:latest"
+    FRESH_KEY = "feed:latest:fresh"
+    LOCK_KEY = "feed:latest:lock"
+    CARD_KEY = "feed:card:{id}"
+
+    LOCK_TIMEOUT = 10
+    WAIT_ATTEMPTS = 10
+    WAIT_INTERVAL = 0.05
+
+    def latest(self, store: Store) -> List[Question]:
+        """
+        Return questions of the feed. Stale feed is served while another process
+        rebuilds it, an empty one is waited for
+        """
+        for _ in range(self.WAIT_ATTEMPTS):
+            fresh, cards = store.redis.eval(
+                GET_FEED_SCRIPT,
+                2,
+                self.IDS_KEY,
+                self.FRESH_KEY,
+                settings.FEED_SIZE,
+                self.CARD_KEY.format(id=""),
+            )
+
+            questions = [self._from_card(fields) for fields in cards if fields]
+
+            if fresh and len(questions) == len(cards):
+                return questions
+
+            if store.redis.set(self.LOCK_KEY, 1, nx=True, ex=self.LOCK_TIMEOUT):
+                try:
+                    self.rebuild(store)
+                finally:
+                    store.redis.delete(self.LOCK_KEY)
+                continue
+
+            if questions:
+                return questions
+
+            time.sleep(self.WAIT_INTERVAL)
+
+        return question_repo.all(store, limit=settings.FEED_SIZE)
+
+    def rebuild(self, store: Store) -> None:
+        """
+        Replace the feed with latest questions from the database,
+        keeping ones added after they were read
+        """
+        questions = self._load(store)
+
+        pipe = store.redis.pipeline()
+        if questions:
+            pipe.zremrangebyscore(self.IDS_KEY, "-inf", questions[0].id)
+        else:
+            pipe.delete(self.IDS_KEY)
+        self._add(pipe, questions)
+        pipe.set(self.FRESH_KEY, 1, ex=settings.FEED_TTL)
+        pipe.execute()
+
+    def add(self, store: Store, id: int) -> None:
+        pipe = store.redis.pipeline()
+        self._add(pipe, self._load(store, ids=[id]))
+        pipe.execute()
+
+    def remove(self, store: Store, id: int) -> None:
+        """Remove the question and make the feed refill on next read"""
+        pipe = store.redis.pipeline()
+        pipe.zrem(self.IDS_KEY, id)
+        pipe.delete(self.CARD_KEY.format(id=id), self.FRESH_KEY)
+        pipe.execute()
+
+    def update(self, store: Store, id: int) -> None:
+        """Rewrite card of the question if it is in the feed"""
+        if store.redis.zscore(self.IDS_KEY, id) is not None:
+            self.add(store, id)
+
+    def set_score(self, store: Store, id: int, score: int) -> None:
+        key = self.CARD_KEY.format(id=id)
+        store.redis.eval(UPDATE_CARD_SCRIPT, 1, key, "score", score, "set")
+
+    def incr_answer_count(self, store: Store, id: int, amount: int = 1) -> None:
+        key = self.CARD_KEY.format(id=id)
+        store.redis.eval(UPDATE_CARD_SCRIPT, 1, key, "answer_count", amount, "incr")
+
+    def _load(self, store: Store, ids: Optional[List[int]] = None) -> List[Question]:
+        query = (
+            store.db.query(Question)
+            .options(joinedload(Question.user), joinedload(Question.tags))
+            .filter(Question.deleted_at.is_(None))
+        )
+        if ids is not None:
+            query = query.filter(Question.id.in_(ids))
+
+        return query.order_by(Question.id.desc()).limit(settings.FEED_SIZE).all()
+
+    def _add(self, pipe: Any, questions: List[Question]) -> None:
+        for question in questions:
+            key = self.CARD_KEY.format(id=question.id)
+            pipe.delete(key)
+            pipe.hset(key, mapping=self._to_card(question))
+            pipe.expire(key, settings.FEED_TTL * 2)
+            pipe.zadd(self.IDS_KEY, {question.id: question.id})
+
+        pipe.zremrangebyrank(self.IDS_KEY, 0, -settings.FEED_SIZE - 1)
+
+    @staticmethod
+    def _to_card(question: Question) -> Dict[str, Any]:
+        return {
+            "id": question.id,
+            "title": question.title,
+            "slug": question.slug,
+            "score": question.score,
+            "answer_count": question.answer_count,
+            "view_count": question.view_count,
+            "created_at": question.created_at.isoformat(),
+            "user_id": question.user.id,
+            "user_name": question.user.name,
+            "tags": json.dumps(
+                [{"id": t.id, "name": t.name, "slug": t.slug} for t in question.tags]
+            ),
+        }
+
+    @staticmethod
+    def _from_card(fields: List[bytes]) -> Question:
+        """Build a question not attached to any session, for rendering only"""
+        it = iter(fields)
+        card = {key.decode("utf-8"): value.decode("utf-8") for key, value in zip(it, it)}
+
+        return Question(
+            id=int(card["id"]),
+            title=card["title"],
+            slug=card["slug"],
+            score=int(card["score"]),
+            answer_count=int(card["answer_count"]),
+            view_count=int(card.get("view_count", 0)),
+            created_at=datetime.fromisoformat(card["created_at"]),
+            user=User(id=int(card["user_id"]), name=card["user_name"]),
+            tags=[Tag(**tag) for tag in json.loads(card["tags"])],
+        )
+
+
+feed = FeedRepository()
@@ -0,0 +1,227 @@
+from __future__ import annotations
+
+import time
+from typing import TYPE_CHECKING, Any, Iterable, List, Tuple
+
+from sqlalchemy import text
+
+from app.config import settings
+
+if TYPE_CHECKING:
+    from storage.base import Store
+
+
+BUMP_FUNCTION = """
+local function bump(key, epoch_key, id, weight, now, half_life)
+    local epoch = redis.call('get', epoch_key)
+    if not epoch then
+        epoch = now
+        redis.call('set', epoch_key, now)
+    end
+    local increment = weight * 2 ^ ((now - tonumber(epoch)) / half_life)
+    return redis.call('zincrby', key, increment, id)
+end
+"""
+
+BUMP_SCRIPT = (
+    BUMP_FUNCTION
+    + """
+return bump(
+    KEYS[1], KEYS[2], ARGV[1], tonumber(ARGV[2]), tonumber(ARGV[3]), tonumber(ARGV[4])
+)
+"""
+)
+
+SET_SCORE_SCRIPT = (
+    BUMP_FUNCTION
+    + """
+local old = redis.call('hget', KEYS[3], ARGV[1])
+local new = tonumber(ARGV[2])
+redis.call('hset', KEYS[3], ARGV[1], new)
+if old and new ~= tonumber(old) then
+    bump(
+        KEYS[1], KEYS[2], ARGV[1],
+        (new - tonumber(old)) * tonumber(ARGV[3]), tonumber(ARGV[4]), tonumber(ARGV[5])
+    )
+end
+"""
+)
+
+ADD_VIEWS_SCRIPT = (
+    BUMP_FUNCTION
+    + """
+local before = redis.call('pfcount', KEYS[1])
+for i = 5, #ARGV, 1000 do
+    redis.call('pfadd', KEYS[1], unpack(ARGV, i, math.min(i + 999, #ARGV)))
+end
+local added = redis.call('pfcount', KEYS[1]) - before
+if added > 0 then
+    bump(
+        KEYS[2], KEYS[3], ARGV[1],
+        added * tonumber(ARGV[2]), tonumber(ARGV[3]), tonumber(ARGV[4])
+    )
+end
+return added
+"""
+)
+
+RENORMALIZE_SCRIPT = """
+local epoch = redis.call('get', KEYS[2])
+if epoch then
+    local factor = 2 ^ ((tonumber(epoch) - tonumber(ARGV[1])) / tonumber(ARGV[2]))
+    redis.call('zunionstore', KEYS[1], 1, KEYS[1], 'WEIGHTS', factor)
+    redis.call('zremrangebyrank', KEYS[1], 0, -tonumber(ARGV[3]) - 1)
+end
+redis.call('set', KEYS[2], ARGV[1])
+"""
+
+HOT_QUESTIONS_SQL = """
+    SELECT
+        questions.id,
+        entries.score,
+        (
+            :question_weight
+            + :vote_weight * entries.score
+            + :answer_weight * questions.answer_count
+            + :view_weight * questions.view_count
+        ) * power(
+            2, (extract(epoch FROM entries.created_at) - :now) / :half_life
+        ) AS hot
+    FROM questions
+    JOIN entries ON entries.id = questions.id
+    WHERE entries.deleted_at IS NULL
+    ORDER BY hot DESC
+    LIMIT :size
+"""
+
+
+class HotRankingRepository:
+    """
+    Questions ranked by score, answers, views and recency, kept in a Redis
+    sorted set. Every event adds its weight multiplied by
+    2 ^ ((time - epoch) / HOT_HALF_LIFE), so an event outweighs the same one
+    HOT_HALF_LIFE seconds older twice, which is the same as decaying all
+    earlier ones. Periodic renormalization moves the epoch to the current time,
+    scaling scores down so they stay small, and trims the ranking
+    to HOT_SIZE questions
+    """
+
+    KEY = "questions:hot"
+    EPOCH_KEY = "questions:hot:epoch"
+    SCORES_KEY = "questions:hot:scores"
+
+    def ids(self, store: Store, *, offset: int, limit: int) -> Tuple[List[int], int]:
+        """Return ids of a page of the ranking and its size"""
+        pipe = store.redis.pipeline()
+        pipe.zrevrange(self.KEY, offset, offset + limit - 1)
+        pipe.zcard(self.KEY)
+        ids, total = pipe.execute()
+
+        return [int(id) for id in ids], total
+
+    def add(self, store: Store, id: int) -> None:
+        pipe = store.redis.pipeline()
+        self._bump(pipe, id, settings.HOT_QUESTION_WEIGHT)
+        pipe.hset(self.SCORES_KEY, id, 0)
+        pipe.execute()
+
+    def add_answer(self, store: Store, question_id: int) -> None:
+        self._bump(store.redis, question_id, settings.HOT_ANSWER_WEIGHT)
+
+    def set_score(self, store: Store, id: int, score: int) -> None:
+        """
+        Bump the question by the change of its score since the previous call.
+        Score of a question seen for the first time is only remembered,
+        as its earlier votes are unknown
+        """
+        store.redis.eval(
+            SET_SCORE_SCRIPT,
+            3,
+            self.KEY,
+            self.EPOCH_KEY,
+            self.SCORES_KEY,
+            id,
+            score,
+            settings.HOT_VOTE_WEIGHT,
+            time.time(),
+            settings.HOT_HALF_LIFE,
+        )
+
+    def add_views(self, pipe: Any, key: str, id: int, visitors: Iterable[str]) -> None:
+        """
+        Add visitors to the views counter of the question under `key` within
+        the pipeline, bumping the question by the number of new ones
+        """
+        pipe.eval(
+            ADD_VIEWS_SCRIPT,
+            3,
+            key,
+            self.KEY,
+            self.EPOCH_KEY,
+            id,
+            settings.HOT_VIEW_WEIGHT,
+            time.time(),
+            settings.HOT_HALF_LIFE,
+            *visitors,
+        )
+
+    def remove(self, store: Store, id: int) -> None:
+        pipe = store.redis.pipeline()
+        pipe.zrem(self.KEY, id)
+        pipe.hdel(self.SCORES_KEY, id)
+        pipe.execute()
+
+    def renormalize(self, store: Store) -> None:
+        store.redis.eval(
+            RENORMALIZE_SCRIPT,
+            2,
+            self.KEY,
+            self.EPOCH_KEY,
+            time.time(),
+            settings.HOT_HALF_LIFE,
+            settings.HOT_SIZE,
+        )
+
+    def rebuild(self, store: Store) -> int:
+        """
+        Replace the ranking with one computed from current totals of questions,
+        as if all their events happened at creation. Returns its size
+        """
+        now = time.time()
+        rows = store.db.execute(
+            text(HOT_QUESTIONS_SQL),
+            {
+                "question_weight": settings.HOT_QUESTION_WEIGHT,
+                "vote_weight": settings.HOT_VOTE_WEIGHT,
+                "answer_weight": settings.HOT_ANSWER_WEIGHT,
+                "view_weight": settings.HOT_VIEW_WEIGHT,
+                "now": now,
+                "half_life": settings.HOT_HALF_LIFE,
+                "size": settings.HOT_SIZE,
+            },
+        ).all()
+
+        pipe = store.redis.pipeline()
+        pipe.delete(self.KEY, self.SCORES_KEY)
+        if rows:
+            pipe.zadd(self.KEY, {id: float(hot) for id, _, hot in rows})
+            pipe.hset(self.SCORES_KEY, mapping={id: score for id, score, _ in rows})
+        pipe.set(self.EPOCH_KEY, now)
+        pipe.execute()
+
+        return len(rows)
+
+    def _bump(self, redis: Any, id: int, weight: float) -> None:
+        redis.eval(
+            BUMP_SCRIPT,
+            2,
+            self.KEY,
+            self.EPOCH_KEY,
+            id,
+            weight,
+            time.time(),
+            settings.HOT_HALF_LIFE,
+        )
+
+
+hot = HotRankingRepository()
@@ -0,0 +1,183 @@
+from __future__ import annotations
+
+import time
+from typing import TYPE_CHECKING, Any, Dict, Optional, Tuple
+
+from sqlalchemy import text
+
+from app.config import settings
+
+if TYPE_CHECKING:
+    from storage.base import Store
+
+
+# a missing version is seeded with the current time in ms, so a counter lost
+# with Redis data never repeats versions, and ETags, handed out before
+GET_VERSION_LUA = """
+local function get_version(key, seed)
+    local version = redis.call('get', key)
+    if not version then
+        version = seed
+        redis.call('set', key, version)
+    end
+    return version
+end
+"""
+
+GET_PAGE_SCRIPT = (
+    GET_VERSION_LUA
+    + """
+local version = get_version(KEYS[1], ARGV[2])
+local page = redis.call('get', ARGV[1] .. version)
+if page then
+    redis.call('hincrby', KEYS[2], 'hits', 1)
+else
+    redis.call('hincrby', KEYS[2], 'misses', 1)
+end
+return {version, page}
+"""
+)
+
+VALIDATORS_SCRIPT = (
+    GET_VERSION_LUA
+    + """
+return {get_version(KEYS[1], ARGV[1]), redis.call('get', KEYS[2])}
+"""
+)
+
+ENTRY_QUESTION_ID_SQL = """
+    SELECT COALESCE(
+        answers.question_id,
+        parent_answers.question_id,
+        comments.entry_id,
+        entries.id
+    ) AS question_id
+    FROM entries
+    LEFT JOIN answers ON answers.id = entries.id
+    LEFT JOIN comments ON comments.id = entries.id
+    LEFT JOIN answers parent_answers ON parent_answers.id = comments.entry_id
+"""
+
+QUESTION_ID_SQL = f"""
+    {ENTRY_QUESTION_ID_SQL}
+    WHERE entries.id = :entry_id
+"""
+
+USER_QUESTION_IDS_SQL = f"""
+    SELECT DISTINCT question_id FROM (
+        {ENTRY_QUESTION_ID_SQL}
+        WHERE entries.user_id = :user_id
+    ) AS user_entries
+"""
+
+
+class PageCacheRepository:
+    """
+    Rendered question pages served to anonymous visitors.
+    Every question has a version counter, bumped by all changes shown on its page.
+    Pages are stored under the current version, so outdated ones are never served
+    and just expire.
+    Versions with times of the last change, of questions and of all lists
+    of questions and users, also serve as HTTP validators
+    """
+
+    VERSION_KEY = "page:question:{id}:version"
+    MODIFIED_KEY = "page:question:{id}:modified"
+    PAGE_KEY_PREFIX = "page:question:{id}:{slug}:"
+    STATS_KEY = "page:stats"
+    LISTS_VERSION_KEY = "page:lists:version"
+    LISTS_MODIFIED_KEY = "page:lists:modified"
+
+    def get(self, store: Store, id: int, slug: str) -> Tuple[int, Optional[bytes]]:
+        """
+        Return current version of the question page and the page itself
+        if it is cached, counting a hit or a miss
+        """
+        version, page = store.redis.eval(
+            GET_PAGE_SCRIPT,
+            2,
+            self.VERSION_KEY.format(id=id),
+            self.STATS_KEY,
+            self.PAGE_KEY_PREFIX.format(id=id, slug=slug),
+            _version_seed(),
+        )
+        return int(version), page
+
+    def set(self, store: Store, id: int, slug: str, version: int, page: str) -> None:
+        key = self.PAGE_KEY_PREFIX.format(id=id, slug=slug) + str(version)
+        store.redis.set(key, page, ex=settings.PAGE_CACHE_TTL)
+
+    def invalidate(self, store: Store, *ids: int) -> None:
+        """Invalidate pages of the questions and all lists, which show them too"""
+        now = int(time.time())
+        seed = _version_seed()
+
+        pipe = store.redis.pipeline()
+        for id in ids:
+            self._incr_version(pipe, self.VERSION_KEY.format(id=id), seed)
+            pipe.set(self.MODIFIED_KEY.format(id=id), now)
+        self._invalidate_lists(pipe, now, seed)
+        pipe.execute()
+
+    def invalidate_lists(self, store: Store) -> None:
+        pipe = store.redis.pipeline()
+        self._invalidate_lists(pipe, int(time.time()), _version_seed())
+        pipe.execute()
+
+    def validators(self, store: Store, id: int) -> Tuple[int, Optional[int]]:
+        """Return version of the question page and time of its last change"""
+        return self._validators(
+            store, self.VERSION_KEY.format(id=id), self.MODIFIED_KEY.format(id=id)
+        )
+
+    def list_validators(self, store: Store) -> Tuple[int, Optional[int]]:
+        """Return version of lists and time of their last change"""
+        return self._validators(store, self.LISTS_VERSION_KEY, self.LISTS_MODIFIED_KEY)
+
+    def invalidate_for_entry(self, store: Store, entry_id: int) -> None:
+        """Invalidate page of the question the entry is shown on"""
+        id = store.db.execute(text(QUESTION_ID_SQL), {"entry_id": entry_id}).scalar()
+        if id is not None:
+            self.invalidate(store, id)
+
+    def invalidate_for_user(self, store: Store, user_id: int) -> None:
+        """
+        Invalidate pages of questions showing entries of the user,
+        and all lists, after a change of the user shown with them
+        """
+        ids = store.db.execute(
+            text(USER_QUESTION_IDS_SQL), {"user_id": user_id}
+        ).scalars()
+        self.invalidate(store, *ids)
+
+    def stats(self, store: Store) -> Dict[str, int]:
+        values = store.redis.hgetall(self.STATS_KEY)
+        return {
+            "hits": int(values.get(b"hits", 0)),
+            "misses": int(values.get(b"misses", 0)),
+        }
+
+    def _invalidate_lists(self, pipe: Any, now: int, seed: int) -> None:
+        self._incr_version(pipe, self.LISTS_VERSION_KEY, seed)
+        pipe.set(self.LISTS_MODIFIED_KEY, now)
+
+    @staticmethod
+    def _incr_version(pipe: Any, key: str, seed: int) -> None:
+        pipe.set(key, seed, nx=True)
+        pipe.incr(key)
+
+    @staticmethod
+    def _validators(
+        store: Store, version_key: str, modified_key: str
+    ) -> Tuple[int, Optional[int]]:
+        version, modified = store.redis.eval(
+            VALIDATORS_SCRIPT, 2, version_key, modified_key, _version_seed()
+        )
+        return int(version), int(modified) if modified else None
+
+
+def _version_seed() -> int:
+    return int(time.time() * 1000)
+
+
+page_cache = PageCacheRepository()
@@ -0,0 +1,50 @@
+from __future__ import annotations
+
+import uuid
+from typing import TYPE_CHECKING, Optional
+
+if TYPE_CHECKING:
+    from storage.base import Store
+
+
+CLAIM_SCRIPT = """
+local current = redis.call('get', KEYS[1])
+if current and current ~= ARGV[1] then
+    return 0
+end
+redis.call('del', KEYS[1])
+return 1
+"""
+
+
+class PeriodicJobRepository:
+    """
+    Tokens of jobs which reschedule themselves after every run.
+    Every scheduled run carries the token stored for the job, and runs only
+    while the token is still current, or expired after the run was missed.
+    So scheduling the job again, e.g. by a restarted worker, never starts
+    a second chain of runs
+    """
+
+    KEY = "periodic:{name}:token"
+
+    def schedule(self, store: Store, name: str, ttl: int) -> Optional[str]:
+        """
+        Returns a new token for the next run, or None if a run is already
+        scheduled. The token expires in `ttl` seconds
+        """
+        token = uuid.uuid4().hex
+        if store.redis.set(self.KEY.format(name=name), token, nx=True, ex=ttl):
+            return token
+        return None
+
+    def claim(self, store: Store, name: str, token: Optional[str]) -> bool:
+        """
+        Returns True if the run with the token may proceed, after which
+        the next one may be scheduled
+        """
+        key = self.KEY.format(name=name)
+        return bool(store.redis.eval(CLAIM_SCRIPT, 1, key, token or ""))
+
+
+periodic = PeriodicJobRepository()
@@ -1,66 +1,117 @@
 from __future__ import annotations
 
-from typing import TYPE_CHECKING, Any, Dict, List, Optional
+import time
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Optional, Tuple, Union
 
 from slugify import slugify
-from sqlalchemy.orm import aliased, contains_eager, joinedload
-from sqlalchemy.sql.expression import and_, or_
-
-from common.pagination import Paginator
+from sqlalchemy import column, text, values
+from sqlalchemy.orm import joinedload, load_only, undefer
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy.sql.expression import and_, select, update
+from sqlalchemy.sql.functions import func
+from sqlalchemy.sql.sqltypes import Integer
+
+from app.config import settings
+from common.pagination import CursorPaginator, Paginator
 from common.utils import strip_tags
-from models import Comment, Question, Tag, User, Vote
+from models import Answer, Comment, Entry, Question, Tag, User, Vote
 from models.question import question_tags_table
+from repository import exceptions
 from repository.base import BaseRepostitory
+from repository.counter import counter
+from repository.hot import hot
+from repository.page_cache import page_cache
+from repository.search import (
+    INDEX_NAME,
+    INDEX_NAME_KEY,
+    INDEX_SETTINGS,
+    SearchBackend,
+    create_search_backend,
+)
 
 if TYPE_CHECKING:
+    from meilisearch.index import Index
     from sqlalchemy.orm.query import Query
 
     from storage import Store
 
 PER_PAGE = 16
 
+SORT_NEWEST = "newest"
+SORT_UNANSWERED = "unanswered"
+SORT_ANSWERS = "answers"
+SORT_VIEWS = "views"
+SORT_HOT = "hot"
+
 
 class QuestionRepository(BaseRepostitory[Question]):
     REDIS_QUESTION_VIEW_KEY = "question:{id}:views"
-
-    def get_with_related(self, store: Store, id: int, user_id: int = 0) -> Question:
-        CommentUser = aliased(User)
-        CommentVote = aliased(Vote)
-
-        query = (
+    REDIS_VIEWS_CHANGED_KEY = "question:views:changed"
+    REDIS_SEARCH_PENDING_KEY = "search:questions:pending"
+    REDIS_SEARCH_FLUSH_KEY = "search:questions:flush_scheduled"
+    REDIS_REINDEX_KEY = "search:questions:reindex"
+
+    def __init__(self, search_backend: SearchBackend):
+        self.search_backend = search_backend
+
+    def get_details(
+        self, store: Store, id: int, *, user_id: int = 0
+    ) -> Tuple[Question, List[Answer]]:
+        """
+        Load everything the question page shows: question, its answers,
+        comments of both with their authors and votes of the viewer.
+        Each kind of objects is fetched by a separate flat query, joining
+        only many-to-one authors, so the number of queries and rows does not
+        multiply with thread size
+        """
+        question = self._get(
             store.db.query(Question)
-            .join(User, Question.user_id == User.id)
-            .outerjoin(
-                Vote,
-                and_(Vote.entry_id == Question.id, Vote.user_id == user_id),
-            )
-            .outerjoin(
-                Comment,
-                and_(Comment.entry_id == Question.id, Comment.deleted_at.is_(None)),
+            .options(joinedload(Question.user), joinedload(Question.tags))
+            .filter(Question.id == id, Question.deleted_at.is_(None))
+        )
+
+        answers = (
+            store.db.query(Answer)
+            .options(joinedload(Answer.user))
+            .filter(Answer.question_id == id, Answer.deleted_at.is_(None))
+            .order_by(Answer.score.desc(), Answer.id.desc())
+            .all()
+        )
+        parents: List[Entry] = [question, *answers]
+
+        comments = (
+            store.db.query(Comment)
+            .options(joinedload(Comment.user))
+            .filter(
+                Comment.entry_id.in_([e.id for e in parents]),
+                Comment.deleted_at.is_(None),
             )
             .order_by(Comment.id)
-            .outerjoin(
-                CommentVote,
-                and_(CommentVote.entry_id == Comment.id, CommentVote.user_id == user_id),
-            )
-            .outerjoin(CommentUser, Comment.user_id == CommentUser.id)
-            .options(
-                contains_eager(Question.user),
-                contains_eager(Question.user_vote),
-                contains_eager(Question.comments).contains_eager(
-                    Comment.user.of_type(CommentUser)
-                ),
-                contains_eager(Question.comments).contains_eager(
-                    Comment.user_vote.of_type(CommentVote)
-                ),
-            )
-            .filter(Question.id == id, Question.deleted_at.is_(None))
+            .all()
         )
+        entries: List[Entry] = [*parents, *comments]
 
-        question = self._get(query)
-        question.view_count = self.get_view_count(store, question.id)
+        entry_comments: Dict[int, List[Comment]] = {e.id: [] for e in parents}
+        for comment in comments:
+            entry_comments[comment.entry_id].append(comment)
 
-        return question
+        for entry in parents:
+            set_committed_value(entry, "comments", entry_comments[entry.id])
+
+        if user_id:
+            by_id = {e.id: e for e in entries}
+            votes = (
+                store.db.query(Vote)
+                .options(undefer(Vote.entry_id))
+                .filter(Vote.user_id == user_id, Vote.entry_id.in_(by_id))
+            )
+            # user_vote is not loaded by default, so only voted entries are set
+            for vote in votes:
+                set_committed_value(by_id[vote.entry_id], "user_vote", vote)
+
+        self._set_live_view_count(store, question)
+
+        return question, answers
 
     def first_for_user(self, store: Store, user: User) -> Optional[Question]:
         return store.db.query(Question).filter(Question.user_id == user.id).first()
@@ -69,7 +120,91 @@ class QuestionRepository(BaseRepostitory[Question]):
         return store.redis.pfcount(self.REDIS_QUESTION_VIEW_KEY.format(id=id))
 
     def register_view(self, store: Store, id: int, user_identifier: str) -> None:
-        store.redis.pfadd(self.REDIS_QUESTION_VIEW_KEY.format(id=id), user_identifier)
+        pipe = store.redis.pipeline()
+        pipe.pfadd(self.REDIS_QUESTION_VIEW_KEY.format(id=id), user_identifier)
+        pipe.sadd(self.REDIS_VIEWS_CHANGED_KEY, id)
+        pipe.execute()
+
+    def _set_live_view_count(self, store: Store, question: Question) -> None:
+        """Show the current counter instead of the snapshot, without dirtying"""
+        view_count = self.get_view_count(store, question.id)
+        set_committed_value(question, "view_count", view_count)
+
+    def snapshot_view_counts(self, store: Store, batch_size: int) -> int:
+        """
+        Copy views counters of questions viewed since the last snapshot into
+        the view_count column, batch by batch. Ids of a failed batch are put
+        back into the set. Returns number of updated questions
+        """
+        updated = 0
+
+        while True:
+            members = store.redis.spop(self.REDIS_VIEWS_CHANGED_KEY, batch_size)
+            if not members:
+                return updated
+
+            ids = [int(id) for id in members]
+            try:
+                updated += self.save_view_counts(store, ids)
+            except Exception:
+                store.db.rollback()
+                store.redis.sadd(self.REDIS_VIEWS_CHANGED_KEY, *ids)
+                raise
+
+    def backfill_view_counts(self, store: Store, batch_size: int) -> Iterator[int]:
+        """
+        Copy views counters of all questions into the view_count column.
+        Yields numbers of updated questions per batch
+        """
+        last_id = 0
+
+        while True:
+            ids = (
+                store.db.execute(
+                    select(Question.id)
+                    .where(Question.id > last_id)
+                    .order_by(Question.id)
+                    .limit(batch_size)
+                )
+                .scalars()
+                .all()
+            )
+            if not ids:
+                return
+
+            yield self.save_view_counts(store, ids)
+            last_id = ids[-1]
+
+    def save_view_counts(self, store: Store, ids: List[int]) -> int:
+        """
+        Write current views counters of given questions in a single statement,
+        skipping unchanged ones. Returns number of updated questions
+        """
+        pipe = store.redis.pipeline()
+        for id in ids:
+            pipe.pfcount(self.REDIS_QUESTION_VIEW_KEY.format(id=id))
+        counts = pipe.execute()
+
+        questions = Question.__table__
+        current = values(
+            column("id", Integer), column("view_count", Integer), name="current"
+        ).data(list(zip(ids, counts)))
+
+        updated = store.db.execute(
+            update(questions)
+            .where(
+                questions.c.id == current.c.id,
+                questions.c.view_count != current.c.view_count,
+            )
+            .values(view_count=current.c.view_count)
+        ).rowcount
+
+        store.db.commit()
+
+        if updated:
+            page_cache.invalidate_lists(store)
+
+        return updated
 
     @staticmethod
     def _make_slug(title: str) -> str:
@@ -91,6 +226,9 @@ class QuestionRepository(BaseRepostitory[Question]):
 
         store.db.commit()
 
+        counter.incr(store, *counter.question_keys(user_id=user.id, tag_ids=tags))
+        hot.add(store, question.id)
+
         return question
 
     def update(
@@ -108,11 +246,12 @@ class QuestionRepository(BaseRepostitory[Question]):
         question.content = new_content
         store.db.add(question)
 
-        store.db.execute(
-            question_tags_table.delete().where(
-                question_tags_table.c.question_id == question.id
-            )
-        )
+        old_tags = store.db.execute(
+            question_tags_table.delete()
+            .where(question_tags_table.c.question_id == question.id)
+            .returning(question_tags_table.c.tag_id)
+        ).scalars()
+        old_tag_ids = set(old_tags)
 
         if tags:
             tag_values = [(question.id, tag_id) for tag_id in tags]
@@ -120,6 +259,89 @@ class QuestionRepository(BaseRepostitory[Question]):
 
         store.db.commit()
 
+        page_cache.invalidate(store, question.id)
+
+        if question.deleted_at is None:
+            key = counter.TAG_QUESTIONS_KEY
+            counter.incr(store, *[key.format(id=i) for i in set(tags) - old_tag_ids])
+            counter.decr(store, *[key.format(id=i) for i in old_tag_ids - set(tags)])
+
+    SORTS = (SORT_NEWEST, SORT_HOT, SORT_UNANSWERED, SORT_ANSWERS, SORT_VIEWS)
+
+    def list_sorted(
+        self,
+        store: Store,
+        *,
+        sort: str = SORT_NEWEST,
+        page: int = 1,
+        per_page: int = PER_PAGE,
+        after: Optional[str] = None,
+        before: Optional[str] = None,
+    ) -> Union[Paginator[Question], CursorPaginator[Question]]:
+        params: Dict[str, Any] = {}
+
+        if sort == SORT_HOT:
+            return self.list_hot(store, page=page, per_page=per_page)
+        elif sort == SORT_UNANSWERED:
+            params["filters"] = [Question.answer_count == 0]
+        elif sort == SORT_ANSWERS:
+            params["keyset"] = [Question.answer_count, Question.id]
+        elif sort == SORT_VIEWS:
+            params["keyset"] = [Question.view_count, Question.id]
+        elif sort != SORT_NEWEST:
+            raise ValueError(f"Unknown sort: {sort}")
+
+        return self.list(
+            store, page=page, per_page=per_page, after=after, before=before, **params
+        )
+
+    def list_hot(
+        self, store: Store, *, page: int = 1, per_page: int = PER_PAGE
+    ) -> Paginator[Question]:
+        """Page of the hot ranking, read by rank from Redis"""
+        offset = Paginator.calc_offset(page, per_page)
+
+        ids, total = hot.ids(store, offset=offset, limit=per_page)
+        objects = self.get_many_ordered(store, ids)
+
+        return Paginator(objects=objects, total=total, page=page, per_page=per_page)
+
+    def reconcile_answer_counts(self, store: Store) -> int:
+        """
+        Recompute answer counts of all questions, returns number of fixed ones
+        """
+        questions = Question.__table__
+        answers = Answer.__table__
+        entries = Entry.__table__
+
+        store.db.execute(text("LOCK TABLE answers IN SHARE MODE"))
+
+        counts = (
+            select(questions.c.id, func.count(entries.c.id).label("answer_count"))
+            .select_from(
+                questions.outerjoin(
+                    answers, answers.c.question_id == questions.c.id
+                ).outerjoin(
+                    entries,
+                    and_(entries.c.id == answers.c.id, entries.c.deleted_at.is_(None)),
+                )
+            )
+            .group_by(questions.c.id)
+            .subquery()
+        )
+        fixed = store.db.execute(
+            update(questions)
+            .where(
+                questions.c.id == counts.c.id,
+                questions.c.answer_count != counts.c.answer_count,
+            )
+            .values(answer_count=counts.c.answer_count)
+        ).rowcount
+
+        store.db.commit()
+
+        return fixed
+
     def _list_default_ordering(self) -> List[Any]:
         return [Question.id.desc()]
 
@@ -132,71 +354,81 @@ class QuestionRepository(BaseRepostitory[Question]):
     def _list_default_filters(self) -> List[Any]:
         return [Question.deleted_at.is_(None)]
 
-    def _with_view_counts(
-        self, store: Store, questions: List[Question]
-    ) -> List[Question]:
-        pipe = store.redis.pipeline()
-        for question in questions:
-            _key = self.REDIS_QUESTION_VIEW_KEY.format(id=question.id)
-            pipe.pfcount(_key)
-
-        counts = pipe.execute()
-
-        for question, c in zip(questions, counts):
-            question.view_count = c
-
-        return questions
-
-    def all(
-        self,
-        store: Store,
-        *,
-        limit: Optional[int] = None,
-        offset: Optional[int] = None,
-        order_by: List[Any] = None,
-        filters: List[Any] = None,
-    ) -> List[Question]:
-
-        questions = super().all(
-            store, limit=limit, offset=offset, order_by=order_by, filters=filters
-        )
-
-        return self._with_view_counts(store, questions)
+    def _list_counter_key(self) -> Optional[str]:
+        return counter.QUESTIONS_KEY
 
     def all_for_user(self, store: Store, user: User) -> List[Question]:
         return self.all(store, filters=[Question.user_id == user.id])
 
     def list_for_user(
-        self, store: Store, user: User, *, page: int = 1, per_page: int = PER_PAGE
-    ) -> Paginator[Question]:
+        self,
+        store: Store,
+        user: User,
+        *,
+        page: int = 1,
+        per_page: int = PER_PAGE,
+        after: Optional[str] = None,
+        before: Optional[str] = None,
+    ) -> Union[Paginator[Question], CursorPaginator[Question]]:
 
         filters = [Question.user_id == user.id]
 
-        return self.list(store, page=page, per_page=per_page, filters=filters)
+        return self.list(
+            store,
+            page=page,
+            per_page=per_page,
+            filters=filters,
+            after=after,
+            before=before,
+            counter_key=counter.USER_QUESTIONS_KEY.format(id=user.id),
+        )
 
     def list_by_tag(
-        self, store: Store, tag: Tag, *, page: int = 1, per_page: int = PER_PAGE
-    ) -> Paginator[Question]:
+        self,
+        store: Store,
+        tag: Tag,
+        *,
+        page: int = 1,
+        per_page: int = PER_PAGE,
+        after: Optional[str] = None,
+        before: Optional[str] = None,
+    ) -> Union[Paginator[Question], CursorPaginator[Question]]:
 
         filters = [Question.tags.any(id=tag.id)]
 
-        return self.list(store, page=page, per_page=per_page, filters=filters)
+        return self.list(
+            store,
+            page=page,
+            per_page=per_page,
+            filters=filters,
+            after=after,
+            before=before,
+            counter_key=counter.TAG_QUESTIONS_KEY.format(id=tag.id),
+        )
+
+    def get_many_ordered(self, store: Store, ids: List[int]) -> List[Question]:
+        """Load questions with given ids in a single query, keeping the order of ids"""
+        if not ids:
+            return []
 
-    @staticmethod
-    def _clean_search_query(query: str) -> str:
-        words = query.replace("\\", "").strip().split(" ")
-        return "&".join(words)
+        filters = [Question.id.in_(ids), *self._list_default_filters()]
+        by_id = {q.id: q for q in self.all(store, filters=filters)}
+
+        return [by_id[id] for id in ids if id in by_id]
 
     def search(
         self, store: Store, query: str, *, page: int = 1, per_page: int = PER_PAGE
     ) -> Paginator[Question]:
-        query = self._clean_search_query(query)
+        offset = Paginator.calc_offset(page, per_page)
 
-        filters = [
-            or_(Question.title.match(query), Question.content.match(query)),
-        ]
+        result = self.search_backend.search(
+            store, query, offset=offset, limit=per_page
+        )
+        objects = self.get_many_ordered(store, result.ids)
 
-        return self.list(store, page=page, per_page=per_page, filters=filters)
+        return Paginator(
+            objects=objects, total=result.total, page=page, per_page=per_page
+        )
 
     def _build_meili_document(self, question: Question) -> Dict[str, Any]:
         return {
@@ -206,12 +438,182 @@ class QuestionRepository(BaseRepostitory[Question]):
             "url": question.url,
         }
 
-    def update_search_indexes(self, store: Store, *questions: Question) -> None:
-        index = store.meili.index("questions")
+    def _search_index_names(self, store: Store) -> List[str]:
+        """Active index and the one being built by an unfinished reindex"""
+        pipe = store.redis.pipeline()
+        pipe.get(INDEX_NAME_KEY)
+        pipe.hget(self.REDIS_REINDEX_KEY, "index")
+        active, building = pipe.execute()
+
+        names = [active.decode("utf-8") if active else INDEX_NAME]
+        if building:
+            names.append(building.decode("utf-8"))
+
+        return names
 
+    def update_search_indexes(self, store: Store, *questions: Question) -> None:
         docs = [self._build_meili_document(q) for q in questions]
 
-        index.add_documents(docs)
+        for name in self._search_index_names(store):
+            store.meili.index(name).add_documents(docs)
+
+    def reindex_search(
+        self, store: Store, *, chunk_size: int, restart: bool = False
+    ) -> Iterator[int]:
+        """
+        Stream all questions into a fresh index in chunks and make it active
+        once Meilisearch has processed all of them. Progress is saved after each
+        chunk, so an interrupted reindex resumes from the last indexed id.
+        Yields sizes of sent chunks. Raises SearchIndexError if any update
+        of the index failed, leaving the current index active
+        """
+        state = store.redis.hgetall(self.REDIS_REINDEX_KEY)
+
+        update_id: Optional[int] = None
+        if state and not restart:
+            index_name = state[b"index"].decode("utf-8")
+            last_id = int(state[b"last_id"])
+            if b"update_id" in state:
+                update_id = int(state[b"update_id"])
+        else:
+            if state:
+                store.meili.delete_index_if_exists(state[b"index"].decode("utf-8"))
+
+            index_name = f"{INDEX_NAME}_{int(time.time())}"
+            last_id = 0
+
+            store.meili.create_index(index_name, {"primaryKey": "id"})
+            update = store.meili.index(index_name).update_settings(INDEX_SETTINGS)
+            update_id = update["updateId"]
+            store.redis.hset(
+                self.REDIS_REINDEX_KEY,
+                mapping={"index": index_name, "last_id": 0, "update_id": update_id},
+            )
+
+        index = store.meili.index(index_name)
+
+        query = (
+            store.db.query(Question)
+            .options(
+                load_only(Question.id, Question.title, Question.content, Question.slug)
+            )
+            .filter(Question.deleted_at.is_(None), Question.id > last_id)
+            .order_by(Question.id)
+            .yield_per(chunk_size)
+        )
+
+        chunk: List[Dict[str, Any]] = []
+        for question in query:
+            chunk.append(self._build_meili_document(question))
+            if len(chunk) == chunk_size:
+                update_id = self._send_reindex_chunk(store, index, chunk)
+                yield len(chunk)
+                chunk = []
+
+        if chunk:
+            update_id = self._send_reindex_chunk(store, index, chunk)
+            yield len(chunk)
+
+        # updates are processed in order, so the last one finishes the index
+        if update_id is not None:
+            index.wait_for_pending_update(
+                update_id, timeout_in_ms=settings.SEARCH_REINDEX_TIMEOUT * 1000
+            )
+        failed = [u for u in index.get_all_update_status() if u["status"] == "failed"]
+        if failed:
+            raise exceptions.SearchIndexError(
+                f"{len(failed)} updates of index {index_name} failed, "
+                f"first error: {failed[0].get('error')}"
+            )
+
+        pipe = store.redis.pipeline()
+        pipe.getset(INDEX_NAME_KEY, index_name)
+        pipe.delete(self.REDIS_REINDEX_KEY)
+        previous, _ = pipe.execute()
+
+        previous_name = previous.decode("utf-8") if previous else INDEX_NAME
+        if previous_name != index_name:
+            store.meili.delete_index_if_exists(previous_name)
+
+    def _send_reindex_chunk(
+        self, store: Store, index: Index, chunk: List[Dict[str, Any]]
+    ) -> int:
+        """Returns id of the enqueued update"""
+        update_id = index.add_documents(chunk)["updateId"]
+        store.redis.hset(
+            self.REDIS_REINDEX_KEY,
+            mapping={"last_id": chunk[-1]["id"], "update_id": update_id},
+        )
+        return update_id
+
+    def reindex_progress(self, store: Store) -> int:
+        """Number of questions already sent by an unfinished reindex"""
+        last_id = store.redis.hget(self.REDIS_REINDEX_KEY, "last_id")
+        if not last_id:
+            return 0
 
+        return self.count(
+            store,
+            filters=[Question.deleted_at.is_(None), Question.id <= int(last_id)],
+        )
 
-question = QuestionRepository()
+    def sync_search_index(self, store: Store, ids: List[int]) -> None:
+        """
+        Send current state of questions with given ids to the search index
+        in at most one batch of documents and one batch of deletions
+        """
+        questions = store.db.query(Question).filter(Question.id.in_(ids)).all()
+
+        alive = [q for q in questions if q.deleted_at is None]
+        alive_ids = {q.id for q in alive}
+        removed = [str(id) for id in ids if id not in alive_ids]
+
+        docs = [self._build_meili_document(q) for q in alive]
+
+        for name in self._search_index_names(store):
+            index = store.meili.index(name)
+            if docs:
+                index.add_documents(docs)
+            if removed:
+                index.delete_documents(removed)
+
+    def mark_for_indexing(self, store: Store, *ids: int) -> int:
+        """
+        Add question ids to the set of pending search index updates.
+        Returns number of pending ids
+        """
+        pipe = store.redis.pipeline()
+        pipe.sadd(self.REDIS_SEARCH_PENDING_KEY, *ids)
+        pipe.scard(self.REDIS_SEARCH_PENDING_KEY)
+        _, pending = pipe.execute()
+        return pending
+
+    def schedule_search_index_flush(self, store: Store, delay: int) -> bool:
+        """
+        Returns True if no flush was scheduled within the last `delay` seconds
+        """
+        return bool(store.redis.set(self.REDIS_SEARCH_FLUSH_KEY, 1, nx=True, ex=delay))
+
+    def flush_search_index(self, store: Store, batch_size: int) -> int:
+        """
+        Drain pending ids batch by batch. Ids of a failed batch are put back
+        into the set. Returns number of synced questions
+        """
+        synced = 0
+
+        while True:
+            members = store.redis.spop(self.REDIS_SEARCH_PENDING_KEY, batch_size)
+            if not members:
+                return synced
+
+            ids = [int(id) for id in members]
+            try:
+                self.sync_search_index(store, ids)
+            except Exception:
+                store.redis.sadd(self.REDIS_SEARCH_PENDING_KEY, *ids)
+                raise
+
+            synced += len(ids)
+
+
+question = QuestionRepository(create_search_backend(settings.SEARCH_BACKEND))
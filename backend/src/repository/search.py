@@ -0,0 +1,146 @@
+from __future__ import annotations
+
+import time
+from abc import ABC, abstractmethod
+from typing import TYPE_CHECKING, List, Optional
+
+from meilisearch.errors import MeiliSearchError
+from sqlalchemy.sql.functions import func
+
+from app.config import settings
+from models import Question
+from models.question import SEARCH_CONFIG
+from repository import exceptions
+
+if TYPE_CHECKING:
+    from storage.base import Store
+
+
+INDEX_NAME = "questions"
+INDEX_NAME_KEY = "search:questions:index"
+INDEX_SETTINGS = {
+    "searchableAttributes": ["title", "content"],
+    "displayedAttributes": ["id", "title", "url"],
+}
+
+
+def get_index_name(store: Store) -> str:
+    """
+    Name of the Meilisearch index currently serving questions,
+    full reindex builds a new index and switches this pointer to it
+    """
+    name = store.redis.get(INDEX_NAME_KEY)
+    return name.decode("utf-8") if name else INDEX_NAME
+
+
+class SearchResult:
+    def __init__(self, ids: Optional[List[int]] = None, total: int = 0):
+        self.ids = ids or []
+        self.total = total
+
+
+class SearchBackend(ABC):
+    """
+    Finds ids of questions matching the query, ordered by relevance.
+    Questions themselves are loaded by the repository
+    """
+
+    @abstractmethod
+    def search(
+        self, store: Store, query: str, *, offset: int = 0, limit: int = 20
+    ) -> SearchResult:
+        pass
+
+
+class PostgresSearchBackend(SearchBackend):
+    def search(
+        self, store: Store, query: str, *, offset: int = 0, limit: int = 20
+    ) -> SearchResult:
+        ts_query = func.websearch_to_tsquery(SEARCH_CONFIG, query)
+
+        rows = (
+            store.db.query(Question.id, func.count().over())
+            .filter(
+                Question.search_vector.op("@@")(ts_query),
+                Question.deleted_at.is_(None),
+            )
+            .order_by(
+                func.ts_rank(Question.search_vector, ts_query).desc(),
+                Question.id.desc(),
+            )
+            .offset(offset)
+            .limit(limit)
+            .all()
+        )
+
+        if not rows:
+            return SearchResult()
+
+        return SearchResult(ids=[id for id, _ in rows], total=rows[0][1])
+
+
+class MeiliSearchBackend(SearchBackend):
+    def __init__(self, index_name: Optional[str] = None):
+        self.index_name = index_name
+
+    def search(
+        self, store: Store, query: str, *, offset: int = 0, limit: int = 20
+    ) -> SearchResult:
+        params = {"offset": offset, "limit": limit, "attributesToRetrieve": ["id"]}
+
+        index_name = self.index_name or get_index_name(store)
+
+        try:
+            result = store.meili.index(index_name).search(query, params)
+        except MeiliSearchError as e:
+            raise exceptions.SearchUnavailableError(str(e))
+
+        total = result.get("estimatedTotalHits", result.get("nbHits", 0))
+        return SearchResult(ids=[int(hit["id"]) for hit in result["hits"]], total=total)
+
+
+class FallbackSearchBackend(SearchBackend):
+    """
+    Queries primary backend and switches to the fallback one when it fails,
+    skipping the primary for `cooldown` seconds afterwards
+    """
+
+    def __init__(
+        self, primary: SearchBackend, fallback: SearchBackend, *, cooldown: float
+    ):
+        self.primary = primary
+        self.fallback = fallback
+        self.cooldown = cooldown
+        self._skip_until: Optional[float] = None
+
+    def search(
+        self, store: Store, query: str, *, offset: int = 0, limit: int = 20
+    ) -> SearchResult:
+        if self._skip_until is None or time.monotonic() >= self._skip_until:
+            try:
+                result = self.primary.search(
+                    store, query, offset=offset, limit=limit
+                )
+            except exceptions.SearchUnavailableError:
+                self._skip_until = time.monotonic() + self.cooldown
+            else:
+                self._skip_until = None
+                return result
+
+        return self.fallback.search(store, query, offset=offset, limit=limit)
+
+
+def create_search_backend(name: str) -> SearchBackend:
+    postgres = PostgresSearchBackend()
+
+    if name == "postgres":
+        return postgres
+
+    if name == "meili":
+        return FallbackSearchBackend(
+            MeiliSearchBackend(),
+            postgres,
+            cooldown=settings.SEARCH_FALLBACK_COOLDOWN,
+        )
+
+    raise ValueError(f"Unknown search backend: {name}")
@@ -1,10 +1,12 @@
 from __future__ import annotations
 
-from typing import TYPE_CHECKING
+import time
+from typing import TYPE_CHECKING, Dict, List, Optional
 
 from sqlalchemy import exc
-from sqlalchemy.orm import joinedload
+from sqlalchemy.sql.expression import select
 
+from app.config import settings
 from models import Tag, TagCategory
 from repository import exceptions
 from repository.base import BaseRepostitory
@@ -13,18 +15,122 @@ if TYPE_CHECKING:
     from storage.base import Store
 
 
+class TagsSnapshot:
+    """
+    Copies of all tag categories and tags, not attached to any session,
+    so that they can be shared between requests. Must not be modified
+    """
+
+    def __init__(self, version: Optional[bytes], categories: List[TagCategory]):
+        self.version = version
+        self.categories = categories
+        self.by_slug: Dict[str, Tag] = {}
+        self.checked_at = time.monotonic()
+
+
+class TagsCache:
+    """
+    In-process snapshot of tags, which change very rarely.
+    Snapshot is checked against a version in Redis at most every
+    TAGS_SNAPSHOT_MAX_AGE seconds and reloaded when tags were changed
+    """
+
+    VERSION_KEY = "tags:version"
+
+    def __init__(self) -> None:
+        self._snapshot: Optional[TagsSnapshot] = None
+
+    def get(self, store: Store) -> TagsSnapshot:
+        snapshot = self._snapshot
+        now = time.monotonic()
+
+        if snapshot and now - snapshot.checked_at < settings.TAGS_SNAPSHOT_MAX_AGE:
+            return snapshot
+
+        version = store.redis.get(self.VERSION_KEY)
+        if snapshot is None or snapshot.version != version:
+            snapshot = self._load(store, version)
+
+        snapshot.checked_at = now
+        self._snapshot = snapshot
+
+        return snapshot
+
+    def invalidate(self, store: Store) -> None:
+        """Make all processes reload tags on their next check"""
+        store.redis.incr(self.VERSION_KEY)
+        self._snapshot = None
+
+    def clear(self) -> None:
+        self._snapshot = None
+
+    def _load(self, store: Store, version: Optional[bytes]) -> TagsSnapshot:
+        categories_table = TagCategory.__table__
+        tags_table = Tag.__table__
+
+        query = (
+            select(
+                categories_table.c.id,
+                categories_table.c.name,
+                tags_table.c.id,
+                tags_table.c.name,
+                tags_table.c.slug,
+            )
+            .select_from(categories_table.outerjoin(tags_table, full=True))
+            .order_by(categories_table.c.id, tags_table.c.id)
+        )
+
+        categories: Dict[int, TagCategory] = {}
+        tags: List[Tag] = []
+
+        for category_id, category_name, tag_id, name, slug in store.db.execute(query):
+            category = None
+            if category_id is not None:
+                if category_id not in categories:
+                    categories[category_id] = TagCategory(
+                        id=category_id, name=category_name, tags=[]
+                    )
+                category = categories[category_id]
+
+            if tag_id is not None:
+                tag = Tag(id=tag_id, name=name, slug=slug, category_id=category_id)
+                if category is not None:
+                    category.tags.append(tag)
+                tags.append(tag)
+
+        snapshot = TagsSnapshot(version, list(categories.values()))
+        snapshot.by_slug = {tag.slug: tag for tag in tags}
+
+        return snapshot
+
+
+tags_cache = TagsCache()
+
+
 class TagCategoryRepository(BaseRepostitory[TagCategory]):
     def all(self, store: Store) -> list[TagCategory]:
-        return store.db.query(TagCategory).options(joinedload(TagCategory.tags)).all()
+        return tags_cache.get(store).categories
 
 
 class TagRepository(BaseRepostitory[Tag]):
     def get_by_slug(self, store: Store, slug: str) -> Tag:
+        """
+        Find tag in the snapshot,
+        falling back to the database for tags created after it was taken
+        """
+        tag = tags_cache.get(store).by_slug.get(slug)
+        if tag is not None:
+            return tag
+
         try:
             return store.db.query(Tag).filter(Tag.slug == slug).one()
         except exc.NoResultFound:
             raise exceptions.NotFoundError
 
+    def invalidate(self, store: Store) -> None:
+        """Must be called after tags or categories are changed"""
+        tags_cache.invalidate(store)
+
 
 tag_category = TagCategoryRepository()
 tag = TagRepository()
@@ -1,70 +1,239 @@
 from __future__ import annotations
 
-from typing import TYPE_CHECKING, Any, List, Optional
+import json
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple, Union
 
-from sqlalchemy import exc
-from sqlalchemy.orm import undefer, with_expression
+from sqlalchemy import exc, text
+from sqlalchemy.orm import make_transient_to_detached, undefer
 from sqlalchemy.orm.query import Query
 from sqlalchemy.sql.elements import and_
-from sqlalchemy.sql.expression import select, true
+from sqlalchemy.sql.expression import or_, select, true, update
 from sqlalchemy.sql.functions import func
 
+from app.config import settings
 from auth.security import hash_password
+from common.pagination import CursorPaginator, Paginator
 from models import Entry, User
 from repository import exceptions
 from repository.base import BaseRepostitory
+from repository.counter import counter
+from repository.page_cache import page_cache
 
 if TYPE_CHECKING:
     from storage.base import Store
 
 
-question_count = (
-    select(func.count(Entry.id))
-    .where(and_(Entry.user_id == User.id, Entry.type == 1))
-    .scalar_subquery()
-)
-answer_count = (
-    select(func.count(Entry.id))
-    .where(and_(Entry.user_id == User.id, Entry.type == 2))
-    .scalar_subquery()
-)
+SET_IF_GENERATION_SCRIPT = """
+if (redis.call('get', KEYS[2]) or '0') ~= ARGV[1] then
+    return 0
+end
+redis.call('set', KEYS[1], ARGV[2], 'ex', ARGV[3])
+return 1
+"""
 
+SORT_OLDEST = "oldest"
+SORT_QUESTIONS = "questions"
+SORT_ANSWERS = "answers"
 
-class UserRepository(BaseRepostitory[User]):
-    def first_with_password(self, store: Store, id: int) -> Optional[User]:
-        return (
-            store.db.query(User)
-            .options(undefer("password"))
-            .filter(User.id == id)
-            .first()
+
+class UserSessionCache:
+    """
+    Fields of logged in users needed on every request, kept in Redis for
+    USER_CACHE_TTL seconds and in process memory for USER_CACHE_LOCAL_TTL
+    seconds, so that other processes see changes of a user after at most that.
+    Every invalidation bumps a generation of the user, and the cache is
+    filled only if it did not change since the miss, so a fill racing with
+    a change never brings back the old fields
+    """
+
+    KEY = "user:{id}:session"
+    GENERATION_KEY = "user:{id}:session:generation"
+    FIELDS = ("id", "email", "email_verified", "name")
+
+    def __init__(self) -> None:
+        self._local: Dict[int, Tuple[float, Dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, store: Store, id: int) -> Tuple[Optional[Dict[str, Any]], str]:
+        """
+        Return cached fields of the user, or None with the current generation
+        to pass to `set` after loading the user
+        """
+        now = time.monotonic()
+
+        entry = self._local.get(id)
+        if entry is not None and entry[0] > now:
+            return entry[1], ""
+
+        data, generation = store.redis.mget(
+            self.KEY.format(id=id), self.GENERATION_KEY.format(id=id)
+        )
+        if data is None:
+            return None, generation.decode("utf-8") if generation else "0"
+
+        fields = json.loads(data)
+        self._set_local(id, fields, now)
+        return fields, ""
+
+    def set(self, store: Store, user: User, generation: str) -> None:
+        fields = {name: getattr(user, name) for name in self.FIELDS}
+
+        stored = store.redis.eval(
+            SET_IF_GENERATION_SCRIPT,
+            2,
+            self.KEY.format(id=user.id),
+            self.GENERATION_KEY.format(id=user.id),
+            generation,
+            json.dumps(fields),
+            settings.USER_CACHE_TTL,
         )
+        if stored:
+            self._set_local(user.id, fields, time.monotonic())
+
+    def invalidate(self, store: Store, id: int) -> None:
+        generation_key = self.GENERATION_KEY.format(id=id)
+
+        pipe = store.redis.pipeline()
+        pipe.incr(generation_key)
+        pipe.expire(generation_key, settings.USER_CACHE_TTL)
+        pipe.delete(self.KEY.format(id=id))
+        pipe.execute()
+
+        with self._lock:
+            self._local.pop(id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._local = {}
+
+    def _set_local(self, id: int, fields: Dict[str, Any], now: float) -> None:
+        with self._lock:
+            if len(self._local) >= settings.USER_CACHE_LOCAL_SIZE:
+                self._local = {k: v for k, v in self._local.items() if v[0] > now}
+                if len(self._local) >= settings.USER_CACHE_LOCAL_SIZE:
+                    self._local = {}
+
+            self._local[id] = (now + settings.USER_CACHE_LOCAL_TTL, fields)
+
+
+user_session_cache = UserSessionCache()
+
+
+class UserRepository(BaseRepostitory[User]):
+    SORTS = (SORT_OLDEST, SORT_QUESTIONS, SORT_ANSWERS)
+
+    def get_for_session(self, store: Store, id: int) -> Optional[User]:
+        """
+        Load the logged in user from the session cache, without the database.
+        Other fields, like the password, are loaded from the database on access
+        """
+        fields, generation = user_session_cache.get(store, id)
+        if fields is not None:
+            # cached fields are trusted to match the database, so no query is made
+            user = User(**fields)
+            make_transient_to_detached(user)
+            return store.db.merge(user, load=False)
+
+        user = store.db.query(User).filter(User.id == id).first()
+        if user is not None:
+            # not cached if the user was changed since the miss
+            user_session_cache.set(store, user, generation)
+
+        return user
 
     def get_by_email(self, store: Store, email: str) -> User:
         query = store.db.query(User).filter(User.email == email)
         return self._get(query)
 
     def get_with_counts(self, store: Store, id: int) -> User:
-        query = (
-            store.db.query(User)
-            .options(
-                with_expression(User.question_count, question_count),
-                with_expression(User.answer_count, answer_count),
+        query = store.db.query(User).populate_existing().filter(User.id == id)
+        return self._get(query)
+
+    def list_sorted(
+        self,
+        store: Store,
+        *,
+        sort: str = SORT_OLDEST,
+        page: int = 1,
+        per_page: int = 16,
+        after: Optional[str] = None,
+        before: Optional[str] = None,
+    ) -> Union[Paginator[User], CursorPaginator[User]]:
+        params: Dict[str, Any] = {}
+
+        if sort == SORT_QUESTIONS:
+            params["keyset"] = [User.question_count, User.id]
+            params["descending"] = True
+        elif sort == SORT_ANSWERS:
+            params["keyset"] = [User.answer_count, User.id]
+            params["descending"] = True
+        elif sort != SORT_OLDEST:
+            raise ValueError(f"Unknown sort: {sort}")
+
+        return self.list(
+            store, page=page, per_page=per_page, after=after, before=before, **params
+        )
+
+    def reconcile_entry_counts(self, store: Store) -> int:
+        """
+        Recompute question and answer counts of all users,
+        returns number of fixed ones
+        """
+        users = User.__table__
+        entries = Entry.__table__
+
+        store.db.execute(text("LOCK TABLE entries IN SHARE MODE"))
+
+        alive = entries.c.deleted_at.is_(None)
+        counts = (
+            select(
+                users.c.id,
+                func.count(entries.c.id)
+                .filter(and_(alive, entries.c.type == 1))
+                .label("question_count"),
+                func.count(entries.c.id)
+                .filter(and_(alive, entries.c.type == 2))
+                .label("answer_count"),
             )
-            .filter(User.id == id)
+            .select_from(users.outerjoin(entries, entries.c.user_id == users.c.id))
+            .group_by(users.c.id)
+            .subquery()
         )
-        return self._get(query)
+        fixed = store.db.execute(
+            update(users)
+            .where(
+                users.c.id == counts.c.id,
+                or_(
+                    users.c.question_count != counts.c.question_count,
+                    users.c.answer_count != counts.c.answer_count,
+                ),
+            )
+            .values(
+                question_count=counts.c.question_count,
+                answer_count=counts.c.answer_count,
+            )
+        ).rowcount
+
+        store.db.commit()
+
+        return fixed
 
     def _list_default_filters(self) -> List[Any]:
         return [User.email_verified == true()]
 
     def _list_default_ordering(self) -> List[Any]:
-        return [User.created_at]
+        return [User.id]
+
+    def _list_keyset_descending(self) -> bool:
+        return False
+
+    def _list_counter_key(self) -> Optional[str]:
+        return counter.VERIFIED_USERS_KEY
 
     def _list_base_query(self, store: Store) -> Query:
-        return store.db.query(User).options(
-            with_expression(User.question_count, question_count),
-            with_expression(User.answer_count, answer_count),
-        )
+        return store.db.query(User).options(undefer(User.created_at))
 
     def create(self, store: Store, *, email: str, name: str, password: str) -> User:
         hashed_password = hash_password(password)
@@ -89,23 +258,37 @@ class UserRepository(BaseRepostitory[User]):
         store.db.add(user)
         store.db.commit()
 
+        user_session_cache.invalidate(store, user.id)
+
     def reset_password(self, store: Store, user: User) -> None:
         user.password = None
 
         store.db.add(user)
         store.db.commit()
 
+        user_session_cache.invalidate(store, user.id)
+
     def update_info(self, store: Store, user: User, *, name: str) -> None:
         user.name = name
 
         store.db.add(user)
         store.db.commit()
 
+        user_session_cache.invalidate(store, user.id)
+        page_cache.invalidate_for_user(store, user.id)
+
     def mark_email_verified(self, store: Store, user: User) -> None:
+        if user.email_verified:
+            return
+
         user.email_verified = True
 
         store.db.add(user)
         store.db.commit()
 
+        user_session_cache.invalidate(store, user.id)
+        counter.incr(store, counter.VERIFIED_USERS_KEY)
+        page_cache.invalidate_lists(store)
+
 
 user = UserRepository()
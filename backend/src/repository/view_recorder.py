@@ -0,0 +1,200 @@
+from __future__ import annotations
+
+import logging
+import os
+import socket
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional, Set
+
+from redis.exceptions import RedisError
+
+from app.config import settings
+from repository.hot import hot
+from repository.question import QuestionRepository
+from storage.redis import create_redis
+
+logger = logging.getLogger(__name__)
+
+
+class ViewRecorder:
+    """
+    Collects question views in memory and writes them to Redis in pipelined
+    batches from a background thread, once VIEW_RECORDER_BATCH_SIZE views are
+    buffered or every VIEW_RECORDER_INTERVAL seconds.
+    Page views never wait for Redis. While Redis is unavailable views are kept
+    in the buffer, up to VIEW_RECORDER_MAX_SIZE of them
+    """
+
+    STATS_KEY_PREFIX = "views:recorder:"
+
+    def __init__(self) -> None:
+        self._buffer: Dict[int, Set[str]] = defaultdict(set)
+        self._depth = 0
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+
+        self.flushed = 0
+        self.dropped = 0
+        self.errors = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+
+    @property
+    def depth(self) -> int:
+        return self._depth
+
+    def record(self, question_id: int, visitor: str) -> None:
+        with self._lock:
+            visitors = self._buffer.get(question_id)
+            if visitors is not None and visitor in visitors:
+                return
+
+            # a dropped view must not leave an empty set to flush
+            if self._depth >= settings.VIEW_RECORDER_MAX_SIZE:
+                self.dropped += 1
+                return
+
+            self._buffer[question_id].add(visitor)
+            self._depth += 1
+            depth = self._depth
+
+        if settings.VIEW_RECORDER_BACKGROUND:
+            self._ensure_started()
+
+        if depth >= settings.VIEW_RECORDER_BATCH_SIZE:
+            self._wakeup.set()
+
+    def flush(self) -> int:
+        """
+        Write buffered views to Redis, returning them to the buffer on failure.
+        Returns number of written views
+        """
+        with self._lock:
+            buffer, self._buffer = self._buffer, defaultdict(set)
+            depth, self._depth = self._depth, 0
+
+        if not buffer:
+            return 0
+
+        started_at = time.perf_counter()
+
+        pipe = create_redis().pipeline(transaction=False)
+        for id, visitors in buffer.items():
+            key = QuestionRepository.REDIS_QUESTION_VIEW_KEY.format(id=id)
+            hot.add_views(pipe, key, id, visitors)
+        pipe.sadd(QuestionRepository.REDIS_VIEWS_CHANGED_KEY, *buffer)
+
+        try:
+            pipe.execute()
+        except RedisError:
+            logger.exception("Failed to write %s question views", depth)
+            self.errors += 1
+            self._restore(buffer)
+            return 0
+        finally:
+            self.last_flush_ms = (time.perf_counter() - started_at) * 1000
+            self.max_flush_ms = max(self.max_flush_ms, self.last_flush_ms)
+
+        self.flushed += depth
+        self._publish_stats()
+
+        return depth
+
+    def stop(self) -> None:
+        """Stop the background thread and write the remaining views"""
+        thread = self._thread
+        if thread is not None and self._pid == os.getpid():
+            self._stopping.set()
+            self._wakeup.set()
+            thread.join(timeout=settings.VIEW_RECORDER_INTERVAL * 2)
+            self._thread = None
+            self._pid = None
+            self._stopping.clear()
+
+        self.flush()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._buffer = defaultdict(set)
+            self._depth = 0
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "depth": self._depth,
+            "flushed": self.flushed,
+            "dropped": self.dropped,
+            "errors": self.errors,
+            "last_flush_ms": round(self.last_flush_ms, 2),
+            "max_flush_ms": round(self.max_flush_ms, 2),
+        }
+
+    def collect_stats(self) -> List[Dict[str, str]]:
+        """Stats of all processes, published after their flushes"""
+        redis = create_redis()
+
+        start = len(self.STATS_KEY_PREFIX)
+
+        result = []
+        for key in redis.scan_iter(match=f"{self.STATS_KEY_PREFIX}*"):
+            values = redis.hgetall(key)
+            if values:
+                stats = {k.decode("utf-8"): v.decode("utf-8") for k, v in values.items()}
+                stats["name"] = key.decode("utf-8")[start:]
+                result.append(stats)
+
+        return result
+
+    def _restore(self, buffer: Dict[int, Set[str]]) -> None:
+        with self._lock:
+            for id, visitors in buffer.items():
+                for visitor in visitors:
+                    if self._depth >= settings.VIEW_RECORDER_MAX_SIZE:
+                        self.dropped += 1
+                    elif visitor not in self._buffer[id]:
+                        self._buffer[id].add(visitor)
+                        self._depth += 1
+
+    def _publish_stats(self) -> None:
+        key = f"{self.STATS_KEY_PREFIX}{socket.gethostname()}:{os.getpid()}"
+
+        try:
+            pipe = create_redis().pipeline(transaction=False)
+            pipe.hset(key, mapping=self.stats())
+            pipe.expire(key, max(60, int(settings.VIEW_RECORDER_INTERVAL * 10)))
+            pipe.execute()
+        except RedisError:
+            logger.exception("Failed to publish view recorder stats")
+
+    def _ensure_started(self) -> None:
+        pid = os.getpid()
+        if self._pid == pid:
+            return
+
+        with self._lock:
+            if self._pid == pid:
+                return
+
+            # threads do not survive fork, so each worker starts its own
+            self._thread = threading.Thread(
+                target=self._run, name="view-recorder", daemon=True
+            )
+            self._thread.start()
+            self._pid = pid
+
+    def _run(self) -> None:
+        while not self._stopping.is_set():
+            self._wakeup.wait(settings.VIEW_RECORDER_INTERVAL)
+            self._wakeup.clear()
+
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Unexpected error while writing question views")
+
+
+view_recorder = ViewRecorder()
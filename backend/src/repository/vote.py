@@ -1,65 +1,140 @@
 from __future__ import annotations
 
-from typing import TYPE_CHECKING, Optional
+from typing import TYPE_CHECKING, Optional, Tuple
 
-from models import Vote
+from sqlalchemy import text
+from sqlalchemy.sql.expression import select, update
+from sqlalchemy.sql.functions import func
+
+from models import Entry, User, Vote
 from repository.base import BaseRepostitory
+from repository.feed import feed
+from repository.hot import hot
+from repository.page_cache import QUESTION_ID_SQL, page_cache
 
 if TYPE_CHECKING:
     from storage.base import Store
 
 
-class VoteRepository(BaseRepostitory[Vote]):
-    def get(self, store: Store, *, user_id: int, entry_id: int) -> Vote:
-        query = store.db.query(Vote).filter(
-            Vote.entry_id == entry_id, Vote.user_id == user_id
-        )
+UPSERT_VOTE_SQL = """
+    INSERT INTO votes (user_id, entry_id, value, created_at)
+    SELECT :user_id, id, :value, now() FROM entries WHERE id = :entry_id
+    ON CONFLICT ON CONSTRAINT user_entry_uc
+        DO UPDATE SET value = EXCLUDED.value
+        WHERE votes.value <> EXCLUDED.value;
+"""
 
-        return self._get(query)
+DELETE_VOTE_SQL = """
+    DELETE FROM votes WHERE user_id = :user_id AND entry_id = :entry_id;
+"""
 
-    def exists(self, store: Store, *, user_id: int, entry_id: int) -> bool:
-        return bool(
-            store.db.query(Vote.id)
-            .filter(Vote.entry_id == entry_id, Vote.user_id == user_id)
-            .first()
-        )
+VOTE_STATE_SQL = f"""
+    SELECT entries.id, entries.type, entries.score, votes.value, ({QUESTION_ID_SQL})
+    FROM entries
+    LEFT JOIN votes
+        ON votes.entry_id = entries.id AND votes.user_id = :user_id
+    WHERE entries.id = :entry_id
+"""
 
-    def record(
-        self, store: Store, *, user_id: int, entry_id: int, value: int
-    ) -> Optional[Vote]:
-        existing = (
-            store.db.query(Vote)
-            .filter(Vote.user_id == user_id, Vote.entry_id == entry_id)
-            .one_or_none()
-        )
 
-        if value == 0:
-            if not existing:
-                raise ValueError("Vote does not exist")
+class VoteState:
+    """
+    Score of an entry with the vote of a user,
+    renders with the same templates as an entry loaded with `user_vote`
+    """
 
-            store.db.delete(existing)
-            store.db.commit()
-            return None
+    def __init__(self, *, id: int, type: int, score: int, value: Optional[int]):
+        self.id = id
+        self.type = type
+        self.score = score
+        self.value = value
+
+    @property
+    def user_vote(self) -> Optional[VoteState]:
+        return self if self.value else None
 
-        if value not in [1, 2]:
+
+class VoteRepository(BaseRepostitory[Vote]):
+    def cast(
+        self, store: Store, *, user_id: int, entry_id: int, value: int
+    ) -> Optional[VoteState]:
+        """
+        Upsert or delete the vote and read the resulting score in a single
+        statement batch. Repeated votes are no-op.
+        Returns None if the entry does not exist
+        """
+        if value not in [0, 1, 2]:
             raise ValueError("Invalid vote value")
 
-        if value == 2:
-            value = -1
+        if value == 0:
+            sql = DELETE_VOTE_SQL
+        else:
+            sql = UPSERT_VOTE_SQL
+
+        params = {
+            "user_id": user_id,
+            "entry_id": entry_id,
+            "value": -1 if value == 2 else value,
+        }
+        row = store.db.execute(text(sql + VOTE_STATE_SQL), params).first()
+        store.db.commit()
 
-        if existing:
-            if existing.value == value:
-                raise ValueError("Vote already exists")
+        if row is None:
+            return None
 
-            existing.value = value
-            store.db.add(existing)
-            store.db.commit()
-            return existing
+        id, type, score, vote_value, question_id = row
+
+        page_cache.invalidate(store, question_id)
+        if type == 1:
+            feed.set_score(store, id, score)
+            hot.set_score(store, id, score)
+
+        return VoteState(id=id, type=type, score=score, value=vote_value)
+
+    def reconcile_scores(self, store: Store) -> Tuple[int, int]:
+        """
+        Recompute scores of all entries and users from votes, fixing drift
+        of the incrementally maintained values.
+        Returns numbers of fixed entries and users
+        """
+        entries = Entry.__table__
+        users = User.__table__
+        votes = Vote.__table__
+
+        store.db.execute(text("LOCK TABLE votes IN SHARE MODE"))
+
+        entry_score = func.coalesce(func.sum(votes.c.value), 0).label("score")
+        entry_totals = (
+            select(entries.c.id, entry_score)
+            .select_from(entries.outerjoin(votes, votes.c.entry_id == entries.c.id))
+            .group_by(entries.c.id)
+            .subquery()
+        )
+        fixed_entries = store.db.execute(
+            update(entries)
+            .where(
+                entries.c.id == entry_totals.c.id,
+                entries.c.score != entry_totals.c.score,
+            )
+            .values(score=entry_totals.c.score)
+        ).rowcount
+
+        user_score = func.coalesce(func.sum(entries.c.score), 0).label("score")
+        user_totals = (
+            select(users.c.id, user_score)
+            .select_from(users.outerjoin(entries, entries.c.user_id == users.c.id))
+            .group_by(users.c.id)
+            .subquery()
+        )
+        fixed_users = store.db.execute(
+            update(users)
+            .where(users.c.id == user_totals.c.id, users.c.score != user_totals.c.score)
+            .values(score=user_totals.c.score)
+        ).rowcount
 
-        vote = Vote(user_id=user_id, entry_id=entry_id, value=value)
-        store.db.add(vote)
         store.db.commit()
-        return vote
+
+        return fixed_entries, fixed_users
 
 
 vote = VoteRepository()
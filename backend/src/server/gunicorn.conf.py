@@ -1,3 +1,5 @@
+from typing import Any
+
 wsgi_app = "app.main:app"
 bind = "unix:/run/gunicorn/socket"
 workers = 3
@@ -5,3 +7,21 @@ threads = 3
 preload_app = True
 keepalive = 5
 max_requests = 100
+
+
+def post_fork(server: Any, worker: Any) -> None:
+    from storage.db import reset_engine
+
+    reset_engine()
+
+
+def worker_exit(server: Any, worker: Any) -> None:
+    from auth.security import hasher
+    from repository.view_recorder import view_recorder
+    from storage.db import dispose_engine
+    from storage.redis import dispose_pools
+
+    view_recorder.stop()
+    hasher.shutdown()
+    dispose_engine()
+    dispose_pools()
@@ -6,7 +6,7 @@ import meilisearch
 from flask import g
 
 from storage.db import create_session
-from storage.meili import create_meili
+from storage.meili import get_meili
 from storage.redis import create_redis
 
 if TYPE_CHECKING:
@@ -54,7 +54,7 @@ class Store:
     @property
     def meili(self) -> meilisearch.Client:
         if not self._meili:
-            self._meili = create_meili()
+            self._meili = get_meili()
         return self._meili
 
     def refresh(self, instance: Any, *args: Any, **kwargs: Any) -> None:
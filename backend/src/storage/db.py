@@ -1,10 +1,11 @@
 from __future__ import annotations
 
-from typing import TYPE_CHECKING, cast
+import os
+from typing import TYPE_CHECKING, Optional
 
 from pydantic import PostgresDsn
 from sqlalchemy import create_engine as sqlalchemy_create_engine
-from sqlalchemy.orm import Session, scoped_session, sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
 
 from app.config import settings
 
@@ -12,6 +13,12 @@ if TYPE_CHECKING:
     from sqlalchemy.engine.base import Engine
 
 
+_engine: Optional[Engine] = None
+_engine_pid: Optional[int] = None
+
+SessionLocal = sessionmaker(autocommit=False, autoflush=False)
+
+
 def get_dsn() -> str:
     return PostgresDsn.build(
         scheme="postgresql",
@@ -24,13 +31,52 @@ def get_dsn() -> str:
 
 
 def create_engine() -> Engine:
-    return sqlalchemy_create_engine(get_dsn(), pool_pre_ping=True)
+    return sqlalchemy_create_engine(
+        get_dsn(),
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+    )
 
 
-def create_session() -> Session:
-    engine = create_engine()
+def get_engine() -> Engine:
+    """
+    Return engine shared by the current process, creating it on first use.
+    Engine inherited from a parent process is never reused, so every forked
+    worker ends up with its own connection pool
+    """
+    global _engine, _engine_pid
+
+    pid = os.getpid()
+    if _engine is None or _engine_pid != pid:
+        _engine = create_engine()
+        _engine_pid = pid
+
+    return _engine
 
-    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
-    session = scoped_session(SessionLocal)
-    return cast(Session, session)
+def reset_engine() -> None:
+    """
+    Forget engine inherited after fork without closing its connections,
+    as they are still owned by the parent process
+    """
+    global _engine, _engine_pid
+
+    _engine = None
+    _engine_pid = None
+
+
+def dispose_engine() -> None:
+    """
+    Close all pooled connections of the current process engine
+    """
+    if _engine is not None and _engine_pid == os.getpid():
+        _engine.dispose()
+
+    reset_engine()
+
+
+def create_session() -> Session:
+    return SessionLocal(bind=get_engine())
@@ -1,9 +1,28 @@
+from typing import Optional
+
 import meilisearch
 
 from app.config import settings
 
+_client: Optional[meilisearch.Client] = None
+
 
 def create_meili() -> meilisearch.Client:
     url = f"http://{settings.MEILI_HOST}:{settings.MEILI_PORT}"
 
-    return meilisearch.Client(url, apiKey=settings.MEILI_API_KEY)
+    return meilisearch.Client(
+        url, apiKey=settings.MEILI_API_KEY, timeout=settings.MEILI_TIMEOUT
+    )
+
+
+def get_meili() -> meilisearch.Client:
+    """
+    Return client shared by the current process. It holds no connections,
+    so it is safe to use after fork
+    """
+    global _client
+
+    if _client is None:
+        _client = create_meili()
+
+    return _client
@@ -1,9 +1,62 @@
-from redis import Redis
+from typing import Dict, Optional
+
+from redis import ConnectionPool, Redis
 
 from app.config import settings
 
+_pools: Dict[int, ConnectionPool] = {}
+
+
+def create_pool(db: int) -> ConnectionPool:
+    # RQ workers block on queues for minutes, longer than any read timeout
+    socket_timeout = (
+        None if db == settings.REDIS_RQ_DB else settings.REDIS_SOCKET_TIMEOUT
+    )
 
-def create_redis() -> Redis:
-    return Redis(
-        host=settings.REDIS_HOST, port=settings.REDIS_PORT, db=settings.REDIS_MAIN_DB
+    return ConnectionPool(
+        host=settings.REDIS_HOST,
+        port=settings.REDIS_PORT,
+        db=db,
+        max_connections=settings.REDIS_MAX_CONNECTIONS,
+        socket_timeout=socket_timeout,
+        socket_connect_timeout=settings.REDIS_SOCKET_CONNECT_TIMEOUT,
     )
+
+
+def get_pool(db: Optional[int] = None) -> ConnectionPool:
+    """
+    Return connection pool shared by the current process for the given database.
+    Pool resets itself when used from a forked process
+    """
+    if db is None:
+        db = settings.REDIS_MAIN_DB
+
+    if db not in _pools:
+        _pools[db] = create_pool(db)
+
+    return _pools[db]
+
+
+def dispose_pools() -> None:
+    """
+    Close all connections of the current process pools
+    """
+    for pool in _pools.values():
+        pool.disconnect()
+
+    _pools.clear()
+
+
+def get_pool_stats(db: Optional[int] = None) -> Dict[str, int]:
+    pool = get_pool(db)
+
+    return {
+        "in_use": len(pool._in_use_connections),
+        "idle": len(pool._available_connections),
+        "created": pool._created_connections,
+        "max": pool.max_connections,
+    }
+
+
+def create_redis(db: Optional[int] = None) -> Redis:
+    return Redis(connection_pool=get_pool(db))
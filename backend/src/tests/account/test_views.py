@@ -7,6 +7,7 @@ from tests.utils import full_url_for
 pytestmark = [pytest.mark.allow_db]
 
 
+@pytest.mark.allow_redis
 class TestMain:
     url = "/account/info"
 
@@ -47,6 +48,7 @@ class TestMain:
         assert response.status_code == 200
 
 
+@pytest.mark.allow_redis
 class TestChangePassword:
     url = "/account/change_password"
 
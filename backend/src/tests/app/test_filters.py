@@ -1,6 +1,6 @@
 import pytest
 
-from app.filters import to_page
+from app.filters import to_cursor, to_page
 
 
 @pytest.mark.parametrize(
@@ -30,3 +30,27 @@ from app.filters import to_page
 )
 def test_to_page(page_number, url, expected):
     assert to_page(url, page_number) == expected
+
+
+@pytest.mark.parametrize(
+    ("kwargs", "url", "expected"),
+    [
+        (
+            {"after": "abc"},
+            "https://example.com/questions/?page=3&q=back",
+            "https://example.com/questions/?q=back&after=abc",
+        ),
+        (
+            {"before": "abc"},
+            "https://example.com/questions/?after=xyz",
+            "https://example.com/questions/?before=abc",
+        ),
+    ],
+)
+def test_to_cursor(kwargs, url, expected):
+    assert to_cursor(url, **kwargs) == expected
+
+
+def test_to_page_drops_cursor():
+    url = "https://example.com/questions/?after=abc"
+    assert to_page(url, 1) == "https://example.com/questions/?page=1"
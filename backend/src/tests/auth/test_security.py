@@ -1,8 +1,12 @@
 import secrets
+import threading
+import time
 
+import bcrypt
 import pytest
 from freezegun import freeze_time
 
+from app.config import settings
 from auth import security
 
 
@@ -21,6 +25,130 @@ def test_hash_password():
     assert hash2 != hash1
 
 
+def test_hasher_pool(mocker, redis_db):
+    mocker.patch.object(settings, "PASSWORD_HASH_WORKERS", 1)
+    hasher = security.PasswordHasher()
+
+    try:
+        hashed = hasher.hash("123qweasd")
+
+        assert hasher.verify("123qweasd", hashed)
+        assert not hasher.verify("wrong_password", hashed)
+    finally:
+        hasher.shutdown()
+
+    stats = hasher.stats()
+    assert stats["hash_count"] == 1
+    assert stats["verify_count"] == 2
+    assert stats["verify_max_ms"] > 0
+
+
+def test_hasher_busy(mocker, redis_db):
+    mocker.patch.object(settings, "PASSWORD_HASH_QUEUE_SIZE", 0)
+    mocker.patch.object(settings, "PASSWORD_HASH_STATS_INTERVAL", 0)
+    hasher = security.PasswordHasher()
+
+    hasher._slots.acquire()
+    with pytest.raises(security.HasherBusyError):
+        hasher.hash("123qweasd")
+    hasher._slots.release()
+
+    assert hasher.stats()["rejected"] == 1
+    assert hasher.hash("123qweasd")
+
+    [stats] = hasher.collect_stats()
+    assert stats["rejected"] == "1"
+    assert stats["hash_count"] == "1"
+
+
+def test_hasher_stats_published_periodically(mocker, redis_db):
+    hasher = security.PasswordHasher()
+
+    hasher.hash("123qweasd")
+    hasher.hash("123qweasd")
+
+    [stats] = hasher.collect_stats()
+    assert stats["hash_count"] == "1"
+
+    hasher.shutdown()
+
+    [stats] = hasher.collect_stats()
+    assert stats["hash_count"] == "2"
+
+
+def test_hasher_stats_from_threads(mocker):
+    mocker.patch.object(settings, "PASSWORD_HASH_WORKERS", 0)
+    mocker.patch.object(settings, "PASSWORD_HASH_QUEUE_SIZE", 100)
+    mocker.patch.object(settings, "PASSWORD_HASH_STATS_INTERVAL", 60)
+    hasher = security.PasswordHasher()
+    publish = mocker.patch.object(hasher, "_publish_stats")
+
+    threads = [
+        threading.Thread(target=lambda: [hasher.hash("pwd") for _ in range(5)])
+        for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert hasher.stats()["hash_count"] == 40
+    assert publish.call_count == 1
+
+
+def test_hasher_timeout(mocker, redis_db):
+    mocker.patch.object(settings, "PASSWORD_HASH_WORKERS", 1)
+    mocker.patch.object(settings, "PASSWORD_HASH_QUEUE_SIZE", 0)
+    hasher = security.PasswordHasher()
+
+    try:
+        hasher.hash("123qweasd")
+
+        mocker.patch.object(settings, "PASSWORD_HASH_TIMEOUT", 0.01)
+        with pytest.raises(security.HasherTimeoutError):
+            hasher._call("hash", time.sleep, 1)
+
+        # the slot is taken until the pool is done
+        with pytest.raises(security.HasherBusyError):
+            hasher.hash("123qweasd")
+
+        assert hasher._slots.acquire(timeout=5)
+        hasher._slots.release()
+    finally:
+        hasher.shutdown()
+
+    assert hasher.stats()["timeouts"] == 1
+
+
+def test_hasher_broken_pool(mocker, redis_db):
+    mocker.patch.object(settings, "PASSWORD_HASH_WORKERS", 1)
+    hasher = security.PasswordHasher()
+
+    try:
+        hashed = hasher.hash("123qweasd")
+
+        for process in list(hasher._pool._processes.values()):
+            process.kill()
+            process.join()
+
+        with pytest.raises(security.HasherBusyError):
+            hasher.verify("123qweasd", hashed)
+
+        assert hasher.verify("123qweasd", hashed)
+    finally:
+        hasher.shutdown()
+
+
+def test_needs_rehash():
+    hashed = security.hash_password("123qweasd")
+    assert not security.needs_rehash(hashed)
+
+    old = bcrypt.hashpw(b"123qweasd", bcrypt.gensalt(4)).decode("utf-8")
+    assert security.needs_rehash(old)
+
+    assert not security.needs_rehash("invalid")
+
+
 def test_make_url_safe_token():
     token_1 = security.make_url_safe_token(user_id=5)
     assert isinstance(token_1, str)
@@ -1,6 +1,7 @@
 from unittest.mock import MagicMock
 
 import pytest
+from pytest_mock import MockerFixture
 from sqlalchemy.orm.session import Session
 
 from auth import security
@@ -8,14 +9,19 @@ from auth.services import (
     generate_and_send_password_reset_link,
     generate_and_send_verification_link,
 )
-from mail.sender import send_templated_email
+from mail.outbox import outbox
 from mail.template import EmailTemplate
 from tests.utils import full_url_for
 
 
+@pytest.fixture
+def mock_outbox_add(mocker: MockerFixture):
+    return mocker.patch.object(outbox, "add")
+
+
 @pytest.mark.freeze_time("2020-01-01")
 def test_generate_and_send_verification_link(
-    with_app_context, db: Session, user, mock_enqueue: MagicMock
+    with_app_context, db: Session, user, mock_outbox_add: MagicMock
 ):
     token = security.make_url_safe_token(user.id)
     url = full_url_for("auth.verify_email", token=token)
@@ -32,12 +38,12 @@ def test_generate_and_send_verification_link(
         template=EmailTemplate.VERIFY_EMAIL,
         context=context,
     )
-    mock_enqueue.assert_called_once_with(send_templated_email, **kwargs)
+    mock_outbox_add.assert_called_once_with(**kwargs)
 
 
 @pytest.mark.freeze_time("2020-01-01")
 def test_generate_and_send_password_reset_link(
-    with_app_context, db: Session, user, mock_enqueue: MagicMock
+    with_app_context, db: Session, user, mock_outbox_add: MagicMock
 ):
     token = security.make_url_safe_token(user.id)
     url = full_url_for("auth.reset_password", token=token)
@@ -54,4 +60,4 @@ def test_generate_and_send_password_reset_link(
         template=EmailTemplate.RESET_PASSWORD,
         context=context,
     )
-    mock_enqueue.assert_called_once_with(send_templated_email, **kwargs)
+    mock_outbox_add.assert_called_once_with(**kwargs)
@@ -2,6 +2,7 @@ import secrets
 from unittest.mock import MagicMock
 
 import freezegun
+import bcrypt
 import pytest
 from pytest_mock.plugin import MockerFixture
 
@@ -139,6 +140,7 @@ class TestSignup:
         assert repo.user.count(store) == 0
 
 
+@pytest.mark.allow_redis
 class TestLogin:
     url = "/login"
 
@@ -197,6 +199,37 @@ class TestLogin:
 
         assert response.status_code == 200
 
+    @pytest.mark.parametrize(
+        "user__password",
+        [bcrypt.hashpw(b"123qweasd", bcrypt.gensalt(4)).decode("utf-8")],
+    )
+    def test_rehash(self, client, user, store):
+        response = client.post(
+            self.url,
+            data=dict(email=user.email, password="123qweasd"),
+            follow_redirects=False,
+        )
+
+        assert response.status_code == 302
+
+        store.refresh(user)
+        assert not security.needs_rehash(user.password)
+        assert security.check_password("123qweasd", user.password)
+
+    def test_hasher_busy(self, client, user, mocker):
+        mocker.patch.object(
+            security.hasher, "verify", side_effect=security.HasherBusyError
+        )
+
+        response = client.post(
+            self.url,
+            data=dict(email=user.email, password="123qweasd"),
+            follow_redirects=False,
+        )
+
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "5"
+
     def test_user_not_found(self, client):
         response = client.post(
             self.url,
@@ -279,6 +312,7 @@ class TestForgotPasswordSent:
         assert response.status_code == 200
 
 
+@pytest.mark.allow_redis
 class TestResetPassword:
     url = "/reset_password/{token}"
 
@@ -336,6 +370,7 @@ class TestResetPassword:
             assert user.password is not None
 
 
+@pytest.mark.allow_redis
 class TestSetPassword:
     url = "/set_password"
 
@@ -425,6 +460,7 @@ class TestSetPassword:
         assert response.status_code == 403
 
 
+@pytest.mark.allow_redis
 class TestVerifyEmail:
     url = "/verify_email/{token}"
 
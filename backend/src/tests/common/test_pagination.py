@@ -1,6 +1,6 @@
 import pytest
 
-from common.pagination import Paginator
+from common.pagination import CursorPaginator, Paginator, decode_cursor, encode_cursor
 
 
 def test_objects():
@@ -88,3 +88,36 @@ def test_n_pages(total, per_page, expected):
 def test_bool(total, per_page, expected):
     paginator = Paginator(objects=[], total=total, page=1, per_page=per_page)
     assert bool(paginator) is expected
+
+
+@pytest.mark.parametrize("values", [[1], [5, 120], ["a", 3]])
+def test_cursor_roundtrip(values):
+    assert decode_cursor(encode_cursor(values)) == values
+
+
+@pytest.mark.parametrize("token", ["", "!!!", "bm90IGpzb24", encode_cursor([])])
+def test_decode_cursor_invalid(token):
+    with pytest.raises(ValueError):
+        decode_cursor(token)
+
+
+@pytest.mark.parametrize(
+    ("next_cursor", "previous_cursor", "has_next", "has_previous"),
+    [
+        (None, None, False, False),
+        ("next", None, True, False),
+        (None, "previous", False, True),
+        ("next", "previous", True, True),
+    ],
+)
+def test_cursor_paginator(next_cursor, previous_cursor, has_next, has_previous):
+    paginator = CursorPaginator(
+        objects=[],
+        per_page=10,
+        next_cursor=next_cursor,
+        previous_cursor=previous_cursor,
+    )
+
+    assert paginator.has_next is has_next
+    assert paginator.has_previous is has_previous
+    assert bool(paginator) is (has_next or has_previous)
@@ -3,9 +3,12 @@ import os
 os.environ["SECRET_KEY"] = "test_secret_key"
 os.environ["TESTING"] = "1"
 os.environ["BCRYPT_ROUNDS"] = "6"
+os.environ["PASSWORD_HASH_WORKERS"] = "0"
 os.environ["WTF_CSRF_ENABLED"] = "0"
 os.environ["DB_NAME"] = "healthqa_test"
 os.environ["REDIS_MAIN_DB"] = "15"
+os.environ["SEARCH_BACKEND"] = "postgres"
+os.environ["VIEW_RECORDER_BACKGROUND"] = "0"
 
 
 pytest_plugins = [
@@ -6,6 +6,7 @@ import pytest
 from flask import Flask
 from flask import template_rendered as flask_template_rendered
 from pytest_mock import MockerFixture
+from rq import Queue
 from sqlalchemy import event
 from sqlalchemy.engine.base import Connection, Engine
 from sqlalchemy.orm import Session
@@ -50,9 +51,54 @@ def meili_client_mock(mocker: MockerFixture):
     return mocker.patch("storage.base.Store.meili")
 
 
+@pytest.fixture(autouse=True)
+def _clear_tags_cache():
+    from repository.tag import tags_cache
+
+    tags_cache.clear()
+
+
+@pytest.fixture(autouse=True)
+def _clear_view_recorder():
+    from repository.view_recorder import view_recorder
+
+    view_recorder.clear()
+
+
+@pytest.fixture(autouse=True)
+def _clear_user_session_cache():
+    from repository.user import user_session_cache
+
+    user_session_cache.clear()
+
+
+@pytest.fixture
+def smtp_server(mocker: MockerFixture) -> Generator:
+    from app.config import settings
+    from mail.sender import connection
+    from tests.smtp_stub import SMTPStub
+
+    server = SMTPStub()
+    server.start()
+
+    mocker.patch.object(settings, "EMAIL_HOST", "localhost")
+    mocker.patch.object(settings, "EMAIL_PORT", server.port)
+    mocker.patch.object(settings, "EMAIL_USE_SSL", False)
+
+    yield server
+
+    connection.close()
+    server.stop()
+
+
 @pytest.fixture
 def mock_enqueue(mocker: MockerFixture):
-    return mocker.patch("worker.queue.enqueue")
+    return mocker.patch.object(Queue, "enqueue", autospec=True)
+
+
+@pytest.fixture
+def mock_enqueue_in(mocker: MockerFixture):
+    return mocker.patch.object(Queue, "enqueue_in", autospec=True)
 
 
 @pytest.fixture
@@ -29,6 +29,14 @@ class TestIndex:
         assert response.status_code == 200
         assert template_rendered("home/index.html")
 
+    def test_cached(self, client, max_num_queries):
+        response = client.get(self.url)
+
+        with max_num_queries(0):
+            cached = client.get(self.url)
+
+        assert cached.data == response.data
+
 
 class TestAbout:
     url = "/about"
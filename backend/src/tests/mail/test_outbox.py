@@ -0,0 +1,173 @@
+import smtplib
+from datetime import timedelta
+from unittest.mock import MagicMock
+
+import pytest
+from pytest_mock import MockerFixture
+
+from app.config import settings
+from mail.outbox import outbox, send_queued_emails
+from mail.sender import DeliveryUnknownError
+from mail.template import EmailTemplate
+from worker import email_queue
+
+pytestmark = pytest.mark.usefixtures("redis_db")
+
+
+def _add(to: str) -> None:
+    outbox.add(
+        to=to,
+        subject="Account activation",
+        template=EmailTemplate.VERIFY_EMAIL,
+        context={"name": "User", "url": "http://localhost/verify"},
+    )
+
+
+def test_add(mock_enqueue: MagicMock):
+    _add("first@example.com")
+    _add("second@example.com")
+
+    assert outbox.size() == 2
+    mock_enqueue.assert_called_once_with(email_queue, send_queued_emails)
+
+
+def test_send(smtp_server, redis_db, mock_enqueue: MagicMock, mocker: MockerFixture):
+    mocker.patch.object(settings, "EMAIL_BATCH_SIZE", 2)
+    for i in range(5):
+        _add(f"user{i}@example.com")
+
+    assert send_queued_emails() == 5
+
+    assert [email.recipients for email in smtp_server.received] == [
+        [f"user{i}@example.com"] for i in range(5)
+    ]
+    assert "http://localhost/verify" in smtp_server.received[0].content
+    assert smtp_server.connections == 1
+    assert outbox.size() == 0
+    assert not redis_db.exists(outbox.SENDING_KEY)
+    assert not redis_db.exists(outbox.PROCESSING_KEY)
+
+    _add("next@example.com")
+
+    assert mock_enqueue.call_count == 2
+
+
+def test_send_drops_refused(smtp_server, mock_enqueue: MagicMock):
+    smtp_server.refused.add("missing@example.com")
+    _add("missing@example.com")
+    _add("user@example.com")
+
+    assert send_queued_emails() == 1
+
+    assert [email.recipients for email in smtp_server.received] == [
+        ["user@example.com"]
+    ]
+    assert outbox.size() == 0
+
+
+def test_send_retries_deferred(
+    smtp_server, mock_enqueue: MagicMock, mock_enqueue_in: MagicMock
+):
+    smtp_server.deferred.add("busy@example.com")
+    _add("busy@example.com")
+    _add("user@example.com")
+
+    with pytest.raises(smtplib.SMTPRecipientsRefused):
+        send_queued_emails()
+
+    assert smtp_server.received == []
+    assert outbox.size() == 2
+    mock_enqueue_in.assert_called_once()
+
+    smtp_server.deferred.clear()
+    assert send_queued_emails() == 2
+
+    assert [email.recipients for email in smtp_server.received] == [
+        ["busy@example.com"],
+        ["user@example.com"],
+    ]
+
+
+@pytest.mark.parametrize(
+    ("error", "dropped"),
+    [
+        (smtplib.SMTPSenderRefused(553, b"Sender refused", "from@example.com"), True),
+        (smtplib.SMTPSenderRefused(451, b"Try again later", "from@example.com"), False),
+        (smtplib.SMTPDataError(554, b"Message rejected"), True),
+        (smtplib.SMTPDataError(452, b"Insufficient storage"), False),
+    ],
+)
+def test_send_refused_reply_codes(
+    error,
+    dropped,
+    mock_enqueue: MagicMock,
+    mock_enqueue_in: MagicMock,
+    mocker: MockerFixture,
+):
+    mocker.patch("mail.outbox.send_mail", side_effect=[error, None])
+    _add("first@example.com")
+    _add("second@example.com")
+
+    if dropped:
+        assert send_queued_emails() == 1
+        assert outbox.size() == 0
+    else:
+        with pytest.raises(type(error)):
+            send_queued_emails()
+        assert outbox.size() == 2
+
+
+def test_send_retries(
+    mock_enqueue: MagicMock, mock_enqueue_in: MagicMock, mocker: MockerFixture
+):
+    mock_send_mail = mocker.patch(
+        "mail.outbox.send_mail",
+        side_effect=[None, smtplib.SMTPServerDisconnected(), None, None],
+    )
+    for i in range(3):
+        _add(f"user{i}@example.com")
+
+    with pytest.raises(smtplib.SMTPServerDisconnected):
+        send_queued_emails()
+
+    assert outbox.size() == 2
+    mock_enqueue_in.assert_called_once_with(
+        email_queue,
+        timedelta(seconds=settings.EMAIL_RETRY_DELAY),
+        send_queued_emails,
+    )
+
+    assert send_queued_emails() == 2
+
+    sent_to = [call.kwargs["to"] for call in mock_send_mail.call_args_list]
+    assert sent_to == [f"user{i}@example.com" for i in (0, 1, 1, 2)]
+
+
+def test_send_resumes_interrupted_batch(
+    mock_enqueue: MagicMock, mocker: MockerFixture
+):
+    mock_send_mail = mocker.patch(
+        "mail.outbox.send_mail", side_effect=[None, SystemExit(), None, None]
+    )
+    for i in range(3):
+        _add(f"user{i}@example.com")
+
+    # the job is killed in the middle of the batch
+    with pytest.raises(SystemExit):
+        send_queued_emails()
+
+    assert outbox.size() == 2
+    assert send_queued_emails() == 2
+
+    sent_to = [call.kwargs["to"] for call in mock_send_mail.call_args_list]
+    assert sent_to == [f"user{i}@example.com" for i in (0, 1, 1, 2)]
+    assert outbox.size() == 0
+
+
+def test_send_drops_delivery_unknown(mock_enqueue: MagicMock, mocker: MockerFixture):
+    mocker.patch("mail.outbox.send_mail", side_effect=[DeliveryUnknownError(), None])
+    _add("first@example.com")
+    _add("second@example.com")
+
+    assert send_queued_emails() == 1
+    assert outbox.size() == 0
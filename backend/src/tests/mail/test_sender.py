@@ -1,4 +1,5 @@
 import os
+import smtplib
 from enum import Enum
 from unittest.mock import MagicMock
 
@@ -6,7 +7,12 @@ import pytest
 from pytest_mock.plugin import MockerFixture
 
 from app.config import settings
-from mail.sender import send_templated_email
+from mail.sender import (
+    DeliveryUnknownError,
+    get_environment,
+    send_mail,
+    send_templated_email,
+)
 
 
 @pytest.fixture
@@ -51,3 +57,87 @@ def test_send_templated_email(
     mock_send_mail.assert_called_once_with(
         to=to_email, subject=subject, message=expected_message
     )
+
+
+def test_send_mail(smtp_server):
+    send_mail(to="first@example.com", subject="First", message="Hello")
+    send_mail(to="second@example.com", subject="Second", message="Hi")
+
+    assert [email.recipients for email in smtp_server.received] == [
+        ["first@example.com"],
+        ["second@example.com"],
+    ]
+    assert "Subject: First" in smtp_server.received[0].content
+    assert smtp_server.received[0].content.endswith("Hello")
+    assert smtp_server.connections == 1
+
+
+def test_send_mail_reconnects(smtp_server):
+    send_mail(to="first@example.com", subject="First", message="Hello")
+    smtp_server.drop_connections()
+
+    send_mail(to="second@example.com", subject="Second", message="Hi")
+
+    assert len(smtp_server.received) == 2
+    assert smtp_server.connections == 2
+
+
+def test_send_mail_not_resent_after_data(smtp_server):
+    smtp_server.drop_after_data = True
+
+    with pytest.raises(DeliveryUnknownError):
+        send_mail(to="first@example.com", subject="First", message="Hello")
+
+    smtp_server.drop_after_data = False
+    send_mail(to="second@example.com", subject="Second", message="Hi")
+
+    assert [email.recipients for email in smtp_server.received] == [
+        ["first@example.com"],
+        ["second@example.com"],
+    ]
+    assert smtp_server.connections == 2
+
+
+def test_send_mail_not_resent_after_data_on_reconnect(smtp_server):
+    send_mail(to="first@example.com", subject="First", message="Hello")
+    smtp_server.drop_connections()
+    smtp_server.drop_after_data = True
+
+    # the first attempt fails before DATA, the one after reconnecting after it
+    with pytest.raises(DeliveryUnknownError):
+        send_mail(to="second@example.com", subject="Second", message="Hi")
+
+    assert [email.recipients for email in smtp_server.received] == [
+        ["first@example.com"],
+        ["second@example.com"],
+    ]
+    assert smtp_server.connections == 2
+
+
+def test_send_mail_checks_idle_connection(smtp_server, mocker: MockerFixture):
+    mocker.patch.object(settings, "EMAIL_HEALTH_CHECK_INTERVAL", 0)
+    noop = mocker.spy(smtplib.SMTP, "noop")
+
+    send_mail(to="first@example.com", subject="First", message="Hello")
+    smtp_server.drop_connections()
+    send_mail(to="second@example.com", subject="Second", message="Hi")
+
+    assert noop.call_count == 1
+    assert len(smtp_server.received) == 2
+    assert smtp_server.connections == 2
+
+
+def test_send_mail_refused(smtp_server):
+    smtp_server.refused.add("missing@example.com")
+
+    with pytest.raises(smtplib.SMTPRecipientsRefused):
+        send_mail(to="missing@example.com", subject="Subject", message="Hello")
+
+    send_mail(to="first@example.com", subject="First", message="Hello")
+
+    assert len(smtp_server.received) == 1
+    assert smtp_server.connections == 1
+
+
+def test_environment_is_shared():
+    assert get_environment() is get_environment()
@@ -1,13 +1,26 @@
-from unittest.mock import MagicMock
+from datetime import timedelta
+from unittest.mock import ANY, MagicMock
 
 import pytest
+from pytest_mock import MockerFixture
 
+import repository as repo
+from app.config import settings
 from questions import services, tasks
 from storage.base import Store
+from worker import maintenance_queue, search_queue
+
+
+def _pending(store: Store):
+    members = store.redis.smembers(repo.question.REDIS_SEARCH_PENDING_KEY)
+    return {int(id) for id in members}
 
 
 @pytest.mark.allow_db
-def test_create_question(store: Store, mock_enqueue: MagicMock, user):
+@pytest.mark.allow_redis
+def test_create_question(
+    store: Store, mock_enqueue: MagicMock, mock_enqueue_in: MagicMock, user
+):
     data = {
         "user": user,
         "title": "Test title",
@@ -23,19 +36,27 @@ def test_create_question(store: Store, mock_enqueue: MagicMock, user):
     assert question.content == data["content"]
     assert question.tags == data["tags"]
 
-    mock_enqueue.assert_called_once_with(
-        tasks.update_question_search_index, question_id=question.id
+    assert _pending(store) == {question.id}
+    mock_enqueue_in.assert_called_once_with(
+        search_queue,
+        timedelta(seconds=settings.SEARCH_INDEX_FLUSH_INTERVAL),
+        tasks.flush_search_index,
     )
+    mock_enqueue.assert_not_called()
 
 
 @pytest.mark.allow_db
-def test_update_question(store: Store, question, mock_enqueue: MagicMock, user):
+@pytest.mark.allow_redis
+def test_update_question(
+    store: Store, question, mock_enqueue: MagicMock, mock_enqueue_in: MagicMock
+):
     data = {
         "new_title": "Test title",
         "new_content": "Test content",
         "tags": [],
     }
 
+    services.update_question(store, question, **data)
     services.update_question(store, question, **data)
 
     store.refresh(question)
@@ -44,6 +65,49 @@ def test_update_question(store: Store, question, mock_enqueue: MagicMock, user):
     assert question.content == data["new_content"]
     assert question.tags == data["tags"]
 
-    mock_enqueue.assert_called_once_with(
-        tasks.update_question_search_index, question_id=question.id
+    assert _pending(store) == {question.id}
+    mock_enqueue_in.assert_called_once()
+
+
+@pytest.mark.allow_db
+@pytest.mark.allow_redis
+def test_delete_entry(store: Store, question, answer, mock_enqueue_in: MagicMock):
+    services.delete_entry(store, id=answer.id, user_id=answer.user_id)
+    assert _pending(store) == set()
+
+    services.delete_entry(store, id=question.id, user_id=question.user_id)
+    assert _pending(store) == {question.id}
+
+
+@pytest.mark.allow_redis
+def test_schedule_flush_on_batch_size(
+    store: Store, mocker: MockerFixture, mock_enqueue: MagicMock, mock_enqueue_in
+):
+    mocker.patch.object(settings, "SEARCH_INDEX_BATCH_SIZE", 3)
+
+    for id in range(1, 7):
+        services.schedule_search_index_update(store, id)
+
+    assert mock_enqueue.call_count == 2
+    mock_enqueue.assert_called_with(search_queue, tasks.flush_search_index)
+    mock_enqueue_in.assert_called_once()
+
+
+@pytest.mark.allow_redis
+def test_schedule_view_count_snapshot(store: Store, mock_enqueue_in: MagicMock):
+    services.schedule_view_count_snapshot(store, delay=0)
+    services.schedule_view_count_snapshot(store)
+
+    mock_enqueue_in.assert_called_once_with(
+        maintenance_queue, timedelta(seconds=0), tasks.snapshot_view_counts, ANY
+    )
+
+
+@pytest.mark.allow_redis
+def test_schedule_counter_reconciliation(store: Store, mock_enqueue_in: MagicMock):
+    services.schedule_counter_reconciliation(store, delay=0)
+    services.schedule_counter_reconciliation(store)
+
+    mock_enqueue_in.assert_called_once_with(
+        maintenance_queue, timedelta(seconds=0), tasks.reconcile_counters, ANY
     )
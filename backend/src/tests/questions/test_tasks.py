@@ -1,9 +1,13 @@
-from unittest.mock import MagicMock
+from datetime import timedelta
+from unittest.mock import ANY, MagicMock
 
 import pytest
 
 import repository as repo
+from app.config import settings
 from questions import tasks
+from storage.base import Store
+from worker import maintenance_queue
 
 
 @pytest.fixture
@@ -13,9 +17,93 @@ def document(app, question):
 
 
 @pytest.mark.allow_db
-def test_update_question_search_index(question, document, meili_client_mock: MagicMock):
-    tasks.update_question_search_index(question.id)
+@pytest.mark.allow_redis
+def test_flush_search_index(
+    store: Store, question, document, meili_client_mock: MagicMock
+):
+    repo.question.mark_for_indexing(store, question.id)
+
+    tasks.flush_search_index()
 
     meili_client_mock.index("questions").add_documents.assert_called_once_with(
         [document]
     )
+    assert repo.question.mark_for_indexing(store, question.id) == 1
+
+
+@pytest.mark.allow_db
+@pytest.mark.allow_redis
+def test_snapshot_view_counts(store: Store, question, mock_enqueue_in: MagicMock):
+    repo.question.register_view(store, question.id, "192.168.1.1")
+    token = repo.periodic.schedule(store, tasks.VIEW_COUNT_SNAPSHOT, 60)
+
+    tasks.snapshot_view_counts(token)
+
+    assert repo.question.get(store, question.id).view_count == 1
+    mock_enqueue_in.assert_called_once_with(
+        maintenance_queue,
+        timedelta(seconds=settings.VIEW_COUNT_SNAPSHOT_INTERVAL),
+        tasks.snapshot_view_counts,
+        ANY,
+    )
+
+
+@pytest.mark.allow_db
+@pytest.mark.allow_redis
+def test_snapshot_view_counts_replaced(
+    store: Store, question, mock_enqueue_in: MagicMock
+):
+    repo.question.register_view(store, question.id, "192.168.1.1")
+    stale = repo.periodic.schedule(store, tasks.VIEW_COUNT_SNAPSHOT, 60)
+    store.redis.delete(repo.periodic.KEY.format(name=tasks.VIEW_COUNT_SNAPSHOT))
+    repo.periodic.schedule(store, tasks.VIEW_COUNT_SNAPSHOT, 60)
+
+    tasks.snapshot_view_counts(stale)
+
+    assert repo.question.get(store, question.id).view_count == 0
+    mock_enqueue_in.assert_not_called()
+
+
+@pytest.mark.allow_redis
+def test_renormalize_hot_ranking(store: Store, mock_enqueue_in: MagicMock):
+    repo.hot.add(store, 1)
+    token = repo.periodic.schedule(store, tasks.HOT_RENORMALIZATION, 60)
+
+    tasks.renormalize_hot_ranking(token)
+
+    assert store.redis.get(repo.hot.EPOCH_KEY) is not None
+    mock_enqueue_in.assert_called_once_with(
+        maintenance_queue,
+        timedelta(seconds=settings.HOT_RENORMALIZE_INTERVAL),
+        tasks.renormalize_hot_ranking,
+        ANY,
+    )
+
+
+@pytest.mark.allow_redis
+def test_renormalize_hot_ranking_replaced(store: Store, mock_enqueue_in: MagicMock):
+    stale = repo.periodic.schedule(store, tasks.HOT_RENORMALIZATION, 60)
+    store.redis.delete(repo.periodic.KEY.format(name=tasks.HOT_RENORMALIZATION))
+    repo.periodic.schedule(store, tasks.HOT_RENORMALIZATION, 60)
+
+    tasks.renormalize_hot_ranking(stale)
+
+    assert store.redis.get(repo.hot.EPOCH_KEY) is None
+    mock_enqueue_in.assert_not_called()
+
+
+@pytest.mark.allow_db
+@pytest.mark.allow_redis
+def test_reconcile_counters(store: Store, question, mock_enqueue_in: MagicMock):
+    store.redis.set(repo.counter.QUESTIONS_KEY, 5)
+    token = repo.periodic.schedule(store, tasks.COUNTER_RECONCILIATION, 60)
+
+    tasks.reconcile_counters(token)
+
+    assert int(store.redis.get(repo.counter.QUESTIONS_KEY)) == 1
+    mock_enqueue_in.assert_called_once_with(
+        maintenance_queue,
+        timedelta(seconds=settings.COUNTER_RECONCILE_INTERVAL),
+        tasks.reconcile_counters,
+        ANY,
+    )
@@ -1,4 +1,5 @@
 from datetime import datetime
+from unittest.mock import patch
 
 import pytest
 from faker import Faker
@@ -6,6 +7,8 @@ from pytest_factoryboy import LazyFixture
 from sqlalchemy.orm.session import Session
 
 import repository as repo
+from common.pagination import encode_cursor
+from models import Vote
 from storage import Store
 from tests import factories
 from tests.utils import full_url_for
@@ -15,6 +18,7 @@ fake = Faker()
 pytestmark = [pytest.mark.allow_db]
 
 
+@pytest.mark.allow_redis
 class TestAskQuestion:
     url = "/questions/ask"
 
@@ -107,7 +111,55 @@ class TestAllQuestions:
 
         assert response.status_code == 200
 
+    def test_cursor(self, client, question, max_num_queries):
+        url = self.url + "?after=" + encode_cursor([question.id + 1])
+
+        with max_num_queries(2):
+            response = client.get(url)
+
+        assert response.status_code == 200
+        assert question.title in response.get_data(as_text=True)
+
+    def test_not_modified(self, client, store, max_num_queries):
+        response = client.get(self.url)
+
+        with max_num_queries(0):
+            not_modified = client.get(
+                self.url, headers={"If-None-Match": response.headers["ETag"]}
+            )
+        assert not_modified.status_code == 304
+
+        repo.page_cache.invalidate_lists(store)
+        response = client.get(
+            self.url, headers={"If-None-Match": response.headers["ETag"]}
+        )
+        assert response.status_code == 200
+
+    @pytest.mark.parametrize("cursor", ["invalid", encode_cursor(["abc"])])
+    def test_invalid_cursor(self, client, cursor):
+        response = client.get(self.url + f"?after={cursor}")
+
+        assert response.status_code == 404
+
+    @pytest.mark.parametrize(
+        "sort", ["newest", "hot", "unanswered", "answers", "views"]
+    )
+    def test_sort(self, client, store, question, sort, max_num_queries):
+        repo.hot.add(store, question.id)
+
+        with max_num_queries(3):
+            response = client.get(self.url + f"?sort={sort}")
+
+        assert response.status_code == 200
+        assert question.title in response.get_data(as_text=True)
+
+    def test_invalid_sort(self, client):
+        response = client.get(self.url + "?sort=invalid")
 
+        assert response.status_code == 404
+
+
+@pytest.mark.allow_redis
 class TestTags:
     url = "/tags/"
 
@@ -160,6 +212,92 @@ class TestDetails:
 
         assert response.status_code == 200
 
+    def test_cached(self, client, question_with_related, store, max_num_queries):
+        url = self.url.format(
+            id=question_with_related.id, slug=question_with_related.slug
+        )
+        response = client.get(url)
+
+        with max_num_queries(0):
+            cached = client.get(url)
+
+        assert cached.status_code == 200
+        assert cached.data == response.data
+        assert repo.page_cache.stats(store) == {"hits": 1, "misses": 1}
+
+        repo.view_recorder.flush()
+        key = repo.question.REDIS_QUESTION_VIEW_KEY.format(
+            id=question_with_related.id
+        )
+        assert store.redis.exists(key)
+
+    def test_cache_invalidated(self, client, question, user, store):
+        url = self.url.format(id=question.id, slug=question.slug)
+        client.get(url)
+
+        repo.answer.create(
+            store, user=user, question_id=question.id, content="New answer"
+        )
+        response = client.get(url)
+
+        assert "New answer" in response.get_data(as_text=True)
+        assert repo.page_cache.stats(store) == {"hits": 0, "misses": 2}
+
+    def test_not_cached_for_user(self, as_user, question, store):
+        response = as_user.get(self.url.format(id=question.id, slug=question.slug))
+
+        assert response.status_code == 200
+        assert repo.page_cache.stats(store) == {"hits": 0, "misses": 0}
+
+    def test_not_modified(self, client, question, user, store, max_num_queries):
+        url = self.url.format(id=question.id, slug=question.slug)
+        response = client.get(url)
+        version, _ = repo.page_cache.validators(store, question.id)
+        assert response.headers["ETag"] == f'W/"question-{question.id}-{version}"'
+        assert response.headers["Cache-Control"] == "no-cache"
+
+        etag = response.headers["ETag"]
+        with max_num_queries(0):
+            not_modified = client.get(url, headers={"If-None-Match": etag})
+
+        assert not_modified.status_code == 304
+        assert not_modified.headers["ETag"] == etag
+        assert repo.page_cache.stats(store) == {"hits": 0, "misses": 1}
+
+        repo.answer.create(
+            store, user=user, question_id=question.id, content="New answer"
+        )
+        modified = client.get(url, headers={"If-None-Match": etag})
+
+        assert modified.status_code == 200
+        assert modified.headers["ETag"] == f'W/"question-{question.id}-{version + 1}"'
+
+        not_modified = client.get(
+            url, headers={"If-Modified-Since": modified.headers["Last-Modified"]}
+        )
+        assert not_modified.status_code == 304
+
+    def test_not_modified_registers_view(self, client, question):
+        url = self.url.format(id=question.id, slug=question.slug)
+        etag = client.get(url).headers["ETag"]
+
+        with patch.object(repo.view_recorder, "record") as record:
+            not_modified = client.get(
+                url,
+                headers={"If-None-Match": etag},
+                environ_base={"REMOTE_ADDR": "192.168.1.1"},
+            )
+
+        assert not_modified.status_code == 304
+        record.assert_called_once_with(question.id, "192.168.1.1")
+
+    def test_no_validators_for_user(self, as_user, question):
+        url = self.url.format(id=question.id, slug=question.slug)
+        response = as_user.get(url, headers={"If-None-Match": 'W/"question-1-0"'})
+
+        assert response.status_code == 200
+        assert "ETag" not in response.headers
+
     @pytest.mark.parametrize(
         "url",
         [
@@ -192,6 +330,7 @@ class TestDetails:
         assert response.status_code == 404
 
 
+@pytest.mark.allow_redis
 class TestEditQuestion:
     url = "/questions/{id}/edit"
 
@@ -281,6 +420,7 @@ class TestEditQuestion:
         assert question.content != data["content"]
 
 
+@pytest.mark.allow_redis
 class TestAnswer:
     url = "/questions/{id}/answer"
 
@@ -325,6 +465,7 @@ class TestAnswer:
         assert not repo.answer.exists(store)
 
 
+@pytest.mark.allow_redis
 class TestEditAnswer:
     url = "/answers/{id}/edit"
 
@@ -402,6 +543,7 @@ class TestEditAnswer:
         assert answer.content != new_content
 
 
+@pytest.mark.allow_redis
 class TestComment:
     url = "/entries/{id}/comment"
 
@@ -446,6 +588,7 @@ class TestComment:
         assert not repo.comment.exists(store)
 
 
+@pytest.mark.allow_redis
 class TestEditComment:
     url = "/comments/{id}/edit"
 
@@ -534,6 +677,7 @@ class TestEditComment:
         assert comment.content != data["content"]
 
 
+@pytest.mark.allow_redis
 class TestVote:
     url = "/entries/{id}/vote/{value}"
 
@@ -570,7 +714,7 @@ class TestVote:
         )
 
         assert response.status_code == 200
-        assert not repo.vote.exists(store, user_id=user.id, entry_id=question.id)
+        assert not store.db.query(Vote).filter_by(user_id=user.id).count()
 
     def test_error(self, store: Store, as_user, user, question):
         response = as_user.post(
@@ -580,9 +724,33 @@ class TestVote:
         assert response.status_code == 400
         assert response.json == {"error": "Invalid vote value"}
 
-        assert not repo.vote.exists(store, user_id=user.id, entry_id=question.id)
+        assert not store.db.query(Vote).filter_by(user_id=user.id).count()
+
+    def test_unexisting_entry(self, as_user):
+        response = as_user.post(self.url.format(id=999, value=1))
+
+        assert response.status_code == 404
+        assert response.json == {"error": "invalid entry_id"}
+
+    def test_renders_score(self, as_user, question, template_rendered, max_num_queries):
+        factories.VoteFactory.create_batch(2, entry_id=question.id, value=1)
+
+        with max_num_queries(2):
+            response = as_user.post(self.url.format(id=question.id, value=2))
+
+        assert response.status_code == 200
+        assert template_rendered("questions/_vote_large.html")
+        assert b'<div class="text-3xl score text-center">1</div>' in response.data
 
+    def test_renders_comment_score(self, as_user, question_comment, template_rendered):
+        response = as_user.post(self.url.format(id=question_comment.id, value=1))
 
+        assert response.status_code == 200
+        assert template_rendered("questions/_vote_comment.html")
+        assert b'<div class="score text-center">1</div>' in response.data
+
+
+@pytest.mark.allow_redis
 class TestDeleteEntry:
     url = "/entries/{id}"
 
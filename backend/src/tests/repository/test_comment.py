@@ -4,7 +4,7 @@ import repository as repo
 from repository import exceptions
 from storage import Store
 
-pytestmark = [pytest.mark.allow_db]
+pytestmark = [pytest.mark.allow_db, pytest.mark.allow_redis]
 
 
 def test_get(store: Store, question_or_answer_comment, max_num_queries):
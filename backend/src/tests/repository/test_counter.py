@@ -0,0 +1,110 @@
+import pytest
+
+import repository as repo
+from storage import Store
+from tests import factories
+
+pytestmark = [pytest.mark.allow_db, pytest.mark.allow_redis]
+
+KEY = "counter:test"
+
+
+def test_get_computes_once(store: Store):
+    assert repo.counter.get(store, KEY, lambda: 5) == 5
+    assert repo.counter.get(store, KEY, lambda: 10) == 5
+
+
+def test_incr_existing(store: Store):
+    repo.counter.get(store, KEY, lambda: 5)
+
+    repo.counter.incr(store, KEY)
+    repo.counter.incr(store, KEY, amount=3)
+    repo.counter.decr(store, KEY)
+
+    assert repo.counter.get(store, KEY, lambda: 0) == 8
+
+
+def test_incr_missing(store: Store):
+    repo.counter.incr(store, KEY)
+
+    assert store.redis.get(KEY) is None
+
+
+def _question_total(store: Store) -> int:
+    return repo.counter.get(store, repo.counter.QUESTIONS_KEY, lambda: -1)
+
+
+def test_question_create_and_delete(store: Store, user, tag):
+    factories.QuestionFactory.create_batch(2)
+
+    assert repo.question.list(store).total == 2
+
+    question = repo.question.create(
+        store, user=user, title="Title", content="Content", tags=[tag.id]
+    )
+    assert _question_total(store) == 3
+
+    paginator = repo.question.list_by_tag(store, tag)
+    assert paginator.total == 1
+
+    repo.entry.mark_as_deleted(store, id=question.id, user_id=user.id)
+    repo.entry.mark_as_deleted(store, id=question.id, user_id=user.id)
+
+    assert _question_total(store) == 2
+    assert repo.question.list_by_tag(store, tag).total == 0
+    assert repo.question.list_for_user(store, user).total == 0
+
+
+def test_question_update_tags(store: Store, question, tag, other_tag):
+    question.tags = [tag]
+    store.db.commit()
+
+    assert repo.question.list_by_tag(store, tag).total == 1
+    assert repo.question.list_by_tag(store, other_tag).total == 0
+
+    repo.question.update(
+        store, question, new_title="Title", new_content="Content", tags=[other_tag.id]
+    )
+
+    assert repo.question.list_by_tag(store, tag).total == 0
+    assert repo.question.list_by_tag(store, other_tag).total == 1
+
+
+def test_list_uses_counter(store: Store, max_num_queries):
+    factories.QuestionFactory.create_batch(3)
+    repo.question.list(store)
+
+    with max_num_queries(1):
+        assert repo.question.list(store).total == 3
+
+
+@pytest.mark.parametrize("user__email_verified", [False])
+def test_verified_users(store: Store, user):
+    factories.UserFactory.create_batch(2)
+
+    assert repo.user.list(store).total == 2
+
+    repo.user.mark_email_verified(store, user)
+    repo.user.mark_email_verified(store, user)
+
+    assert repo.user.list(store).total == 3
+
+
+def test_reconcile(store: Store, user, tag):
+    factories.QuestionFactory.create_batch(2, user=user, tags=[tag])
+    factories.QuestionFactory()
+
+    user_key = repo.counter.USER_QUESTIONS_KEY.format(id=user.id)
+    tag_key = repo.counter.TAG_QUESTIONS_KEY.format(id=tag.id)
+
+    store.redis.set(repo.counter.QUESTIONS_KEY, 10)
+    store.redis.set(user_key, 2)
+    store.redis.set(repo.counter.TAG_QUESTIONS_KEY.format(id=999), 4)
+
+    assert repo.counter.reconcile(store) == 2
+
+    assert _question_total(store) == 3
+    assert repo.counter.get(store, user_key, lambda: -1) == 2
+    assert repo.counter.get(store, tag_key, lambda: -1) == 2
+    assert repo.counter.get(store, repo.counter.VERIFIED_USERS_KEY, lambda: -1) == 2
+    assert store.redis.get(repo.counter.TAG_QUESTIONS_KEY.format(id=999)) is None
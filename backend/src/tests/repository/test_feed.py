@@ -0,0 +1,94 @@
+from datetime import datetime
+
+import pytest
+from pytest_mock import MockerFixture
+
+import repository as repo
+from app.config import settings
+from questions import services
+from storage import Store
+from tests import factories
+
+pytestmark = [pytest.mark.allow_db, pytest.mark.allow_redis]
+
+
+@pytest.fixture
+def questions(tag):
+    questions = factories.QuestionFactory.create_batch(3, tags=[tag])
+    factories.QuestionFactory(deleted_at=datetime.utcnow())
+    return questions
+
+
+def test_latest(store: Store, questions, max_num_queries, with_app_context):
+    with max_num_queries(1):
+        result = repo.feed.latest(store)
+
+    assert [q.id for q in result] == [q.id for q in reversed(questions)]
+
+    with max_num_queries(0):
+        result = repo.feed.latest(store)
+
+    for question, cached in zip(reversed(questions), result):
+        assert cached.title == question.title
+        assert cached.url == question.url
+        assert cached.user.name == question.user.name
+        assert [t.slug for t in cached.tags] == [t.slug for t in question.tags]
+        assert cached.view_count == 0
+
+
+def test_feed_size(store: Store, questions, mocker: MockerFixture):
+    mocker.patch.object(settings, "FEED_SIZE", 2)
+    repo.feed.latest(store)
+
+    question = factories.QuestionFactory()
+    repo.feed.add(store, question.id)
+
+    assert [q.id for q in repo.feed.latest(store)] == [question.id, questions[2].id]
+
+
+def test_create_and_delete(store: Store, questions, user, mock_enqueue, mock_enqueue_in):
+    repo.feed.latest(store)
+
+    question = services.create_question(
+        store, user=user, title="Title", content="Content", tags=[]
+    )
+    assert repo.feed.latest(store)[0].id == question.id
+
+    services.delete_entry(store, id=question.id, user_id=user.id)
+
+    assert question.id not in [q.id for q in repo.feed.latest(store)]
+
+
+def test_score_and_answers(store: Store, questions, user):
+    question = questions[-1]
+    repo.feed.latest(store)
+
+    repo.vote.cast(store, user_id=user.id, entry_id=question.id, value=1)
+    answer = repo.answer.create(
+        store, user=user, question_id=question.id, content="Content"
+    )
+
+    cached = repo.feed.latest(store)[0]
+    assert cached.score == 1
+    assert cached.answer_count == 1
+
+    services.delete_entry(store, id=answer.id, user_id=user.id)
+
+    assert repo.feed.latest(store)[0].answer_count == 0
+
+
+def test_stale_served_during_rebuild(store: Store, questions, max_num_queries):
+    repo.feed.latest(store)
+    store.redis.delete(repo.feed.FRESH_KEY)
+    store.redis.set(repo.feed.LOCK_KEY, 1)
+
+    with max_num_queries(0):
+        assert len(repo.feed.latest(store)) == 3
+
+
+def test_empty_waits_for_rebuild(store: Store, questions, mocker: MockerFixture):
+    mocker.patch.object(repo.feed, "WAIT_INTERVAL", 0)
+    store.redis.set(repo.feed.LOCK_KEY, 1)
+
+    assert len(repo.feed.latest(store)) == 3
+    assert not store.redis.exists(repo.feed.FRESH_KEY)
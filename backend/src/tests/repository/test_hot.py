@@ -0,0 +1,124 @@
+from datetime import datetime, timedelta
+
+import pytest
+from pytest_mock import MockerFixture
+
+import repository as repo
+from app.config import settings
+from repository.question import QuestionRepository
+from storage import Store
+from tests import factories
+
+pytestmark = [pytest.mark.allow_db, pytest.mark.allow_redis]
+
+
+def _ranking(store: Store):
+    ids, _ = repo.hot.ids(store, offset=0, limit=100)
+    return ids
+
+
+def _add_views(store: Store, id: int, visitors):
+    pipe = store.redis.pipeline()
+    key = QuestionRepository.REDIS_QUESTION_VIEW_KEY.format(id=id)
+    repo.hot.add_views(pipe, key, id, visitors)
+    [added] = pipe.execute()
+    return added
+
+
+def test_events(store: Store):
+    for id in (1, 2, 3):
+        repo.hot.add(store, id)
+
+    repo.hot.add_answer(store, 1)
+    repo.hot.set_score(store, 2, 3)
+    assert _ranking(store) == [2, 1, 3]
+
+    repo.hot.set_score(store, 2, 3)
+    repo.hot.set_score(store, 2, 1)
+    assert _ranking(store) == [1, 2, 3]
+
+    assert _add_views(store, 3, ["192.168.1.1", "192.168.1.2"]) == 2
+    assert _add_views(store, 3, ["192.168.1.1"]) == 0
+    assert repo.question.get_view_count(store, 3) == 2
+
+    scores = dict(store.redis.zrange(repo.hot.KEY, 0, -1, withscores=True))
+    assert scores[b"3"] == pytest.approx(1 + 2 * settings.HOT_VIEW_WEIGHT)
+
+
+def test_unknown_score_is_remembered(store: Store):
+    repo.hot.set_score(store, 1, 10)
+    assert _ranking(store) == []
+
+    repo.hot.set_score(store, 1, 11)
+    assert _ranking(store) == [1]
+
+
+def test_newer_events_weigh_more(store: Store, mocker: MockerFixture):
+    now = 1_700_000_000
+    mocker.patch("repository.hot.time.time", return_value=now)
+    repo.hot.add(store, 1)
+
+    mocker.patch(
+        "repository.hot.time.time", return_value=now + settings.HOT_HALF_LIFE
+    )
+    repo.hot.add(store, 2)
+
+    assert _ranking(store) == [2, 1]
+
+    repo.hot.renormalize(store)
+
+    scores = dict(store.redis.zrange(repo.hot.KEY, 0, -1, withscores=True))
+    assert scores[b"1"] == pytest.approx(0.5)
+    assert scores[b"2"] == pytest.approx(1)
+    assert float(store.redis.get(repo.hot.EPOCH_KEY)) == now + settings.HOT_HALF_LIFE
+
+
+def test_renormalize_trims(store: Store, mocker: MockerFixture):
+    mocker.patch.object(settings, "HOT_SIZE", 2)
+    for id in (1, 2, 3):
+        repo.hot.add(store, id)
+        repo.hot.set_score(store, id, 0)
+        repo.hot.set_score(store, id, id)
+
+    repo.hot.renormalize(store)
+
+    assert _ranking(store) == [3, 2]
+
+
+def test_remove(store: Store):
+    repo.hot.add(store, 1)
+    repo.hot.remove(store, 1)
+
+    assert _ranking(store) == []
+    assert not store.redis.hexists(repo.hot.SCORES_KEY, 1)
+
+
+def test_rebuild(store: Store):
+    now = datetime.utcnow()
+    old = factories.QuestionFactory(created_at=now - timedelta(days=3), score=5)
+    new = factories.QuestionFactory(created_at=now)
+    voted = factories.QuestionFactory(created_at=now - timedelta(hours=1), score=2)
+    factories.QuestionFactory(deleted_at=now)
+
+    assert repo.hot.rebuild(store) == 3
+    assert _ranking(store) == [voted.id, new.id, old.id]
+
+    repo.hot.set_score(store, old.id, 15)
+    assert _ranking(store) == [old.id, voted.id, new.id]
+
+
+def test_list_hot(store: Store, max_num_queries):
+    questions = factories.QuestionFactory.create_batch(3)
+    for question in reversed(questions):
+        repo.hot.add(store, question.id)
+    repo.hot.add_answer(store, questions[1].id)
+
+    with max_num_queries(1):
+        paginator = repo.question.list_sorted(store, sort="hot", per_page=2)
+
+    assert paginator.objects == [questions[1], questions[0]]
+    assert paginator.total == 3
+    assert paginator.has_next
+
+    paginator = repo.question.list_sorted(store, sort="hot", page=2, per_page=2)
+    assert paginator.objects == [questions[2]]
@@ -0,0 +1,103 @@
+import pytest
+from freezegun import freeze_time
+
+import repository as repo
+from storage import Store
+from tests import factories
+
+pytestmark = [pytest.mark.allow_db, pytest.mark.allow_redis]
+
+
+def _version(store: Store, id: int) -> int:
+    version, _ = repo.page_cache.get(store, id, "slug")
+    return version
+
+
+def test_get_set(store: Store):
+    version, page = repo.page_cache.get(store, 1, "slug")
+    assert page is None
+
+    repo.page_cache.set(store, 1, "slug", version, "<html>")
+
+    assert repo.page_cache.get(store, 1, "slug") == (version, b"<html>")
+    assert repo.page_cache.get(store, 1, "other") == (version, None)
+    assert repo.page_cache.stats(store) == {"hits": 1, "misses": 2}
+
+
+def test_invalidate(store: Store):
+    version = _version(store, 1)
+    repo.page_cache.set(store, 1, "slug", version, "<html>")
+
+    repo.page_cache.invalidate(store, 1)
+
+    assert repo.page_cache.get(store, 1, "slug") == (version + 1, None)
+
+
+def test_versions_not_repeated_after_loss(store: Store):
+    with freeze_time("2030-01-01 12:00:00") as frozen:
+        version = _version(store, 1)
+        lists_version, _ = repo.page_cache.list_validators(store)
+        repo.page_cache.invalidate(store, 1)
+        assert repo.page_cache.validators(store, 1)[0] == version + 1
+
+        # counters lost with Redis data are seeded again, not from zero
+        frozen.tick()
+        store.redis.flushdb()
+
+        assert repo.page_cache.validators(store, 1)[0] > version + 1
+        assert repo.page_cache.list_validators(store)[0] > lists_version + 1
+
+        store.redis.flushdb()
+        repo.page_cache.invalidate(store, 2)
+
+        assert _version(store, 2) > version + 1
+
+
+def test_invalidate_for_entry(store: Store, question):
+    answer = factories.AnswerFactory(question=question)
+    question_comment = factories.CommentFactory(entry_id=question.id)
+    answer_comment = factories.CommentFactory(entry_id=answer.id)
+
+    version = _version(store, question.id)
+
+    for i, entry in enumerate([question, answer, question_comment, answer_comment]):
+        repo.page_cache.invalidate_for_entry(store, entry.id)
+        assert _version(store, question.id) == version + i + 1
+
+
+def test_invalidate_for_user(store: Store, user, question):
+    answered = factories.QuestionFactory()
+    factories.AnswerFactory(question=answered, user=user)
+    commented = factories.QuestionFactory()
+    factories.CommentFactory(entry_id=commented.id, user=user)
+    comment_answered = factories.AnswerFactory()
+    factories.CommentFactory(entry_id=comment_answered.id, user=user)
+    other = factories.QuestionFactory()
+    ids = (question.id, answered.id, commented.id, comment_answered.question_id)
+    versions = {id: _version(store, id) for id in (*ids, other.id)}
+    lists_version, _ = repo.page_cache.list_validators(store)
+
+    repo.page_cache.invalidate_for_user(store, user.id)
+
+    for id in ids:
+        assert _version(store, id) == versions[id] + 1
+    assert _version(store, other.id) == versions[other.id]
+    assert repo.page_cache.list_validators(store)[0] == lists_version + 1
+
+
+def test_vote_invalidates(store: Store, user, question):
+    answer = factories.AnswerFactory(question=question)
+    version = _version(store, question.id)
+
+    repo.vote.cast(store, user_id=user.id, entry_id=answer.id, value=1)
+
+    assert _version(store, question.id) == version + 1
+
+
+def test_delete_invalidates(store: Store, question):
+    comment = factories.CommentFactory(entry_id=question.id)
+    version = _version(store, question.id)
+
+    repo.entry.mark_as_deleted(store, id=comment.id, user_id=comment.user_id)
+
+    assert _version(store, question.id) == version + 1
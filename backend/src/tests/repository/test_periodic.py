@@ -0,0 +1,38 @@
+import pytest
+
+import repository as repo
+from storage.base import Store
+
+pytestmark = pytest.mark.allow_redis
+
+
+def test_schedule(store: Store):
+    token = repo.periodic.schedule(store, "job", 60)
+
+    assert token
+    assert repo.periodic.schedule(store, "job", 60) is None
+    assert repo.periodic.schedule(store, "other", 60)
+
+
+def test_claim(store: Store):
+    token = repo.periodic.schedule(store, "job", 60)
+
+    assert repo.periodic.claim(store, "job", token)
+    assert repo.periodic.schedule(store, "job", 60)
+
+
+def test_claim_replaced(store: Store):
+    stale = repo.periodic.schedule(store, "job", 60)
+    store.redis.delete(repo.periodic.KEY.format(name="job"))
+    current = repo.periodic.schedule(store, "job", 60)
+
+    assert not repo.periodic.claim(store, "job", stale)
+    assert not repo.periodic.claim(store, "job", None)
+    assert repo.periodic.claim(store, "job", current)
+
+
+def test_claim_expired(store: Store):
+    stale = repo.periodic.schedule(store, "job", 60)
+    store.redis.delete(repo.periodic.KEY.format(name="job"))
+
+    assert repo.periodic.claim(store, "job", stale)
@@ -1,11 +1,16 @@
+from datetime import datetime
 from unittest.mock import MagicMock
 
 import pytest
 from faker import Faker
 from slugify import slugify
+from sqlalchemy import text
 
 import repository as repo
-from models import Comment, Vote
+from app.config import settings
+from common.pagination import encode_cursor
+from models import Question, Vote
+from repository import exceptions, search
 from storage import Store
 from tests import factories
 
@@ -66,76 +71,82 @@ def other_data():
             factories.VoteFactory(entry_id=comment.id)
 
 
-@pytest.mark.allow_redis
-def test_get_with_related_single_query(
+@pytest.mark.parametrize(("with_user", "num_queries"), [(True, 4), (False, 3)])
+def test_get_details(
     store: Store,
     question_with_related,
     other_data,
     user,
+    with_user,
+    num_queries,
     max_num_queries,
 ):
-    with max_num_queries(1):
-        question = repo.question.get_with_related(
-            store, question_with_related.id, user_id=user.id
-        )
+    now = datetime.utcnow()
+    deleted = factories.AnswerFactory(question=question_with_related, deleted_at=now)
+    factories.CommentFactory(entry_id=question_with_related.id, deleted_at=now)
 
-        assert question == question_with_related
+    id = question_with_related.id
+    user_id = user.id if with_user else 0
+    store.db.expire_all()
+
+    with max_num_queries(num_queries):
+        question, answers = repo.question.get_details(store, id, user_id=user_id)
 
-        assert question.user.id
-        assert question.user_vote.id
+        assert question == question_with_related
         assert question.view_count == 0
+        assert question.tags == []
 
-        for comment in question.comments:
-            comment.id
-            assert comment.user_vote.id
+        assert len(answers) == 2
+        assert deleted not in answers
 
+        parents = [question, *answers]
+        comments = [c for entry in parents for c in entry.comments]
+        assert len(comments) == 6
 
-def test_get_with_related_view_count(store: Store, question, user):
-    question = repo.question.get_with_related(store, question.id, user_id=user.id)
-    assert question.view_count == 0
+        for entry in parents + comments:
+            assert entry.user.name
+            if with_user:
+                assert entry.user_vote.value
+            else:
+                assert entry.user_vote is None
 
+    for entry in parents:
+        for comment in entry.comments:
+            assert comment.entry_id == entry.id
+            assert comment.deleted_at is None
+
+    if with_user:
+        for entry in parents + comments:
+            vote = store.db.query(Vote.user_id, Vote.entry_id).filter(
+                Vote.id == entry.user_vote.id
+            )
+            assert vote.one() == (user.id, entry.id)
+
+
+def test_get_details_view_count(store: Store, question):
     repo.question.register_view(store, question.id, "192.168.1.1")
-    question = repo.question.get_with_related(store, question.id, user_id=user.id)
-    assert question.view_count == 1
 
+    question, _ = repo.question.get_details(store, question.id)
+    assert question.view_count == 1
 
-def test_get_with_related_correct_data(
-    store: Store,
-    question_with_related,
-    other_data,
-    user,
-):
-    question = repo.question.get_with_related(
-        store, question_with_related.id, user_id=user.id
-    )
 
-    assert (
-        store.db.query(Vote.user_id)
-        .filter(Vote.id == question.user_vote.id, Vote.entry_id == question.id)
-        .scalar()
-        == user.id
-    )
+def test_get_details_answers_sorting(store: Store, question):
+    factories.AnswerFactory(question=question, content="first", score=5)
+    factories.AnswerFactory(question=question, content="second", score=5)
+    factories.AnswerFactory(question=question, content="third", score=0)
+    factories.AnswerFactory(question=question, content="fourth", score=7)
 
-    for comment in question.comments:
-        assert (
-            store.db.query(Comment.entry_id).filter(Comment.id == comment.id).scalar()
-            == question.id
-        )
-        assert (
-            store.db.query(Vote.user_id)
-            .filter(Vote.id == comment.user_vote.id, Vote.entry_id == comment.id)
-            .scalar()
-            == user.id
-        )
+    _, answers = repo.question.get_details(store, question.id)
 
+    assert [a.content for a in answers] == ["fourth", "second", "first", "third"]
 
-def test_get_with_related_no_user(store: Store, question_with_related, other_data):
-    question = repo.question.get_with_related(store, question_with_related.id)
 
-    assert not question.user_vote
+def test_get_details_deleted(store: Store, question):
+    question.deleted_at = datetime.utcnow()
+    store.db.commit()
 
-    for comment in question.comments:
-        assert not comment.user_vote
+    with pytest.raises(exceptions.NotFoundError):
+        repo.question.get_details(store, question.id)
 
 
 def test_create(store: Store, user, tag, other_tag):
@@ -193,12 +204,49 @@ def test_all_view_counts(store: Store, questions):
             repo.question.register_view(store, question.id, f"192.168.1.{j}")
 
     result = repo.question.all(store)
-    for question in result:
-        assert question.view_count == repo.question.get_view_count(store, question.id)
+    assert [q.view_count for q in result] == [0, 0, 0, 0]
 
+    assert repo.question.snapshot_view_counts(store, batch_size=3) == 4
+    assert repo.question.snapshot_view_counts(store, batch_size=3) == 0
+
+    store.db.expire_all()
+    result = repo.question.all(store)
     assert [q.view_count for q in result] == list(reversed(view_counts))
 
 
+def test_snapshot_view_counts_failed(store: Store, question, mocker):
+    repo.question.register_view(store, question.id, "192.168.1.1")
+    mocker.patch.object(repo.question, "save_view_counts", side_effect=RuntimeError)
+
+    with pytest.raises(RuntimeError):
+        repo.question.snapshot_view_counts(store, batch_size=10)
+
+    changed = store.redis.smembers(repo.question.REDIS_VIEWS_CHANGED_KEY)
+    assert changed == {str(question.id).encode()}
+
+
+def test_backfill_view_counts(store: Store, questions):
+    for question in questions[:3]:
+        repo.question.register_view(store, question.id, "192.168.1.1")
+    store.redis.delete(repo.question.REDIS_VIEWS_CHANGED_KEY)
+
+    assert list(repo.question.backfill_view_counts(store, batch_size=2)) == [2, 1]
+    assert list(repo.question.backfill_view_counts(store, batch_size=2)) == [0, 0]
+
+    for question in questions:
+        store.refresh(question)
+    assert [q.view_count for q in questions] == [1, 1, 1, 0]
+
+
+def test_details_view_count_is_live(store: Store, question):
+    repo.question.register_view(store, question.id, "192.168.1.1")
+
+    question, _ = repo.question.get_details(store, question.id)
+
+    assert question.view_count == 1
+    assert question not in store.db.dirty
+
+
 @pytest.mark.parametrize(
     ("page", "per_page", "exp_n_pages", "exp_slice"),
     [
@@ -222,6 +270,80 @@ def test_list(
     assert len(paginator) == exp_n_pages
 
 
+def test_list_next_cursor(store: Store, questions):
+    paginator = repo.question.list(store, page=1, per_page=3)
+    assert paginator.next_cursor == encode_cursor([questions[1].id])
+
+    paginator = repo.question.list(store, page=2, per_page=3)
+    assert paginator.next_cursor is None
+
+
+@pytest.fixture
+def many_questions():
+    return factories.QuestionFactory.create_batch(7)[::-1]
+
+
+def test_list_by_cursor(store: Store, many_questions, max_num_queries):
+    with max_num_queries(1):
+        first = repo.question.list_by_cursor(store, per_page=3)
+
+    assert first.objects == many_questions[:3]
+    assert not first.has_previous
+
+    with max_num_queries(1):
+        second = repo.question.list(store, per_page=3, after=first.next_cursor)
+
+    assert second.objects == many_questions[3:6]
+    assert second.has_previous
+
+    third = repo.question.list(store, per_page=3, after=second.next_cursor)
+    assert third.objects == many_questions[6:]
+    assert not third.has_next
+
+    back = repo.question.list(store, per_page=3, before=third.previous_cursor)
+    assert back.objects == many_questions[3:6]
+    assert back.has_next and back.has_previous
+
+    back = repo.question.list(store, per_page=3, before=back.previous_cursor)
+    assert back.objects == many_questions[:3]
+    assert back.has_next
+    assert not back.has_previous
+
+
+def test_list_by_cursor_score_keyset(store: Store, questions):
+    for question, score in zip(questions, [3, 1, 3, 2]):
+        question.score = score
+    store.db.commit()
+
+    keyset = [Question.score, Question.id]
+
+    first = repo.question.list_by_cursor(store, per_page=2, keyset=keyset)
+    second = repo.question.list_by_cursor(
+        store, per_page=2, keyset=keyset, after=first.next_cursor
+    )
+
+    assert first.objects == [questions[2], questions[0]]
+    assert second.objects == [questions[3], questions[1]]
+    assert not second.has_next
+
+
+@pytest.mark.parametrize(
+    "cursor",
+    [
+        "invalid",
+        encode_cursor([1, 2]),
+        encode_cursor(["abc"]),
+        encode_cursor([{}]),
+        encode_cursor([True]),
+        encode_cursor([1.5]),
+        encode_cursor([2**70]),
+    ],
+)
+def test_list_by_cursor_invalid(store: Store, cursor):
+    with pytest.raises(exceptions.NotFoundError):
+        repo.question.list(store, after=cursor)
+
+
 @pytest.fixture
 def question_list_params():
     return [
@@ -334,6 +456,41 @@ def test_search(store: Store, questions_for_search, query, expected):
     assert paginator.total == len(expected)
 
 
+@pytest.mark.parametrize(
+    ("query", "expected"),
+    [
+        ("back -upper", {"Spine", "Sciatica"}),
+        ('"lower back"', {"Spine"}),
+        ("spine or sciatica", {"Upper back", "Spine", "Sciatica"}),
+    ],
+)
+def test_search_websearch_syntax(store: Store, questions_for_search, query, expected):
+    paginator = repo.question.search(store, query)
+
+    assert {r.title for r in paginator.objects} == expected
+
+
+def test_search_title_ranked_first(store: Store, questions_for_search):
+    paginator = repo.question.search(store, "spine")
+
+    assert [r.title for r in paginator.objects] == ["Spine", "Upper back"]
+
+
+def test_search_html_stripped(store: Store):
+    factories.QuestionFactory(title="Title", content="<strong>Posture</strong> tips")
+
+    assert repo.question.search(store, "posture").total == 1
+    assert repo.question.search(store, "strong").total == 0
+
+
+def test_search_after_update(store: Store, question):
+    repo.question.update(
+        store, question, new_title="Neck stiffness", new_content="Content", tags=[]
+    )
+
+    assert repo.question.search(store, "stiffness").objects == [question]
+
+
 def test_update_search_indexes(
     store: Store, with_app_context, meili_client_mock: MagicMock
 ):
@@ -353,3 +510,207 @@ def test_update_search_indexes(
     repo.question.update_search_indexes(store, *questions)
 
     meili_client_mock.index("questions").add_documents.assert_called_once_with(docs)
+
+
+def test_sync_search_index(
+    store: Store, with_app_context, meili_client_mock: MagicMock
+):
+    alive = factories.QuestionFactory()
+    deleted = factories.QuestionFactory(deleted_at=datetime.utcnow())
+
+    repo.question.sync_search_index(store, [alive.id, deleted.id, 999])
+
+    index = meili_client_mock.index("questions")
+    index.add_documents.assert_called_once_with(
+        [repo.question._build_meili_document(alive)]
+    )
+    index.delete_documents.assert_called_once_with([str(deleted.id), "999"])
+
+
+def test_flush_search_index(
+    store: Store, with_app_context, meili_client_mock: MagicMock
+):
+    questions = factories.QuestionFactory.create_batch(5)
+
+    assert repo.question.mark_for_indexing(store, *[q.id for q in questions]) == 5
+    assert repo.question.mark_for_indexing(store, questions[0].id) == 5
+
+    assert repo.question.flush_search_index(store, batch_size=2) == 5
+    assert repo.question.flush_search_index(store, batch_size=2) == 0
+
+    index = meili_client_mock.index("questions")
+    assert index.add_documents.call_count == 3
+
+
+def test_flush_search_index_failed(
+    store: Store, with_app_context, meili_client_mock: MagicMock
+):
+    question = factories.QuestionFactory()
+    repo.question.mark_for_indexing(store, question.id)
+
+    meili_client_mock.index("questions").add_documents.side_effect = ValueError
+
+    with pytest.raises(ValueError):
+        repo.question.flush_search_index(store, batch_size=10)
+
+    assert repo.question.mark_for_indexing(store, question.id) == 1
+
+
+def test_schedule_search_index_flush(store: Store):
+    assert repo.question.schedule_search_index_flush(store, delay=5) is True
+    assert repo.question.schedule_search_index_flush(store, delay=5) is False
+
+
+@pytest.mark.freeze_time("2030-01-01")
+def test_reindex_search(store: Store, with_app_context, meili_client_mock: MagicMock):
+    questions = factories.QuestionFactory.create_batch(5)
+    factories.QuestionFactory(deleted_at=datetime.utcnow())
+    index = meili_client_mock.index.return_value
+    index.update_settings.return_value = {"updateId": 0}
+    index.add_documents.side_effect = [{"updateId": i} for i in range(1, 4)]
+    index.get_all_update_status.return_value = [
+        {"updateId": i, "status": "processed"} for i in range(4)
+    ]
+
+    chunks = list(repo.question.reindex_search(store, chunk_size=2))
+
+    assert chunks == [2, 2, 1]
+    index.wait_for_pending_update.assert_called_once_with(
+        3, timeout_in_ms=settings.SEARCH_REINDEX_TIMEOUT * 1000
+    )
+
+    index_name = "questions_1893456000"
+    meili_client_mock.create_index.assert_called_once_with(
+        index_name, {"primaryKey": "id"}
+    )
+    meili_client_mock.index.assert_called_with(index_name)
+
+    index = meili_client_mock.index(index_name)
+    sent = [doc for call in index.add_documents.call_args_list for doc in call.args[0]]
+    assert sent == [repo.question._build_meili_document(q) for q in questions]
+
+    assert store.redis.get(search.INDEX_NAME_KEY) == index_name.encode()
+    assert not store.redis.exists(repo.question.REDIS_REINDEX_KEY)
+    meili_client_mock.delete_index_if_exists.assert_called_once_with("questions")
+
+
+def test_reindex_search_resume(
+    store: Store, with_app_context, meili_client_mock: MagicMock
+):
+    questions = factories.QuestionFactory.create_batch(3)
+    store.redis.hset(
+        repo.question.REDIS_REINDEX_KEY,
+        mapping={"index": "questions_1", "last_id": questions[0].id},
+    )
+
+    meili_client_mock.index.return_value.add_documents.return_value = {"updateId": 5}
+
+    assert repo.question.reindex_progress(store) == 1
+    assert list(repo.question.reindex_search(store, chunk_size=10)) == [2]
+
+    meili_client_mock.create_index.assert_not_called()
+    meili_client_mock.index("questions_1").add_documents.assert_called_once_with(
+        [repo.question._build_meili_document(q) for q in questions[1:]]
+    )
+    assert store.redis.get(search.INDEX_NAME_KEY) == b"questions_1"
+
+
+def test_reindex_search_failed(
+    store: Store, with_app_context, meili_client_mock: MagicMock, question
+):
+    store.redis.set(search.INDEX_NAME_KEY, "questions_0")
+    index = meili_client_mock.index.return_value
+    index.update_settings.return_value = {"updateId": 0}
+    index.add_documents.return_value = {"updateId": 1}
+    index.get_all_update_status.return_value = [
+        {"updateId": 0, "status": "processed"},
+        {"updateId": 1, "status": "failed", "error": "invalid document"},
+    ]
+
+    with pytest.raises(exceptions.SearchIndexError):
+        list(repo.question.reindex_search(store, chunk_size=10))
+
+    assert store.redis.get(search.INDEX_NAME_KEY) == b"questions_0"
+    assert store.redis.exists(repo.question.REDIS_REINDEX_KEY)
+    meili_client_mock.delete_index_if_exists.assert_not_called()
+
+
+def test_update_search_indexes_during_reindex(
+    store: Store, with_app_context, meili_client_mock: MagicMock, question
+):
+    store.redis.hset(
+        repo.question.REDIS_REINDEX_KEY, mapping={"index": "questions_1", "last_id": 0}
+    )
+
+    repo.question.update_search_indexes(store, question)
+
+    called = [call.args[0] for call in meili_client_mock.index.call_args_list]
+    assert called == ["questions", "questions_1"]
+
+
+def test_answer_count(store: Store, question, user):
+    answers = factories.AnswerFactory.create_batch(3, question=question)
+    store.refresh(question)
+    assert question.answer_count == 3
+
+    repo.entry.mark_as_deleted(store, id=answers[0].id, user_id=answers[0].user_id)
+    store.refresh(question)
+    assert question.answer_count == 2
+
+    store.db.delete(answers[1])
+    store.db.commit()
+    store.refresh(question)
+    assert question.answer_count == 1
+
+
+def test_reconcile_answer_counts(store: Store, question):
+    factories.AnswerFactory.create_batch(2, question=question)
+    other = factories.QuestionFactory()
+
+    store.db.execute(text("UPDATE questions SET answer_count = 5"))
+    store.db.commit()
+
+    assert repo.question.reconcile_answer_counts(store) == 2
+    assert repo.question.reconcile_answer_counts(store) == 0
+
+    store.refresh(question)
+    store.refresh(other)
+    assert question.answer_count == 2
+    assert other.answer_count == 0
+
+
+def test_list_sorted(store: Store, question_list):
+    factories.QuestionFactory(title="unanswered")
+    store.db.expire_all()
+
+    paginator = repo.question.list_sorted(store, sort="unanswered")
+    assert [q.title for q in paginator.objects] == ["unanswered"]
+    assert paginator.total == 1
+
+    paginator = repo.question.list_sorted(store, sort="answers", per_page=2)
+    assert [q.title for q in paginator.objects] == ["fourth", "third"]
+
+    paginator = repo.question.list_sorted(
+        store, sort="answers", per_page=2, after=paginator.next_cursor
+    )
+    assert [q.title for q in paginator.objects] == ["first", "second"]
+
+    with pytest.raises(ValueError):
+        repo.question.list_sorted(store, sort="unknown")
+
+
+def test_list_sorted_views(store: Store, questions, max_num_queries):
+    for i, question in enumerate(questions):
+        for j in range(i % 3):
+            repo.question.register_view(store, question.id, f"192.168.1.{j}")
+    repo.question.snapshot_view_counts(store, batch_size=10)
+    store.db.expire_all()
+
+    with max_num_queries(2):
+        paginator = repo.question.list_sorted(store, sort="views", per_page=2)
+    assert paginator.objects == [questions[2], questions[1]]
+
+    paginator = repo.question.list_sorted(
+        store, sort="views", per_page=2, after=paginator.next_cursor
+    )
+    assert paginator.objects == [questions[3], questions[0]]
@@ -0,0 +1,155 @@
+from datetime import datetime
+from unittest.mock import MagicMock
+
+import pytest
+from meilisearch.errors import MeiliSearchCommunicationError
+
+import repository as repo
+from repository import exceptions, search
+from repository.search import (
+    FallbackSearchBackend,
+    MeiliSearchBackend,
+    PostgresSearchBackend,
+    SearchBackend,
+    SearchResult,
+    create_search_backend,
+)
+from storage import Store
+from tests import factories
+from tests.search_stub import InMemorySearchBackend
+
+
+class StaticBackend(SearchBackend):
+    def __init__(self, ids):
+        self.ids = ids
+        self.calls = 0
+
+    def search(self, store, query, *, offset=0, limit=20):
+        self.calls += 1
+        return SearchResult(ids=self.ids, total=len(self.ids))
+
+
+class FailingBackend(SearchBackend):
+    def __init__(self):
+        self.calls = 0
+
+    def search(self, store, query, *, offset=0, limit=20):
+        self.calls += 1
+        raise exceptions.SearchUnavailableError()
+
+
+def test_backend_must_implement_search():
+    class IncompleteBackend(SearchBackend):
+        pass
+
+    with pytest.raises(TypeError):
+        IncompleteBackend()
+
+
+@pytest.mark.allow_db
+@pytest.mark.allow_redis
+def test_question_search_with_memory_backend(store: Store, mocker):
+    back, spine, _ = [
+        factories.QuestionFactory(title=title, content=content)
+        for title, content in [
+            ("Back pain", "Spine"),
+            ("Spine", "Lower back"),
+            ("Knee", "Running"),
+        ]
+    ]
+    backend = InMemorySearchBackend()
+    backend.add_documents(
+        [
+            {"id": str(q.id), "title": q.title, "content": q.content}
+            for q in (back, spine)
+        ]
+    )
+    mocker.patch.object(repo.question, "search_backend", backend)
+
+    paginator = repo.question.search(store, "spine")
+
+    assert paginator.objects == [spine, back]
+    assert paginator.total == 2
+
+    backend.delete_documents([spine.id])
+
+    assert repo.question.search(store, "spine").objects == [back]
+
+
+@pytest.mark.allow_redis
+def test_meili_backend(store: Store, meili_client_mock: MagicMock):
+    meili_client_mock.index.return_value.search.return_value = {
+        "hits": [{"id": "5"}, {"id": "3"}],
+        "nbHits": 12,
+    }
+
+    result = MeiliSearchBackend().search(store, "back", offset=10, limit=2)
+
+    assert result.ids == [5, 3]
+    assert result.total == 12
+
+    meili_client_mock.index.assert_called_with("questions")
+    meili_client_mock.index.return_value.search.assert_called_once_with(
+        "back", {"offset": 10, "limit": 2, "attributesToRetrieve": ["id"]}
+    )
+
+    store.redis.set(search.INDEX_NAME_KEY, "questions_2")
+    MeiliSearchBackend().search(store, "back")
+
+    meili_client_mock.index.assert_called_with("questions_2")
+
+
+@pytest.mark.allow_redis
+def test_meili_backend_unavailable(store: Store, meili_client_mock: MagicMock):
+    meili_client_mock.index.return_value.search.side_effect = (
+        MeiliSearchCommunicationError("Connection refused")
+    )
+
+    with pytest.raises(exceptions.SearchUnavailableError):
+        MeiliSearchBackend().search(store, "back")
+
+
+def test_fallback(store: Store):
+    primary = FailingBackend()
+    fallback = StaticBackend([1])
+    backend = FallbackSearchBackend(primary, fallback, cooldown=60)
+
+    assert backend.search(store, "back").ids == [1]
+    assert backend.search(store, "back").ids == [1]
+
+    assert primary.calls == 1
+    assert fallback.calls == 2
+
+
+def test_fallback_cooldown_expired(store: Store):
+    primary = FailingBackend()
+    backend = FallbackSearchBackend(primary, StaticBackend([1]), cooldown=0)
+
+    backend.search(store, "back")
+    backend.search(store, "back")
+
+    assert primary.calls == 2
+
+
+def test_create_search_backend():
+    assert isinstance(create_search_backend("postgres"), PostgresSearchBackend)
+    assert isinstance(create_search_backend("meili"), FallbackSearchBackend)
+
+    with pytest.raises(ValueError):
+        create_search_backend("unknown")
+
+
+@pytest.mark.allow_db
+@pytest.mark.allow_redis
+def test_question_search_keeps_backend_order(store: Store, mocker, max_num_queries):
+    questions = factories.QuestionFactory.create_batch(3)
+    deleted = factories.QuestionFactory(deleted_at=datetime.utcnow())
+
+    ids = [questions[1].id, deleted.id, questions[2].id, questions[0].id]
+    mocker.patch.object(repo.question, "search_backend", StaticBackend(ids))
+
+    with max_num_queries(1):
+        paginator = repo.question.search(store, "back")
+
+    assert paginator.objects == [questions[1], questions[2], questions[0]]
+    assert paginator.total == 4
@@ -1,11 +1,13 @@
 import pytest
 
 import repository as repo
+from app.config import settings
 from repository import exceptions
+from repository.tag import tags_cache
 from storage import Store
 from tests import factories
 
-pytestmark = [pytest.mark.allow_db]
+pytestmark = [pytest.mark.allow_db, pytest.mark.allow_redis]
 
 
 @pytest.fixture
@@ -22,9 +24,20 @@ def categories():
     return categories
 
 
-def test_get_by_slug(store: Store, tag, other_tag):
-    assert repo.tag.get_by_slug(store, tag.slug) == tag
-    assert repo.tag.get_by_slug(store, other_tag.slug) == other_tag
+def test_get_by_slug(store: Store, tag, other_tag, max_num_queries):
+    repo.tag.get_by_slug(store, tag.slug)
+
+    with max_num_queries(0):
+        assert repo.tag.get_by_slug(store, tag.slug).id == tag.id
+        assert repo.tag.get_by_slug(store, other_tag.slug).id == other_tag.id
+
+
+def test_get_by_slug_created_after_snapshot(store: Store, tag):
+    repo.tag.get_by_slug(store, tag.slug)
+
+    new_tag = factories.TagFactory()
+
+    assert repo.tag.get_by_slug(store, new_tag.slug) == new_tag
 
 
 def test_get_by_slug_non_existing(store: Store):
@@ -39,6 +52,33 @@ def test_get_categories_list(store: Store, categories, max_num_queries):
         for category in result:
             assert len(category.tags) == 2
             for tag in category.tags:
-                tag.id
+                assert tag.category is category
+
+    assert [c.id for c in result] == [c.id for c in categories]
+
+    with max_num_queries(0):
+        assert repo.tag_category.all(store) is result
+
+
+def test_snapshot_reloaded_after_invalidate(store: Store, categories, mocker):
+    result = repo.tag_category.all(store)
+
+    mocker.patch.object(settings, "TAGS_SNAPSHOT_MAX_AGE", 0)
+    assert repo.tag_category.all(store) is result
+
+    factories.TagCategoryFactory()
+    repo.tag.invalidate(store)
+
+    assert len(repo.tag_category.all(store)) == 4
+
+
+def test_snapshot_reloaded_by_other_process(store: Store, categories, mocker):
+    repo.tag_category.all(store)
+
+    factories.TagCategoryFactory()
+    store.redis.incr(tags_cache.VERSION_KEY)
+
+    assert len(repo.tag_category.all(store)) == 3
 
-    assert set(result) == set(categories)
+    mocker.patch.object(settings, "TAGS_SNAPSHOT_MAX_AGE", 0)
+    assert len(repo.tag_category.all(store)) == 4
@@ -1,6 +1,7 @@
 import random
 
 import pytest
+from sqlalchemy import text
 from sqlalchemy.orm.session import Session
 
 import repository as repo
@@ -8,11 +9,12 @@ from auth.security import check_password
 from models.answer import Answer
 from models.question import Question
 from repository import exceptions
+from repository.user import user_session_cache
 from storage.base import Store
 from tests import factories
 from tests.factories import UserFactory
 
-pytestmark = pytest.mark.allow_db
+pytestmark = [pytest.mark.allow_db, pytest.mark.allow_redis]
 
 
 @pytest.fixture
@@ -29,17 +31,86 @@ def test_get_non_existing(store: Store):
         repo.user.get(store, 999)
 
 
-def test_first_with_passsword(store: Store, db: Session, user, max_num_queries):
+def test_get_for_session(store: Store, db: Session, user, max_num_queries):
     user_id = user.id
     user_password = user.password
-    db.expire(user)
 
     with max_num_queries(1):
-        assert repo.user.first_with_password(store, user_id).password == user_password
+        assert repo.user.get_for_session(store, user_id) == user
 
+    db.expunge_all()
 
-def test_first_with_passsword_non_existing(store: Store, db: Session):
-    assert repo.user.first_with_password(store, 999) is None
+    with max_num_queries(0):
+        cached = repo.user.get_for_session(store, user_id)
+
+        assert cached.id == user_id
+        assert cached.name == user.name
+        assert cached.email_verified == user.email_verified
+
+    with max_num_queries(1):
+        assert cached.password == user_password
+
+    assert not db.dirty
+
+
+def test_get_for_session_non_existing(store: Store):
+    assert repo.user.get_for_session(store, 999) is None
+    assert not store.redis.exists(user_session_cache.KEY.format(id=999))
+
+
+def test_get_for_session_as_author(store: Store, db: Session, user):
+    repo.user.get_for_session(store, user.id)
+    db.expunge_all()
+
+    cached = repo.user.get_for_session(store, user.id)
+    question = repo.question.create(
+        store, user=cached, title="Title", content="Content", tags=[]
+    )
+
+    assert question.user_id == user.id
+    assert repo.user.count(store) == 1
+
+
+@pytest.mark.parametrize(
+    "change",
+    [
+        lambda store, user: repo.user.update_info(store, user, name="New name"),
+        lambda store, user: repo.user.change_password(store, user, "new_password"),
+        lambda store, user: repo.user.reset_password(store, user),
+    ],
+)
+def test_get_for_session_invalidated(store: Store, db: Session, user, change):
+    repo.user.get_for_session(store, user.id)
+
+    change(store, user)
+    name, password = user.name, user.password
+    db.expunge_all()
+
+    cached = repo.user.get_for_session(store, user.id)
+    assert cached.name == name
+    assert cached.password == password
+
+
+def test_get_for_session_fill_racing_with_change(
+    store: Store, db: Session, user, mocker
+):
+    fill = user_session_cache.set
+
+    def change_then_fill(*args):
+        # another process commits a change of the user after the miss
+        user_session_cache.invalidate(store, user.id)
+        fill(*args)
+
+    mocker.patch.object(user_session_cache, "set", side_effect=change_then_fill)
+    repo.user.get_for_session(store, user.id)
+
+    assert not store.redis.exists(user_session_cache.KEY.format(id=user.id))
+
+    mocker.stopall()
+    db.expunge_all()
+    repo.user.get_for_session(store, user.id)
+
+    assert store.redis.exists(user_session_cache.KEY.format(id=user.id))
 
 
 def test_get_by_email(store: Store, user, max_num_queries):
@@ -102,6 +173,7 @@ def test_list(store: Store, users, page, per_page, n_pages, exp_slice, max_num_q
 def test_list_counts(store: Store, users):
     for user in users:
         _create_random_questions_answers(user)
+    store.db.expire_all()
 
     paginator = repo.user.list(store)
 
@@ -166,6 +238,16 @@ def test_update_info(store: Store, user):
     assert user.name == from_db.name == "New name"
 
 
+def test_update_info_invalidates_pages(store: Store, user, question):
+    version, _ = repo.page_cache.validators(store, question.id)
+    lists_version, _ = repo.page_cache.list_validators(store)
+
+    repo.user.update_info(store, user, name="New name")
+
+    assert repo.page_cache.validators(store, question.id)[0] == version + 1
+    assert repo.page_cache.list_validators(store)[0] == lists_version + 1
+
+
 @pytest.mark.parametrize("user__email_verified", [False])
 def test_mark_email_verified(store: Store, user):
     assert not user.email_verified
@@ -174,3 +256,52 @@ def test_mark_email_verified(store: Store, user):
 
     from_db = repo.user.get(store, user.id)
     assert user.email_verified is from_db.email_verified is True
+
+
+def test_counts_soft_delete(store: Store, user):
+    question = factories.QuestionFactory(user=user)
+    answer = factories.AnswerFactory(user=user, question=question)
+
+    repo.entry.mark_as_deleted(store, id=question.id, user_id=user.id)
+    store.refresh(user)
+    assert (user.question_count, user.answer_count) == (0, 1)
+
+    repo.entry.mark_as_deleted(store, id=answer.id, user_id=user.id)
+    store.refresh(user)
+    assert (user.question_count, user.answer_count) == (0, 0)
+
+
+def test_list_sorted(store: Store, users):
+    questions = factories.QuestionFactory.create_batch(2, user=users[1])
+    factories.QuestionFactory(user=users[2])
+    factories.AnswerFactory(user=users[3], question=questions[0])
+    store.db.expire_all()
+
+    paginator = repo.user.list_sorted(store, sort="questions", per_page=2)
+    assert paginator.objects == [users[1], users[2]]
+
+    paginator = repo.user.list_sorted(
+        store, sort="questions", per_page=2, after=paginator.next_cursor
+    )
+    assert paginator.objects == [users[3], users[0]]
+
+    paginator = repo.user.list_sorted(store, sort="answers", per_page=1)
+    assert paginator.objects == [users[3]]
+
+    with pytest.raises(ValueError):
+        repo.user.list_sorted(store, sort="unknown")
+
+
+def test_reconcile_entry_counts(store: Store, user, other_user):
+    factories.QuestionFactory.create_batch(2, user=user)
+
+    store.db.execute(text("UPDATE users SET question_count = 5, answer_count = 1"))
+    store.db.commit()
+
+    assert repo.user.reconcile_entry_counts(store) == 2
+    assert repo.user.reconcile_entry_counts(store) == 0
+
+    store.refresh(user)
+    store.refresh(other_user)
+    assert (user.question_count, user.answer_count) == (2, 0)
+    assert (other_user.question_count, other_user.answer_count) == (0, 0)
@@ -0,0 +1,98 @@
+import time
+
+import pytest
+from pytest_mock import MockerFixture
+from redis.exceptions import ConnectionError
+
+import repository as repo
+from app.config import settings
+from repository.view_recorder import ViewRecorder
+from storage import Store
+
+pytestmark = [pytest.mark.allow_redis]
+
+
+def test_flush(store: Store):
+    recorder = ViewRecorder()
+
+    recorder.record(1, "192.168.1.1")
+    recorder.record(1, "192.168.1.1")
+    recorder.record(1, "192.168.1.2")
+    recorder.record(2, "192.168.1.1")
+
+    assert recorder.depth == 3
+    assert repo.question.get_view_count(store, 1) == 0
+
+    assert recorder.flush() == 3
+
+    assert recorder.depth == 0
+    assert repo.question.get_view_count(store, 1) == 2
+    assert repo.question.get_view_count(store, 2) == 1
+
+    changed = store.redis.smembers(repo.question.REDIS_VIEWS_CHANGED_KEY)
+    assert changed == {b"1", b"2"}
+
+    [stats] = recorder.collect_stats()
+    assert stats["flushed"] == "3"
+
+
+def test_flush_failed(store: Store, mocker: MockerFixture):
+    recorder = ViewRecorder()
+    recorder.record(1, "192.168.1.1")
+
+    mocker.patch(
+        "redis.client.Pipeline.execute", side_effect=ConnectionError("Redis is down")
+    )
+    assert recorder.flush() == 0
+
+    assert recorder.depth == 1
+    assert recorder.errors == 1
+
+    mocker.stopall()
+    recorder.flush()
+
+    assert repo.question.get_view_count(store, 1) == 1
+
+
+def test_max_size(mocker: MockerFixture):
+    mocker.patch.object(settings, "VIEW_RECORDER_MAX_SIZE", 2)
+    recorder = ViewRecorder()
+
+    for i in range(3):
+        recorder.record(1, f"192.168.1.{i}")
+
+    assert recorder.depth == 2
+    assert recorder.dropped == 1
+
+
+def test_max_size_new_question(store: Store, mocker: MockerFixture):
+    mocker.patch.object(settings, "VIEW_RECORDER_MAX_SIZE", 1)
+    recorder = ViewRecorder()
+
+    recorder.record(1, "192.168.1.1")
+    recorder.record(2, "192.168.1.1")
+
+    assert recorder.dropped == 1
+    assert recorder.flush() == 1
+    assert store.redis.smembers(repo.question.REDIS_VIEWS_CHANGED_KEY) == {b"1"}
+
+
+def test_background_flush(store: Store, mocker: MockerFixture):
+    mocker.patch.object(settings, "VIEW_RECORDER_BACKGROUND", True)
+    mocker.patch.object(settings, "VIEW_RECORDER_BATCH_SIZE", 2)
+    recorder = ViewRecorder()
+
+    recorder.record(1, "192.168.1.1")
+    recorder.record(1, "192.168.1.2")
+
+    for _ in range(100):
+        if recorder.flushed:
+            break
+        time.sleep(0.01)
+
+    assert repo.question.get_view_count(store, 1) == 2
+
+    recorder.record(1, "192.168.1.3")
+    recorder.stop()
+
+    assert repo.question.get_view_count(store, 1) == 3
@@ -1,68 +1,75 @@
 import pytest
+from sqlalchemy import text
 
 import repository as repo
-from repository import exceptions
+from models import Vote
 from storage import Store
 from tests import factories
 
-pytestmark = [pytest.mark.allow_db]
+pytestmark = [pytest.mark.allow_db, pytest.mark.allow_redis]
 
 
-def test_get(store: Store, user, entry, max_num_queries):
-    vote = factories.VoteFactory(entry_id=entry.id, user=user)
+def test_score_calculation(store: Store, entry, question, user):
+    another_entry = factories.QuestionFactory(user=user)
 
-    with max_num_queries(1):
-        assert repo.vote.get(store, user_id=user.id, entry_id=entry.id) == vote
+    factories.VoteFactory.create_batch(5, entry_id=entry.id, value=1)
 
-    with max_num_queries(1):
-        assert repo.vote.exists(store, user_id=user.id, entry_id=entry.id) is True
+    store.db.refresh(entry)
+    store.db.refresh(user)
 
+    assert entry.score == user.score == 5
 
-def test_get_non_existing(store: Store):
-    with pytest.raises(exceptions.NotFoundError):
-        repo.vote.get(store, user_id=999, entry_id=999)
+    factories.VoteFactory.create_batch(3, entry_id=another_entry.id, value=1)
 
-    assert repo.vote.exists(store, user_id=999, entry_id=999) is False
+    store.db.refresh(entry)
+    store.db.refresh(another_entry)
+    store.db.refresh(user)
 
+    assert entry.score == 5
+    assert another_entry.score == 3
+    assert user.score == 8
 
-@pytest.mark.parametrize(
-    ("input_val", "value"),
-    [
-        (1, 1),
-        (2, -1),
-    ],
-)
-def test_register_new(store: Store, entry, user, input_val, value):
-    vote = repo.vote.record(store, user_id=user.id, entry_id=entry.id, value=input_val)
 
-    from_db = repo.vote.get(store, user_id=user.id, entry_id=entry.id)
+def test_score_vote_changed_and_deleted(store: Store, entry, user):
+    vote = factories.VoteFactory(entry_id=entry.id, user=user, value=1)
+    factories.VoteFactory.create_batch(2, entry_id=entry.id, value=1)
 
-    assert from_db == vote
-    assert from_db.value == value
+    repo.vote.cast(store, user_id=user.id, entry_id=entry.id, value=2)
 
+    store.db.refresh(entry)
+    store.db.refresh(entry.user)
+    assert entry.score == entry.user.score == 1
 
-@pytest.mark.parametrize("input_val", [-1, 3, 4, 99])
-def test_register_invalid_value(store: Store, entry, user, input_val):
-    with pytest.raises(ValueError) as exc:
-        repo.vote.record(store, user_id=user.id, entry_id=entry.id, value=input_val)
-        assert str(exc) == "Invalid vote value"
+    store.db.delete(vote)
+    store.db.commit()
 
-    assert not repo.vote.exists(store, user_id=user.id, entry_id=entry.id)
+    store.db.refresh(entry)
+    store.db.refresh(entry.user)
+    assert entry.score == entry.user.score == 2
 
 
-@pytest.mark.parametrize(
-    ("input_val", "value"),
-    [
-        (1, 1),
-        (2, -1),
-    ],
-)
-def test_register_same_value(store: Store, entry, user, input_val, value):
-    factories.VoteFactory(entry_id=entry.id, user=user, value=value)
+def test_reconcile_scores(store: Store, user):
+    first = factories.QuestionFactory(user=user)
+    second = factories.AnswerFactory(user=user)
+
+    factories.VoteFactory.create_batch(2, entry_id=first.id, value=1)
+    factories.VoteFactory(entry_id=second.id, value=-1)
 
-    with pytest.raises(ValueError) as exc:
-        repo.vote.record(store, user_id=user.id, entry_id=entry.id, value=input_val)
-        assert str(exc) == "Vote already exists"
+    store.db.execute(
+        text("UPDATE entries SET score = 10 WHERE id = :id"), {"id": first.id}
+    )
+    store.db.execute(text("UPDATE users SET score = 10 WHERE id = :id"), {"id": user.id})
+    store.db.commit()
+
+    assert repo.vote.reconcile_scores(store) == (1, 1)
+    assert repo.vote.reconcile_scores(store) == (0, 0)
+
+    store.db.refresh(first)
+    store.db.refresh(second)
+    store.db.refresh(user)
+    assert first.score == 2
+    assert second.score == -1
+    assert user.score == 1
 
 
 @pytest.mark.parametrize(
@@ -72,45 +79,49 @@ def test_register_same_value(store: Store, entry, user, input_val, value):
         (2, -1),
     ],
 )
-def test_register_different_value(store: Store, entry, user, input_val, value):
-    vote = factories.VoteFactory(entry_id=entry.id, user=user, value=-value)
+def test_cast_new(store: Store, entry, user, input_val, value, max_num_queries):
+    with max_num_queries(1):
+        state = repo.vote.cast(
+            store, user_id=user.id, entry_id=entry.id, value=input_val
+        )
 
-    repo.vote.record(store, user_id=user.id, entry_id=entry.id, value=input_val)
+    assert state.id == entry.id
+    assert state.type == entry.type
+    assert state.score == value
+    assert state.user_vote.value == value
 
-    store.db.refresh(vote)
+    vote = store.db.query(Vote).filter_by(user_id=user.id, entry_id=entry.id).one()
     assert vote.value == value
 
 
-def test_register_delete(store: Store, entry, user):
+def test_cast_change_and_repeat(store: Store, entry, user):
+    factories.VoteFactory.create_batch(2, entry_id=entry.id, value=1)
     factories.VoteFactory(entry_id=entry.id, user=user, value=1)
 
-    repo.vote.record(store, user_id=user.id, entry_id=entry.id, value=0)
+    state = repo.vote.cast(store, user_id=user.id, entry_id=entry.id, value=2)
+    assert (state.score, state.value) == (1, -1)
 
-    assert not repo.vote.exists(store, user_id=user.id, entry_id=entry.id)
+    state = repo.vote.cast(store, user_id=user.id, entry_id=entry.id, value=2)
+    assert (state.score, state.value) == (1, -1)
 
 
-def test_register_delete_not_existing(store: Store, entry, user):
-    with pytest.raises(ValueError) as exc:
-        repo.vote.record(store, user_id=user.id, entry_id=entry.id, value=0)
-        assert str(exc) == "Vote does not exist"
+def test_cast_delete(store: Store, entry, user):
+    factories.VoteFactory(entry_id=entry.id, value=1)
+    factories.VoteFactory(entry_id=entry.id, user=user, value=-1)
 
+    state = repo.vote.cast(store, user_id=user.id, entry_id=entry.id, value=0)
 
-def test_score_calculation(store: Store, entry, question, user):
-    another_entry = factories.QuestionFactory(user=user)
+    assert state.score == 1
+    assert state.user_vote is None
+    assert not store.db.query(Vote).filter_by(user_id=user.id).count()
 
-    factories.VoteFactory.create_batch(5, entry_id=entry.id, value=1)
+    state = repo.vote.cast(store, user_id=user.id, entry_id=entry.id, value=0)
+    assert state.score == 1
 
-    store.db.refresh(entry)
-    store.db.refresh(user)
-
-    assert entry.score == user.score == 5
-
-    factories.VoteFactory.create_batch(3, entry_id=another_entry.id, value=1)
 
-    store.db.refresh(entry)
-    store.db.refresh(another_entry)
-    store.db.refresh(user)
+def test_cast_invalid(store: Store, entry, user):
+    with pytest.raises(ValueError):
+        repo.vote.cast(store, user_id=user.id, entry_id=entry.id, value=3)
 
-    assert entry.score == 5
-    assert another_entry.score == 3
-    assert user.score == 8
+    assert repo.vote.cast(store, user_id=user.id, entry_id=999, value=1) is None
+    assert not store.db.query(Vote).filter_by(user_id=user.id).count()
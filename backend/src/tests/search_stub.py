@@ -0,0 +1,41 @@
+from typing import Any, Dict, List
+
+from repository.search import SearchBackend, SearchResult
+from storage import Store
+
+
+class InMemorySearchBackend(SearchBackend):
+    """Naive backend keeping documents in memory, instead of a live Meilisearch"""
+
+    def __init__(self) -> None:
+        self.documents: Dict[int, Dict[str, Any]] = {}
+
+    def add_documents(self, documents: List[Dict[str, Any]]) -> None:
+        for doc in documents:
+            self.documents[int(doc["id"])] = doc
+
+    def delete_documents(self, ids: List[int]) -> None:
+        for id in ids:
+            self.documents.pop(int(id), None)
+
+    def clear(self) -> None:
+        self.documents.clear()
+
+    def search(
+        self, store: Store, query: str, *, offset: int = 0, limit: int = 20
+    ) -> SearchResult:
+        words = query.lower().split()
+
+        ranked = []
+        for id, doc in self.documents.items():
+            title = doc["title"].lower()
+            text = f"{title} {doc['content'].lower()}"
+            if words and all(word in text for word in words):
+                in_title = sum(word in title for word in words)
+                ranked.append((-in_title, -id))
+
+        ranked.sort()
+        ids = [-id for _, id in ranked]
+
+        end = offset + limit
+        return SearchResult(ids=ids[offset:end], total=len(ids))
@@ -0,0 +1,129 @@
+import socket
+import socketserver
+import threading
+from typing import List, NamedTuple, Set
+
+
+class ReceivedEmail(NamedTuple):
+    sender: str
+    recipients: List[str]
+    content: str
+
+
+class SMTPHandler(socketserver.StreamRequestHandler):
+    server: "SMTPStub"
+
+    def handle(self) -> None:
+        self.server.register(self.connection)
+
+        sender = ""
+        recipients: List[str] = []
+
+        self._reply("220 localhost SMTP stub")
+
+        for raw_line in self.rfile:
+            line = raw_line.decode("utf-8").rstrip("\r\n")
+            command, _, argument = line.partition(" ")
+            command = command.upper()
+
+            if command == "EHLO":
+                self._reply("250-localhost", "250-AUTH PLAIN", "250 OK")
+            elif command in ("HELO", "NOOP"):
+                self._reply("250 OK")
+            elif command == "AUTH":
+                self._reply("235 Authentication successful")
+            elif command == "MAIL":
+                sender, recipients = self._address(argument), []
+                self._reply("250 OK")
+            elif command == "RCPT":
+                recipient = self._address(argument)
+                if recipient in self.server.refused:
+                    self._reply("550 No such user")
+                elif recipient in self.server.deferred:
+                    self._reply("450 Mailbox busy, try again later")
+                else:
+                    recipients.append(recipient)
+                    self._reply("250 OK")
+            elif command == "DATA":
+                self._reply("354 End data with <CR><LF>.<CR><LF>")
+                content = self._read_data()
+                self.server.received.append(ReceivedEmail(sender, recipients, content))
+                if self.server.drop_after_data:
+                    return
+                self._reply("250 OK")
+            elif command == "RSET":
+                sender, recipients = "", []
+                self._reply("250 OK")
+            elif command == "QUIT":
+                self._reply("221 Bye")
+                return
+            else:
+                self._reply("502 Command not implemented")
+
+    def _reply(self, *lines: str) -> None:
+        self.wfile.write("".join(f"{line}\r\n" for line in lines).encode("utf-8"))
+
+    def _read_data(self) -> str:
+        lines = []
+        for raw_line in self.rfile:
+            line = raw_line.decode("utf-8").rstrip("\r\n")
+            if line == ".":
+                break
+            lines.append(line[1:] if line.startswith("..") else line)
+        return "\n".join(lines)
+
+    @staticmethod
+    def _address(argument: str) -> str:
+        return argument.split(":", 1)[1].strip().strip("<>")
+
+
+class SMTPStub(socketserver.ThreadingTCPServer):
+    """
+    SMTP server accepting everything, except recipients in `refused`, and
+    for now ones in `deferred`, keeping received emails in memory.
+    With `drop_after_data` the connection is closed after an email is
+    received, before the reply
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self) -> None:
+        super().__init__(("localhost", 0), SMTPHandler)
+
+        self.received: List[ReceivedEmail] = []
+        self.refused: Set[str] = set()
+        self.deferred: Set[str] = set()
+        self.connections = 0
+        self.drop_after_data = False
+
+        self._sockets: List[socket.socket] = []
+        self._lock = threading.Lock()
+
+    @property
+    def port(self) -> int:
+        return self.server_address[1]
+
+    def register(self, sock: socket.socket) -> None:
+        with self._lock:
+            self.connections += 1
+            self._sockets.append(sock)
+
+    def drop_connections(self) -> None:
+        """Close all client connections, as a server restart would"""
+        with self._lock:
+            sockets, self._sockets = self._sockets, []
+
+        for sock in sockets:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def start(self) -> None:
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    def stop(self) -> None:
+        self.drop_connections()
+        self.shutdown()
+        self.server_close()
@@ -0,0 +1,56 @@
+import os
+
+import pytest
+from pytest_mock import MockerFixture
+
+from app.config import settings
+from storage import db
+
+
+@pytest.fixture(autouse=True)
+def _reset_engine():
+    db.reset_engine()
+    yield
+    db.reset_engine()
+
+
+def test_create_engine_pool_settings():
+    engine = db.create_engine()
+
+    assert engine.pool.size() == settings.DB_POOL_SIZE
+    assert engine.pool._max_overflow == settings.DB_MAX_OVERFLOW
+    assert engine.pool._recycle == settings.DB_POOL_RECYCLE
+    assert engine.pool._pre_ping is settings.DB_POOL_PRE_PING
+
+
+def test_get_engine_reused():
+    assert db.get_engine() is db.get_engine()
+
+
+def test_get_engine_recreated_after_fork(mocker: MockerFixture):
+    engine = db.get_engine()
+
+    mocker.patch("storage.db.os.getpid", return_value=os.getpid() + 1)
+
+    assert db.get_engine() is not engine
+
+
+def test_dispose_engine(mocker: MockerFixture):
+    engine = db.get_engine()
+    dispose = mocker.patch.object(engine, "dispose")
+
+    db.dispose_engine()
+
+    dispose.assert_called_once()
+    assert db.get_engine() is not engine
+
+
+def test_create_session_shares_engine():
+    first = db.create_session()
+    second = db.create_session()
+
+    assert first is not second
+    assert first.bind is second.bind is db.get_engine()
+
+    first.close()
+    second.close()
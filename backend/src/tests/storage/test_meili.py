@@ -0,0 +1,5 @@
+from storage import meili
+
+
+def test_get_meili_reused():
+    assert meili.get_meili() is meili.get_meili()
@@ -0,0 +1,60 @@
+import pytest
+
+from app.config import settings
+from storage import redis
+
+
+@pytest.fixture(autouse=True)
+def _dispose_pools():
+    redis.dispose_pools()
+    yield
+    redis.dispose_pools()
+
+
+def test_create_pool_settings():
+    pool = redis.create_pool(settings.REDIS_MAIN_DB)
+
+    assert pool.max_connections == settings.REDIS_MAX_CONNECTIONS
+    assert pool.connection_kwargs["db"] == settings.REDIS_MAIN_DB
+    assert pool.connection_kwargs["socket_timeout"] == settings.REDIS_SOCKET_TIMEOUT
+    assert (
+        pool.connection_kwargs["socket_connect_timeout"]
+        == settings.REDIS_SOCKET_CONNECT_TIMEOUT
+    )
+
+
+def test_create_pool_without_timeout_for_rq():
+    pool = redis.create_pool(settings.REDIS_RQ_DB)
+
+    assert pool.connection_kwargs["socket_timeout"] is None
+
+
+def test_get_pool_reused():
+    assert redis.get_pool() is redis.get_pool(settings.REDIS_MAIN_DB)
+    assert redis.get_pool() is not redis.get_pool(settings.REDIS_RQ_DB)
+
+
+def test_create_redis_shares_pool():
+    first = redis.create_redis()
+    second = redis.create_redis()
+
+    assert first.connection_pool is second.connection_pool is redis.get_pool()
+
+
+def test_get_pool_stats():
+    pool = redis.get_pool()
+
+    assert redis.get_pool_stats() == {
+        "in_use": 0,
+        "idle": 0,
+        "created": 0,
+        "max": settings.REDIS_MAX_CONNECTIONS,
+    }
+
+    connection = pool.get_connection("PING")
+    assert redis.get_pool_stats()["in_use"] == 1
+    assert redis.get_pool_stats()["created"] == 1
+
+    pool.release(connection)
+    assert redis.get_pool_stats()["in_use"] == 0
+    assert redis.get_pool_stats()["idle"] == 1
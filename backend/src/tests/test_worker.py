@@ -0,0 +1,155 @@
+import os
+from datetime import timedelta
+
+import pytest
+from pytest_mock import MockerFixture
+from redis import Redis
+from rq import Queue
+
+from app.config import settings
+from storage import Store, store
+from worker import (
+    CountingWorker,
+    Supervisor,
+    WarmWorker,
+    job,
+    queue_names,
+    queue_stats,
+)
+
+
+def _succeed() -> int:
+    return 1
+
+
+def _fail() -> None:
+    raise ValueError
+
+
+@job
+def _get_store() -> Store:
+    return store._get_current_object()  # type: ignore
+
+
+@pytest.fixture
+def pools(mocker: MockerFixture):
+    pools = {"email": 2, "search,maintenance": 1, "maintenance,search": 1}
+    mocker.patch.object(settings, "WORKER_POOLS", pools)
+    return pools
+
+
+def test_queue_names(pools):
+    assert queue_names() == ["email", "search", "maintenance"]
+
+
+def test_supervisor_slots(pools):
+    assert Supervisor(pools).slots == [
+        ["email"],
+        ["email"],
+        ["search", "maintenance"],
+        ["maintenance", "search"],
+    ]
+
+
+def test_supervisor_restart_backoff(pools, mocker: MockerFixture):
+    mocker.patch.object(settings, "WORKER_POOLS", {"email": 1})
+    mocker.patch.object(settings, "WORKER_MIN_UPTIME", 10)
+    mocker.patch.object(settings, "WORKER_RESTART_MAX_DELAY", 4)
+    now = mocker.patch("worker.time.monotonic")
+    supervisor = Supervisor({"email": 1})
+    process_class = mocker.patch.object(supervisor._context, "Process")
+    process_class.return_value.is_alive.return_value = False
+    process_class.return_value.exitcode = 1
+
+    started = []
+    for tick in range(20):
+        now.return_value = 1000.0 + tick
+        supervisor.check()
+        started.append(process_class.call_count)
+
+    # restarted after 1, 2, 4 and then at most 4 seconds
+    assert [t for t in range(1, 20) if started[t] > started[t - 1]] == [
+        2,
+        5,
+        10,
+        15,
+    ]
+
+    # a worker which ran long enough is restarted right away
+    process_class.return_value.is_alive.return_value = True
+    now.return_value = 1020.0
+    supervisor.check()
+    assert process_class.call_count == started[-1] + 1
+
+    process_class.return_value.is_alive.return_value = False
+    process_class.return_value.exitcode = 0
+    now.return_value = 1100.0
+    supervisor.check()
+
+    assert process_class.call_count == started[-1] + 2
+
+
+def test_counting_worker(pools, redis_db: Redis, mocker: MockerFixture):
+    mocker.patch("worker.conn", redis_db)
+    queue = Queue("search", connection=redis_db)
+    queue.enqueue(_succeed)
+    queue.enqueue(_succeed)
+    queue.enqueue(_fail)
+    queue.enqueue_in(timedelta(minutes=1), _succeed)
+
+    CountingWorker([queue], connection=redis_db).work(burst=True)
+
+    stats = queue_stats()
+    assert stats["search"] == {
+        "queued": 0,
+        "started": 0,
+        "scheduled": 1,
+        "workers": 0,
+        "finished": 2,
+        "failed": 1,
+        "throughput": 0,
+    }
+    assert stats["email"]["finished"] == 0
+
+
+def test_supervisor_report(pools, redis_db: Redis, mocker: MockerFixture):
+    mocker.patch("worker.conn", redis_db)
+    mocker.patch.object(settings, "WORKER_STATS_INTERVAL", 10)
+    monotonic = mocker.patch("time.monotonic", return_value=100)
+    supervisor = Supervisor(pools)
+
+    supervisor.report()
+
+    queue = Queue("email", connection=redis_db)
+    for _ in range(5):
+        queue.enqueue(_succeed)
+    CountingWorker([queue], connection=redis_db).work(burst=True)
+
+    monotonic.return_value = 105
+    supervisor.report()
+    assert queue_stats()["email"]["throughput"] == 0
+
+    monotonic.return_value = 110
+    supervisor.report()
+    assert queue_stats()["email"]["throughput"] == 0.5
+
+
+def test_warm_worker(redis_db: Redis):
+    queue = Queue("search", connection=redis_db)
+    first = queue.enqueue(os.getpid)
+    second = queue.enqueue(os.getpid)
+
+    WarmWorker([queue], connection=redis_db).work(burst=True)
+
+    assert first.result == os.getpid()
+    assert second.result == os.getpid()
+
+
+def test_job(mocker: MockerFixture):
+    teardown = mocker.spy(Store, "teardown")
+
+    first = _get_store()
+    second = _get_store()
+
+    assert first is not second
+    assert teardown.call_count == 2
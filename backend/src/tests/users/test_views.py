@@ -5,6 +5,7 @@ from tests.factories import UserFactory
 
 
 @pytest.mark.allow_db
+@pytest.mark.allow_redis
 def test_all(client, template_rendered):
     UserFactory.create_batch(3)
 
@@ -15,6 +16,26 @@ def test_all(client, template_rendered):
     assert template_rendered("users/list.html")
 
 
+@pytest.mark.allow_db
+@pytest.mark.allow_redis
+@pytest.mark.parametrize("sort", ["oldest", "questions", "answers"])
+def test_all_sorted(client, sort, max_num_queries):
+    UserFactory.create_batch(3)
+
+    with max_num_queries(2):
+        response = client.get(f"/users/?sort={sort}")
+
+    assert response.status_code == 200
+
+
+@pytest.mark.allow_db
+@pytest.mark.allow_redis
+def test_all_invalid_sort(client):
+    response = client.get("/users/?sort=invalid")
+
+    assert response.status_code == 404
+
+
 @pytest.mark.allow_db
 @pytest.mark.allow_redis
 class TestProfile:
@@ -1,22 +1,38 @@
-from flask import Blueprint, render_template
+from flask import Blueprint, abort, render_template
 from flask.globals import request
 
 import repository as repo
+from common.conditional import conditional, list_validators
 from storage import store
 
 bp = Blueprint("users", __name__, url_prefix="/users")
 
 
 @bp.route("/")
+@conditional(list_validators)
 def all():
     page = int(request.args.get("page", 1))
 
-    paginator = repo.user.list(store, page=page, per_page=16)
+    sort = request.args.get("sort", repo.user.SORTS[0])
+    if sort not in repo.user.SORTS:
+        abort(404)
+
+    paginator = repo.user.list_sorted(
+        store,
+        sort=sort,
+        page=page,
+        per_page=16,
+        after=request.args.get("after"),
+        before=request.args.get("before"),
+    )
 
-    return render_template("users/list.html", paginator=paginator)
+    return render_template(
+        "users/list.html", paginator=paginator, sorts=repo.user.SORTS, sort=sort
+    )
 
 
 @bp.route("/<int:id>/")
+@conditional(list_validators)
 def profile(id: int):
     user = repo.user.get_with_counts(store, id)
 
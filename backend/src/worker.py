@@ -1,15 +1,300 @@
-from redis import Redis
-from rq import Connection, Queue, Worker
+import logging
+import multiprocessing
+import os
+import signal
+import time
+from functools import wraps
+from multiprocessing.process import BaseProcess
+from typing import Any, Callable, Dict, List, Optional, TypeVar, cast
+
+from redis.exceptions import RedisError
+from rq import Queue, SimpleWorker, Worker
 
 from app.config import settings
+from storage.redis import create_redis
+
+logger = logging.getLogger(__name__)
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+EMAIL_QUEUE = "email"
+SEARCH_QUEUE = "search"
+MAINTENANCE_QUEUE = "maintenance"
+
+conn = create_redis(settings.REDIS_RQ_DB)
+
+email_queue = Queue(EMAIL_QUEUE, connection=conn)
+search_queue = Queue(SEARCH_QUEUE, connection=conn)
+maintenance_queue = Queue(MAINTENANCE_QUEUE, connection=conn)
+
+
+class CountingWorker(Worker):
+    """Worker counting finished and failed jobs of every queue"""
+
+    STATS_KEY = "rq:stats:{queue}"
+
+    def handle_job_success(
+        self, job: Any, queue: Queue, started_job_registry: Any
+    ) -> None:
+        super().handle_job_success(job, queue, started_job_registry)
+        self._count(job.origin, "finished")
+
+    def handle_job_failure(
+        self,
+        job: Any,
+        queue: Queue,
+        started_job_registry: Any = None,
+        exc_string: str = "",
+    ) -> None:
+        super().handle_job_failure(
+            job, queue, started_job_registry=started_job_registry, exc_string=exc_string
+        )
+        self._count(job.origin, "failed")
+
+    def _count(self, queue_name: str, field: str) -> None:
+        try:
+            self.connection.hincrby(self.STATS_KEY.format(queue=queue_name), field, 1)
+        except RedisError:
+            logger.exception("Failed to count %s job of %s queue", field, queue_name)
+
+
+class WarmWorker(CountingWorker, SimpleWorker):
+    """
+    Worker running jobs in its own process instead of a fork per job,
+    so the app and connection pools built by `bootstrap` serve all of them.
+    Job timeouts are still enforced, with SIGALRM
+    """
+
+
+def job(func: F) -> F:
+    """
+    Run the job inside an application context. Its store takes connections
+    from pools of the process and returns them, with the database session
+    closed, when the job ends
+    """
+
+    @wraps(func)
+    def wrapper(*args: Any, **kwargs: Any) -> Any:
+        from app.main import app
+
+        with app.app_context():
+            return func(*args, **kwargs)
+
+    return cast(F, wrapper)
+
+
+def bootstrap() -> None:
+    """
+    Build the app, import tasks and open connections once per worker process,
+    before it takes any jobs
+    """
+    import app.main  # noqa: F401
+    import mail.outbox  # noqa: F401
+    import questions.tasks  # noqa: F401
+    from storage.db import get_engine
+    from storage.meili import get_meili
+
+    get_engine().connect().close()
+    create_redis().ping()
+    get_meili()
+
+
+def queue_names() -> List[str]:
+    """Names of all queues served by WORKER_POOLS"""
+    names: Dict[str, None] = {}
+    for pool in settings.WORKER_POOLS:
+        names.update(dict.fromkeys(pool.split(",")))
+    return list(names)
+
+
+def queue_stats() -> Dict[str, Dict[str, float]]:
+    """Depth, job counters, workers and last measured throughput of every queue"""
+    result = {}
+    for name in queue_names():
+        queue = Queue(name, connection=conn)
+        counters = conn.hgetall(CountingWorker.STATS_KEY.format(queue=name))
+        result[name] = {
+            "queued": queue.count,
+            "started": queue.started_job_registry.count,
+            "scheduled": queue.scheduled_job_registry.count,
+            "workers": Worker.count(connection=conn, queue=queue),
+            "finished": int(counters.get(b"finished", 0)),
+            "failed": int(counters.get(b"failed", 0)),
+            "throughput": float(counters.get(b"throughput", 0)),
+        }
+    return result
+
+
+def run_worker(queues: List[str]) -> None:
+    # stop signals come from the supervisor only, as a second one
+    # would make the worker kill its current job
+    os.setpgrp()
 
-listen = ["default"]
+    bootstrap()
 
-conn = Redis(host=settings.REDIS_HOST, port=settings.REDIS_PORT, db=settings.REDIS_RQ_DB)
-queue = Queue(connection=conn)
+    connection = create_redis(settings.REDIS_RQ_DB)
+    worker = WarmWorker(
+        [Queue(name, connection=connection) for name in queues], connection=connection
+    )
+    # workers are restarted by the supervisor, which frees memory leaked by jobs
+    worker.work(with_scheduler=True, max_jobs=settings.WORKER_MAX_JOBS)
+
+
+class Supervisor:
+    """
+    Runs worker processes for WORKER_POOLS, which map comma separated queues,
+    listened to in the order of priority, to numbers of processes.
+    Workers that exit are restarted, ones exiting within WORKER_MIN_UPTIME
+    seconds after start, like when Redis or Postgres is down, with a delay
+    doubled for every such exit in a row, up to WORKER_RESTART_MAX_DELAY
+    seconds. Depth and throughput of queues are logged
+    every WORKER_STATS_INTERVAL seconds. On SIGTERM or SIGINT workers are
+    stopped after their current jobs, or killed after WORKER_SHUTDOWN_TIMEOUT
+    """
+
+    CHECK_INTERVAL = 1
+
+    def __init__(self, pools: Dict[str, int]) -> None:
+        self.slots = [
+            pool.split(",")
+            for pool, processes in pools.items()
+            for _ in range(processes)
+        ]
+
+        self._processes: List[Optional[BaseProcess]] = [None] * len(self.slots)
+        self._started_at = [0.0] * len(self.slots)
+        self._quick_exits = [0] * len(self.slots)
+        self._restart_at = [0.0] * len(self.slots)
+        self._context = multiprocessing.get_context("spawn")
+        self._stopping = False
+        self._done: Dict[str, int] = {}
+        self._reported_at = 0.0
+
+    def run(self) -> None:
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+
+        while not self._stopping:
+            self.check()
+            self.report()
+            time.sleep(self.CHECK_INTERVAL)
+
+        self.shutdown()
+
+    def check(self) -> None:
+        """Start workers which are not running, unless their restart is delayed"""
+        now = time.monotonic()
+
+        for i, queues in enumerate(self.slots):
+            process = self._processes[i]
+            if process is not None and process.is_alive():
+                continue
+
+            if process is not None:
+                self._exited(i, process, now)
+                self._processes[i] = None
+
+            if now < self._restart_at[i]:
+                continue
+
+            process = self._context.Process(
+                target=run_worker, args=(queues,), name=f"worker-{i}"
+            )
+            process.start()
+            self._processes[i] = process
+            self._started_at[i] = now
+
+    def report(self) -> None:
+        now = time.monotonic()
+        elapsed = now - self._reported_at
+        if elapsed < settings.WORKER_STATS_INTERVAL:
+            return
+
+        try:
+            stats = queue_stats()
+            pipe = conn.pipeline()
+            for name, values in stats.items():
+                done = int(values["finished"] + values["failed"])
+                throughput = (done - self._done.get(name, done)) / elapsed
+                self._done[name] = done
+
+                pipe.hset(
+                    CountingWorker.STATS_KEY.format(queue=name),
+                    "throughput",
+                    round(throughput, 3),
+                )
+                logger.info(
+                    "Queue %s: %s queued, %s started, %s scheduled, %.2f jobs/s",
+                    name,
+                    values["queued"],
+                    values["started"],
+                    values["scheduled"],
+                    throughput,
+                )
+            pipe.execute()
+        except RedisError:
+            logger.exception("Failed to report queue stats")
+
+        self._reported_at = now
+
+    def shutdown(self) -> None:
+        processes = [p for p in self._processes if p is not None and p.is_alive()]
+        for process in processes:
+            process.terminate()
+
+        deadline = time.monotonic() + settings.WORKER_SHUTDOWN_TIMEOUT
+        for process in processes:
+            process.join(max(deadline - time.monotonic(), 0))
+            if process.is_alive():
+                logger.warning("Worker %s did not stop in time, killing", process.name)
+                process.kill()
+                process.join()
+
+        self._processes = [None] * len(self.slots)
+
+    def _exited(self, i: int, process: BaseProcess, now: float) -> None:
+        queues = ",".join(self.slots[i])
+
+        if now - self._started_at[i] < settings.WORKER_MIN_UPTIME:
+            self._quick_exits[i] += 1
+        else:
+            self._quick_exits[i] = 0
+
+        delay = 0
+        if self._quick_exits[i]:
+            delay = min(
+                2 ** (self._quick_exits[i] - 1), settings.WORKER_RESTART_MAX_DELAY
+            )
+        self._restart_at[i] = now + delay
+
+        if process.exitcode == 0 and not delay:
+            logger.info("Worker of %s finished, restarting", queues)
+        else:
+            logger.warning(
+                "Worker of %s exited with code %s, restarting in %ss",
+                queues,
+                process.exitcode,
+                delay,
+            )
+
+    def _stop(self, signum: int, frame: Any) -> None:
+        self._stopping = True
 
 
 if __name__ == "__main__":
-    with Connection(conn):
-        worker = Worker([queue], connection=conn)
-        worker.work()
+    from app.main import app
+    from questions.services import (
+        schedule_counter_reconciliation,
+        schedule_hot_renormalization,
+        schedule_view_count_snapshot,
+    )
+    from storage import store
+
+    logger.setLevel(logging.INFO)
+
+    with app.app_context():
+        schedule_view_count_snapshot(store, delay=0)
+        schedule_hot_renormalization(store)
+        schedule_counter_reconciliation(store)
+
+    Supervisor(settings.WORKER_POOLS).run()